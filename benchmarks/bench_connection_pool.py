@@ -0,0 +1,56 @@
+"""Compare a fresh client per call against the shared pooled client of ``ZoomeyeService``.
+
+Usage: python -m benchmarks.bench_connection_pool [--calls 200] [--connect-latency 0.05]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from mcp_server_zoomeye.server import ZoomeyeService
+
+from .mock_api import MockZoomeyeAPI
+
+
+class PerCallClientService(ZoomeyeService):
+    """The pre-pooling behaviour: a new client, and so a new connection, for every call."""
+
+    async def get_client(self) -> httpx.AsyncClient:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = self._build_client()
+        return self._client
+
+
+async def run(service_cls, api: MockZoomeyeAPI, calls: int) -> list[float]:
+    timings = []
+    async with service_cls(key="bench", base_url=api.base_url) as service:
+        for i in range(calls):
+            start = time.perf_counter()
+            await service.query_vulnerability_by_id(f"CVE-2025-{i:04d}")
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main(calls: int, latency: float, connect_latency: float) -> None:
+    for label, service_cls in (("per-call client", PerCallClientService), ("pooled client", ZoomeyeService)):
+        async with MockZoomeyeAPI(latency=latency, connect_latency=connect_latency) as api:
+            timings = await run(service_cls, api, calls)
+            timings.sort()
+            print(f"{label:>16}: connections={api.connections:<4} "
+                  f"mean={statistics.mean(timings) * 1000:.2f}ms "
+                  f"p50={timings[len(timings) // 2] * 1000:.2f}ms "
+                  f"p99={timings[int(len(timings) * 0.99) - 1] * 1000:.2f}ms "
+                  f"total={sum(timings):.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Per-request server latency in seconds")
+    parser.add_argument("--connect-latency", type=float, default=0.05,
+                        help="Per-connection setup latency in seconds, emulating TCP/TLS handshakes")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.latency, args.connect_latency))
@@ -0,0 +1,87 @@
+"""Peak memory of fetching, decoding and serializing one large zoomeye_search page.
+
+Each measurement runs in a fresh interpreter so that ``ru_maxrss`` only reflects
+one call: the child imports the server, warms up with a one-row search, then runs
+``ZoomeyeService.query`` against the mock API (in its own process) and serializes
+the result with ``format_result``. The peak RSS growth over the warmed-up process
+and, in a separate run, the tracemalloc peak are reported.
+
+Usage: python -m benchmarks.bench_decode_memory [--rows 1000 10000] [--fields ip,port,domain,update_time]
+                                               [--output-format json] [--json results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _child(base_url: str, rows: int, fields: str, output_format: str, trace: bool) -> dict:
+    from mcp_server_zoomeye.formatting import format_result
+    from mcp_server_zoomeye.query_syntax import encode_query
+    from mcp_server_zoomeye.server import ZoomeyeService
+
+    qbase64 = encode_query('app="Apache Tomcat"')
+    async with ZoomeyeService(key="bench", base_url=base_url, cache=None) as service:
+        format_result(await service.query(qbase64, pagesize=1, fields=fields or None), output_format)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if trace:
+            tracemalloc.start()
+        result = await service.query(qbase64, page=2, pagesize=rows, fields=fields or None)
+        text = format_result(result, output_format)
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {"rss_growth": (after - before) * scale, "traced_peak": peak, "output_bytes": len(text)}
+
+
+def run_child(base_url: str, rows: int, fields: str, output_format: str, trace: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_decode_memory", "--child", base_url, "--rows", str(rows),
+         "--fields", fields, "--output-format", output_format] + (["--trace"] if trace else []),
+        cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(args) -> None:
+    api = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_api", "--fixtures", "--total", "100000"],
+                           cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = f"http://127.0.0.1:{int(api.stdout.readline())}"
+        results = {}
+        for rows in args.rows:
+            measured = run_child(base_url, rows, args.fields, args.output_format, trace=False)
+            measured["traced_peak"] = run_child(base_url, rows, args.fields, args.output_format,
+                                                trace=True)["traced_peak"]
+            results[str(rows)] = measured
+            print(f"{rows:>7} rows: peak RSS +{measured['rss_growth'] / 2 ** 20:7.1f}MB  "
+                  f"traced peak {measured['traced_peak'] / 2 ** 20:7.1f}MB  "
+                  f"output {measured['output_bytes'] / 2 ** 20:6.1f}MB")
+    finally:
+        api.terminate()
+        api.wait()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--fields", default="", help="Fields requested from the API (default: all)")
+    parser.add_argument("--output-format", default="json", help="Serialization of the result (default: json)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        rows = args.rows[0]
+        print(json.dumps(asyncio.run(_child(args.child, rows, args.fields, args.output_format, args.trace))))
+    else:
+        main(args)
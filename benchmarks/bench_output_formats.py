@@ -0,0 +1,54 @@
+"""Bytes and serialization time of each output format on fixture search responses.
+
+Usage: python -m benchmarks.bench_output_formats [--rows 10 100 1000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+
+from mcp_server_zoomeye.formatting import OUTPUT_FORMATS, format_result, orjson
+
+from .fixtures import search_response
+
+VARIANTS = [
+    ("all fields", {}),
+    ("select ip,port,domain,update_time", {"select": ["ip", "port", "domain", "update_time"]}),
+    ("max_field_length=64", {"max_field_length": 64}),
+]
+
+
+def measure(func, repeat: int) -> tuple[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = func()
+        best = min(best, time.perf_counter() - start)
+    return text, best
+
+
+def report(label: str, text: str, seconds: float, baseline: int) -> None:
+    size = len(text.encode("utf-8"))
+    print(f"  {label:>9}: {size:>12,} bytes ({size / baseline:6.1%})  {seconds * 1000:9.2f} ms")
+
+
+def main(row_counts: list[int], repeat: int) -> None:
+    print(f"encoder: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    for rows in row_counts:
+        response = search_response(rows)
+        for label, options in VARIANTS:
+            print(f"\n{rows} rows, {label}")
+            # The previous call_tool output: stdlib json.dumps(indent=2) of the unshaped response.
+            text, seconds = measure(lambda: json.dumps(response, ensure_ascii=False, indent=2), repeat)
+            baseline = len(text.encode("utf-8"))
+            report("baseline", text, seconds, baseline)
+            for output_format in OUTPUT_FORMATS:
+                text, seconds = measure(lambda: format_result(response, output_format, **options), repeat)
+                report(output_format, text, seconds, baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,164 @@
+"""Startup time of the stdio server, from process spawn to the ``initialize`` response.
+
+Each run spawns ``python -m mcp_server_zoomeye`` the way an MCP client does, writes
+an ``initialize`` request to its stdin and waits for the response, then lists the
+tools and records how long that took and how many bytes the catalogue is. Caches,
+watch state and spilled results go to a temporary directory so that every run
+starts cold. Nothing leaves the machine.
+
+Most of the startup time is the import of ``mcp`` and ``httpx``, which depends on
+the machine more than on this server. Every server start is paired with a process
+that only imports those packages. The median difference is the ``overhead`` of
+this server, and ``--max-overhead`` limits it relative to the import time so that
+the same limit holds on slower and faster machines.
+
+Usage: python -m benchmarks.bench_startup [--runs 10] [--short-descriptions] [--json results.json]
+                                          [--baseline previous.json --tolerance 0.3] [--max-overhead 0.2]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2024-11-05", "capabilities": {},
+               "clientInfo": {"name": "bench_startup", "version": "0"}},
+}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+LIST_TOOLS = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+
+def _send(process: subprocess.Popen, message: dict) -> None:
+    process.stdin.write(json.dumps(message).encode() + b"\n")
+    process.stdin.flush()
+
+
+def _receive(process: subprocess.Popen, request_id: int) -> bytes:
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Server exited before answering request {request_id}")
+        if json.loads(line).get("id") == request_id:
+            return line
+
+
+def run_once(extra_args: list[str], state_dir: str) -> dict:
+    env = {
+        **os.environ,
+        "ZOOMEYE_API_KEY": "bench",
+        "ZOOMEYE_CACHE_PATH": os.path.join(state_dir, "cache.sqlite"),
+        "ZOOMEYE_WATCH_PATH": os.path.join(state_dir, "watch.sqlite"),
+        "ZOOMEYE_RESULTS_DIR": os.path.join(state_dir, "results"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.join(ROOT, "src"), os.environ.get("PYTHONPATH")])),
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "mcp_server_zoomeye", *extra_args], env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        _send(process, INITIALIZE)
+        _receive(process, 1)
+        initialized = time.perf_counter()
+        _send(process, INITIALIZED)
+        _send(process, LIST_TOOLS)
+        catalogue = _receive(process, 2)
+        listed = time.perf_counter()
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {
+        "initialize_ms": (initialized - started) * 1000,
+        "tools_list_ms": (listed - initialized) * 1000,
+        "catalogue_bytes": len(catalogue),
+    }
+
+
+FLOOR_IMPORTS = "import httpx, mcp.server, mcp.server.lowlevel.helper_types, mcp.server.stdio, mcp.types"
+
+
+def import_floor_ms() -> float:
+    """Milliseconds for a process to start and import the packages the server is built on, and nothing else."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", FLOOR_IMPORTS + "; print()"], stdout=subprocess.PIPE)
+    process.stdout.readline()
+    imported = time.perf_counter()
+    process.wait()
+    return (imported - started) * 1000
+
+
+def measure(runs: int, extra_args: list[str]) -> dict:
+    samples, floors = [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as state_dir:
+            samples.append(run_once(extra_args, state_dir))
+        floors.append(import_floor_ms())
+    initialize = [sample["initialize_ms"] for sample in samples]
+    return {
+        "runs": runs,
+        "initialize_min_ms": min(initialize),
+        "initialize_p50_ms": statistics.median(initialize),
+        "mcp_import_p50_ms": statistics.median(floors),
+        "overhead_p50_ms": statistics.median(total - floor for total, floor in zip(initialize, floors)),
+        "overhead_ratio": statistics.median((total - floor) / floor for total, floor in zip(initialize, floors)),
+        "tools_list_p50_ms": statistics.median(sample["tools_list_ms"] for sample in samples),
+        "catalogue_bytes": samples[-1]["catalogue_bytes"],
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of the median startup time or catalogue size by more than ``tolerance``."""
+    regressions = []
+    for name in ("initialize_p50_ms", "catalogue_bytes"):
+        if name in baseline and result[name] > baseline[name] * (1 + tolerance):
+            regressions.append(f"{name} {result[name]:.1f}, was {baseline[name]:.1f}")
+    return regressions
+
+
+def main(args) -> int:
+    extra_args = ["--short-descriptions"] if args.short_descriptions else []
+    # One untimed run so that bytecode compilation is not counted.
+    with tempfile.TemporaryDirectory() as state_dir:
+        run_once(extra_args, state_dir)
+    result = measure(args.runs, extra_args)
+    print(f"initialize: min {result['initialize_min_ms']:.1f}ms, p50 {result['initialize_p50_ms']:.1f}ms "
+          f"over {result['runs']} runs")
+    print(f"overhead over importing mcp and httpx ({result['mcp_import_p50_ms']:.1f}ms): "
+          f"p50 {result['overhead_p50_ms']:.1f}ms, {result['overhead_ratio']:.0%}")
+    print(f"tools/list: p50 {result['tools_list_p50_ms']:.1f}ms, {result['catalogue_bytes']:,} bytes")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+    if args.max_overhead is not None and result["overhead_ratio"] > args.max_overhead:
+        regressions.append(f"overhead_ratio {result['overhead_ratio']:.2f}, limit {args.max_overhead:.2f}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Number of timed server starts (default: 10)")
+    parser.add_argument("--short-descriptions", action="store_true",
+                        help="Start the server with short tool descriptions")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Relative slowdown or growth reported as a regression (default: 0.3)")
+    parser.add_argument("--max-overhead", type=float,
+                        help="Fail when the median startup takes longer than importing mcp and httpx "
+                             "by more than this fraction")
+    sys.exit(main(parser.parse_args()))
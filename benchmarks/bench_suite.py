@@ -0,0 +1,202 @@
+"""End-to-end benchmarks of the MCP tool handlers against the local mock ZoomEye API.
+
+Every scenario builds the server with ``create_server`` and drives its ``tools/call``
+handler in process, so argument handling, the service, the HTTP client, JSON decoding
+and result serialization are all measured. The mock API runs in a child process so
+that its own work is not counted. Nothing leaves the machine.
+
+Usage: python -m benchmarks.bench_suite [--quick] [--scenario NAME ...] [--json results.json]
+                                        [--baseline previous.json --tolerance 0.3 --memory-tolerance 0.2]
+
+benchmarks/baseline.json holds the --quick results CI compares against.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from mcp import types
+
+from mcp_server_zoomeye.ratelimit import RetryPolicy
+from mcp_server_zoomeye.server import ZoomeyeService, create_server
+from mcp_server_zoomeye.spill import ResultStore
+from mcp_server_zoomeye.watch import WatchStore
+
+QUERY = 'app="Apache Tomcat"'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    calls: list  # (tool name, arguments) pairs
+    concurrency: int = 1
+    api_options: dict = field(default_factory=dict)
+
+
+def scenarios(quick: bool) -> list[Scenario]:
+    calls = 50 if quick else 200
+    bursts = 2 if quick else 10
+    return [
+        Scenario("single_search", f"{calls} sequential zoomeye_search calls, 10 rows each",
+                 [("zoomeye_search", {"query": QUERY, "page": i + 1, "pagesize": 10}) for i in range(calls)]),
+        Scenario("single_vuldb", f"{calls} sequential zoomeye_vuldb_by_id calls",
+                 [("zoomeye_vuldb_by_id", {"cve_id": f"CVE-2024-{i:04d}"}) for i in range(calls)]),
+        Scenario("burst_search", f"{bursts} x 50 concurrent zoomeye_search calls, 100 rows each",
+                 [("zoomeye_search", {"query": f"{QUERY} && port={8000 + i}", "pagesize": 100})
+                  for i in range(bursts * 50)],
+                 concurrency=50),
+        Scenario("burst_errors", f"{bursts} x 50 concurrent zoomeye_vuldb_by_id calls, 5% upstream 503s",
+                 [("zoomeye_vuldb_by_id", {"cve_id": f"CVE-2024-{i:04d}"}) for i in range(bursts * 50)],
+                 concurrency=50, api_options={"error_rate": 0.05}),
+        Scenario("page_1k", "zoomeye_search, one 1,000-row page",
+                 [("zoomeye_search", {"query": QUERY, "pagesize": 1000, "spill": False})] * (2 if quick else 5)),
+        Scenario("page_10k", "zoomeye_search, one 10,000-row page returned inline",
+                 [("zoomeye_search", {"query": QUERY, "pagesize": 10000, "spill": False})] * (1 if quick else 3)),
+        Scenario("page_10k_spill", "zoomeye_search, one 10,000-row page spilled to disk",
+                 [("zoomeye_search", {"query": QUERY, "pagesize": 10000, "spill": True})] * (1 if quick else 3)),
+        Scenario("search_all_10k", "zoomeye_search_all, 10,000 rows in 1,000-row pages",
+                 [("zoomeye_search_all", {"query": QUERY, "max_results": 10000, "pagesize": 1000,
+                                          "output_format": "compact"})] * (1 if quick else 3)),
+    ]
+
+
+async def call(handler, name: str, arguments: dict) -> float:
+    start = time.perf_counter()
+    result = await handler(types.CallToolRequest(
+        method="tools/call", params=types.CallToolRequestParams(name=name, arguments=arguments)))
+    elapsed = time.perf_counter() - start
+    if result.root.isError:
+        raise RuntimeError(f"{name} failed: {result.root.content[0].text}")
+    return elapsed
+
+
+@asynccontextmanager
+async def mock_api(latency: float, **options):
+    """Base URL of a mock API serving fixture rows from a child process."""
+    arguments = ["--fixtures", "--latency", str(latency)]
+    for name, value in options.items():
+        arguments += ["--" + name.replace("_", "-"), str(value)]
+    process = await asyncio.create_subprocess_exec(sys.executable, "-m", "benchmarks.mock_api", *arguments,
+                                                   stdout=asyncio.subprocess.PIPE, cwd=ROOT)
+    try:
+        port = int(await process.stdout.readline())
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        await process.wait()
+
+
+async def execute(scenario: Scenario, base_url: str, results_dir: str) -> tuple[list[float], float]:
+    """Run ``scenario`` once, returning the per-call latencies and the wall time."""
+    service = ZoomeyeService(key="bench", base_url=base_url, cache=None,
+                             retry_policy=RetryPolicy(max_retries=10),
+                             result_store=ResultStore(directory=results_dir),
+                             watch_store=WatchStore(":memory:"))
+    handler = create_server(service).request_handlers[types.CallToolRequest]
+    semaphore = asyncio.Semaphore(scenario.concurrency)
+
+    async def bounded(name: str, arguments: dict) -> float:
+        async with semaphore:
+            return await call(handler, name, arguments)
+
+    async with service:
+        start = time.perf_counter()
+        timings = await asyncio.gather(*(bounded(name, arguments) for name, arguments in scenario.calls))
+        wall = time.perf_counter() - start
+    return list(timings), wall
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+async def measure(scenario: Scenario, latency: float, results_dir: str) -> dict:
+    async with mock_api(latency, **scenario.api_options) as base_url:
+        # Warm up imports and the payloads the mock encodes on first use.
+        await execute(scenario, base_url, results_dir)
+        timings, wall = await execute(scenario, base_url, results_dir)
+        # Peak memory is taken from a separate run, tracemalloc slows allocation down.
+        tracemalloc.start()
+        try:
+            await execute(scenario, base_url, results_dir)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "description": scenario.description,
+        "calls": len(timings),
+        "throughput": len(timings) / wall,
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, memory_tolerance: Optional[float] = None) -> list[str]:
+    """Regressions against ``baseline`` by more than the tolerances.
+
+    Throughput and p99 regress when they are more than ``1 + tolerance`` times
+    slower, peak memory when it grows by more than ``memory_tolerance`` (default
+    ``tolerance``) and at least 1MB, so that tiny peaks do not flap.
+    """
+    memory_tolerance = tolerance if memory_tolerance is None else memory_tolerance
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result["throughput"] * (1 + tolerance) < previous["throughput"]:
+            regressions.append(f"{name}: throughput {result['throughput']:.1f}/s, was {previous['throughput']:.1f}/s")
+        if result["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {result['p99_ms']:.1f}ms, was {previous['p99_ms']:.1f}ms")
+        if result["peak_mb"] > max(previous["peak_mb"] * (1 + memory_tolerance), previous["peak_mb"] + 1):
+            regressions.append(f"{name}: peak {result['peak_mb']:.1f}MB, was {previous['peak_mb']:.1f}MB")
+    return regressions
+
+
+async def main(args) -> int:
+    results = {}
+    with tempfile.TemporaryDirectory() as results_dir:
+        for scenario in scenarios(args.quick):
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+            result = results[scenario.name] = await measure(scenario, args.latency, results_dir)
+            print(f"{scenario.name:>15}: {result['throughput']:9.1f} calls/s  p50={result['p50_ms']:8.2f}ms  "
+                  f"p99={result['p99_ms']:8.2f}ms  peak={result['peak_mb']:7.1f}MB  ({scenario.description})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Fewer calls per scenario, for CI")
+    parser.add_argument("--scenario", nargs="+", help="Only run these scenarios")
+    parser.add_argument("--latency", type=float, default=0.0, help="Per-request mock API latency in seconds")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Relative slowdown or memory growth reported as a regression (default: 0.3)")
+    parser.add_argument("--memory-tolerance", type=float,
+                        help="Relative peak memory growth reported as a regression (default: --tolerance)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
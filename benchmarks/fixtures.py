@@ -0,0 +1,94 @@
+"""Deterministic ZoomEye response fixtures shaped like the recorded API example in README.md."""
+import random
+
+_BODY = ("<!DOCTYPE html><html><head><title>Apache Tomcat/9.0.{minor}</title></head><body><h1>If you're seeing "
+         "this, you've successfully installed Tomcat. Congratulations!</h1>" + "<p>Lorem ipsum dolor sit amet.</p>" * 40
+         + "</body></html>")
+_HEADER = ("HTTP/1.1 200 OK\r\nServer: nginx/1.{minor}.1\r\nDate: Tue, 03 Jul 2024 14:34:10 GMT\r\n"
+           "Content-Type: text/html;charset=UTF-8\r\nTransfer-Encoding: chunked\r\nConnection: keep-alive\r\n"
+           "Cache-Control: private\r\nSet-Cookie: JSESSIONID={session}; Path=/; HttpOnly\r\n")
+_COUNTRIES = [("Germany", "Hesse", "Frankfurt"), ("United States", "California", "Los Angeles"),
+              ("Japan", "Tokyo", "Tokyo"), ("China", "Beijing", "Beijing"), ("Brazil", "Sao Paulo", "Sao Paulo")]
+_PRODUCTS = [("nginx", "1.18.0"), ("Apache Tomcat", "9.0.65"), ("OpenSSH", "7.6p1"), ("Apache httpd", "2.4.41"),
+             ("Microsoft IIS httpd", "10.0")]
+
+
+def search_row(i: int) -> dict:
+    """A full search result row; ``i`` selects deterministic values."""
+    rng = random.Random(i)
+    country, province, city = _COUNTRIES[i % len(_COUNTRIES)]
+    product, version = _PRODUCTS[i % len(_PRODUCTS)]
+    ip = f"{1 + i % 223}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+    port = (80, 443, 8080, 22, 8443)[i % 5]
+    return {
+        "url": f"https://{ip}:{port}",
+        "ssl.jarm": "29d29d15d29d29d00029d29d29d29dea0f89a2e5fb09e4d8e099befed92cfa",
+        "ssl.ja3s": "45094d08156d110d8ee97b204143db14",
+        "iconhash_md5": "f3418a443e7d841097c714d69ec4bcb8",
+        "robots_md5": "0b5ce08db7fb8fffe4e14d05588d49d9",
+        "security_md5": "0b5ce08db7fb8fffe4e14d05588d49d9",
+        "ip": ip,
+        "domain": f"host{i}.example.com" if i % 3 == 0 else "",
+        "hostname": f"host{i}",
+        "os": ("linux", "windows", "freebsd")[i % 3],
+        "port": port,
+        "service": ("http", "https", "http", "ssh", "https")[i % 5],
+        "title": [f"Apache Tomcat/9.0.{i % 90}"],
+        "version": version,
+        "device": ("webcam", "router", "")[i % 3],
+        "rdns": f"c{i:06d}-001.cust.example.net",
+        "product": product,
+        "header": _HEADER.format(minor=i % 25, session=f"{rng.getrandbits(128):032X}"),
+        "header_hash": f"{rng.getrandbits(128):032x}",
+        "body": _BODY.format(minor=i % 90),
+        "body_hash": f"{rng.getrandbits(128):032x}",
+        "banner": f"SSH-2.0-OpenSSH_7.6p1 Ubuntu-4ubuntu0.{i % 7}",
+        "update_time": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T14:34:10",
+        "header.server.name": "nginx",
+        "header.server.version": f"1.{i % 25}.1",
+        "continent.name": "Europe",
+        "country.name": country,
+        "province.name": province,
+        "city.name": city,
+        "lon": f"{rng.uniform(-180, 180):.6f}",
+        "lat": f"{rng.uniform(-90, 90):.6f}",
+        "isp.name": "aviel.ru",
+        "organization.name": "SERVISFIRST BANK",
+        "zipcode": "210003",
+        "idc": i % 2,
+        "honeypot": 0,
+        "asn": 4837 + i % 100,
+        "protocol": "tcp",
+        "ssl": "SSL Certificate Version: TLS 1.2 CipherSuit: TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256...",
+        "primary_industry": "Finance",
+        "sub_industry": "bank",
+        "rank": i % 100,
+    }
+
+
+def search_response(rows: int, total: int = 163139107, start: int = 0, fields: str = "") -> dict:
+    """A ``/v2/search`` response with ``rows`` rows, projected onto ``fields`` when given."""
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    data = []
+    for i in range(start, start + rows):
+        row = search_row(i)
+        data.append({name: row.get(name) for name in selected} if selected else row)
+    return {"code": 60000, "message": "success", "total": total, "query": "app=\"Apache Tomcat\"", "data": data}
+
+
+def vuldb_record(vul_id: str, keyword: str = "nginx") -> dict:
+    return {
+        "vul_id": vul_id,
+        "title": f"{keyword} buffer overflow in request handling ({vul_id})",
+        "description": f"A crafted request can trigger a heap buffer overflow in {keyword}. " * 5,
+        "severity": ("critical", "high", "medium", "low")[hash(vul_id) % 4],
+        "cvss": 7.5,
+        "product": keyword,
+        "affected_versions": ["1.18.0", "1.20.1", "1.22.0"],
+        "published": "2024-05-01",
+    }
+
+
+def vuldb_search_response(keyword: str, page_size: int) -> dict:
+    rows = [vuldb_record(f"CVE-2024-{1000 + i}", keyword) for i in range(page_size)]
+    return {"code": 60000, "message": "success", "data": {"total": page_size, "list": rows}}
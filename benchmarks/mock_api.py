@@ -0,0 +1,177 @@
+"""A minimal local stand-in for api.zoomeye.ai used by the benchmarks.
+
+The server speaks plain HTTP/1.1 with keep-alive and serves the three endpoints used by
+``ZoomeyeService``. ``connect_latency`` is slept once per accepted connection to emulate
+the TCP/TLS handshake round trips to the real API, ``latency`` is slept once per request.
+A fraction ``error_rate`` of the requests is answered with ``503`` and ``Retry-After: 0``.
+With ``fixtures=True`` searches return the full rows of ``fixtures.py`` instead of
+four-field rows.
+
+Run as ``python -m benchmarks.mock_api`` the server listens in its own process and prints
+its port, so that its CPU time and memory are not measured with the server under test.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import random
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from . import fixtures
+
+
+def make_search_response(page: int, pagesize: int, total: int = 10000) -> dict:
+    start = (page - 1) * pagesize
+    rows = [
+        {
+            "ip": f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            "port": 80 + i % 3,
+            "domain": "",
+            "update_time": "2025-06-01T00:00:00",
+        }
+        for i in range(start, min(start + pagesize, total))
+    ]
+    return {"code": 60000, "message": "success", "total": total, "query": "", "data": rows}
+
+
+def make_vuldb_response(vul_id: str) -> dict:
+    return {"code": 60000, "message": "success", "data": {"vul_id": vul_id, "title": f"Mock entry for {vul_id}"}}
+
+
+def make_vuldb_search_response(keyword: str, page_size: int) -> dict:
+    rows = [{"vul_id": f"CVE-2025-{i:04d}", "title": f"{keyword} mock vulnerability {i}"} for i in range(page_size)]
+    return {"code": 60000, "message": "success", "data": {"total": page_size, "list": rows}}
+
+
+@functools.lru_cache(maxsize=32)
+def _encoded_search(page: int, pagesize: int, fields: str, total: int, full_rows: bool) -> bytes:
+    # Encoding a 10k-row page takes longer than serving it, so bodies are built once.
+    if full_rows:
+        start = (page - 1) * pagesize
+        payload = fixtures.search_response(max(0, min(pagesize, total - start)), total, start, fields)
+    else:
+        payload = make_search_response(page, pagesize, total)
+    return json.dumps(payload).encode()
+
+
+class MockZoomeyeAPI:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 connect_latency: float = 0.0, error_rate: float = 0.0, fixtures: bool = False,
+                 total: int = 10000, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.error_rate = error_rate
+        self.fixtures = fixtures
+        self.total = total
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def delay(self, method: str, target: str, body: bytes) -> float:
+        """Seconds slept before answering a request."""
+        return self.latency
+
+    def route(self, method: str, target: str, body: bytes) -> tuple[int, dict | bytes]:
+        """Status and JSON payload, or already encoded body, answering a request."""
+        url = urlsplit(target)
+        if method == "POST" and url.path == "/v2/search":
+            payload = json.loads(body or b"{}")
+            return 200, _encoded_search(int(payload.get("page", 1)), int(payload.get("pagesize", 10)),
+                                        payload.get("fields") or "", self.total, self.fixtures)
+        if method == "GET" and url.path == "/v2/search/vuldb":
+            params = parse_qs(url.query)
+            keyword = params.get("search", [""])[0]
+            page_size = int(params.get("page_size", ["10"])[0])
+            if self.fixtures:
+                return 200, fixtures.vuldb_search_response(keyword, page_size)
+            return 200, make_vuldb_search_response(keyword, page_size)
+        if method == "GET" and url.path.startswith("/v2/vuldb/"):
+            vul_id = url.path.rsplit("/", 1)[-1]
+            if self.fixtures:
+                return 200, {"code": 60000, "message": "success", "data": fixtures.vuldb_record(vul_id)}
+            return 200, make_vuldb_response(vul_id)
+        return 404, {"code": 404, "message": "not found"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        if self.connect_latency:
+            await asyncio.sleep(self.connect_latency)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.requests += 1
+                delay = self.delay(method, target, body)
+                if delay:
+                    await asyncio.sleep(delay)
+                extra_headers = ""
+                if self.error_rate and self._random.random() < self.error_rate:
+                    self.errors += 1
+                    status, payload = 503, {"code": 503, "message": "service unavailable"}
+                    extra_headers = "Retry-After: 0\r\n"
+                else:
+                    status, payload = self.route(method, target, body)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n{extra_headers}"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Clients going away and the server shutting down end the connection quietly.
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve_forever(**options) -> None:
+    async with MockZoomeyeAPI(**options) as api:
+        print(api.port, flush=True)
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", action="store_true")
+    parser.add_argument("--total", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    try:
+        asyncio.run(_serve_forever(**vars(parser.parse_args())))
+    except KeyboardInterrupt:
+        pass
@@ -1,19 +1,161 @@
-from .server import serve
+from .cache import SEARCH, VULDB_BY_ID, VULDB_BY_KEYWORD, ResponseCache
+from .ipset import IpSet, IpSetIndex
+from .keypool import KeyPool, parse_keys
+from .ratelimit import QuotaTracker, RetryPolicy, TokenBucket
+from .server import parse_tool_deadlines, serve
+from .spill import ResultStore
+from .vulindex import VulnerabilityIndex
+from .watch import WatchStore
 
 
 def main():
     """MCP ZoomEye Server - ZoomEye search for MCP"""
     import argparse
     import asyncio
+    import os
+
+    from dotenv import load_dotenv
 
     parser = argparse.ArgumentParser(
         description="give a model the ability to handle ZoomEye queries"
     )
     parser.add_argument("--key", type=str, help="ZoomEye API Key")
+    parser.add_argument("--keys", type=str, help="Comma separated ZoomEye API keys requests are rotated over")
+    parser.add_argument("--keys-file", type=str, help="File with one ZoomEye API key per line")
+    parser.add_argument("--key-rate-limit", type=float,
+                        help="Maximum API requests per second and key (default: unlimited)")
+    parser.add_argument("--key-budget", type=int,
+                        help="Quota units each key may consume, used to spread load over the keys")
+    parser.add_argument("--key-cooldown", type=float,
+                        help="Seconds a key answered with 429 rests without Retry-After (default: 60)")
+    parser.add_argument("--transport", choices=["stdio", "sse"],
+                        help="stdio for a single client (default), sse to serve many clients over HTTP")
+    parser.add_argument("--host", type=str, help="Address the sse transport listens on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="Port the sse transport listens on (default: 8000)")
+    parser.add_argument("--shutdown-timeout", type=float,
+                        help="Seconds open sessions get to finish on shutdown (default: 10)")
+    parser.add_argument("--client-concurrency", type=int,
+                        help="Maximum concurrent tool calls per client session (default: 8, 0 for no limit)")
+    parser.add_argument("--tool-deadline", action="append", metavar="[TOOL=]SECONDS",
+                        help="Seconds a tool call may run before it is cancelled, for every tool or for TOOL; "
+                             "may be repeated, 0 disables (default: 60 to 600 depending on the tool)")
+    parser.add_argument("--short-descriptions", action="store_true", default=None,
+                        help="Describe each tool in one paragraph and leave the search syntax guide to the "
+                             "zoomeye://search-syntax resource")
+    parser.add_argument("--base-url", type=str, help="ZoomEye API base URL (default: https://api.zoomeye.ai)")
+    parser.add_argument("--max-connections", type=int, help="Maximum number of pooled connections")
+    parser.add_argument("--max-keepalive-connections", type=int,
+                        help="Maximum number of idle keep-alive connections")
+    parser.add_argument("--keepalive-expiry", type=float, help="Seconds an idle connection is kept alive")
+    parser.add_argument("--timeout", type=float, help="Request timeout in seconds")
+    parser.add_argument("--connect-timeout", type=float, help="Connect timeout in seconds")
+    parser.add_argument("--http2", action="store_true", default=None,
+                        help="Enable HTTP/2 (requires mcp-server-zoomeye[http2])")
+    parser.add_argument("--page-concurrency", type=int,
+                        help="Maximum number of pages zoomeye_search_all fetches at the same time")
+    parser.add_argument("--batch-concurrency", type=int,
+                        help="Maximum number of lookups zoomeye_vuldb_batch runs at the same time")
+    parser.add_argument("--rate-limit", type=float, help="Maximum API requests per second (default: unlimited)")
+    parser.add_argument("--rate-burst", type=int, help="Number of requests allowed in a burst")
+    parser.add_argument("--max-retries", type=int, help="Retries for 429, 5xx and network errors (default: 3)")
+    parser.add_argument("--quota-budget", type=int, help="Maximum quota units to consume (default: unlimited)")
+    parser.add_argument("--quota-period", type=float, help="Seconds after which the quota budget resets")
+    parser.add_argument("--quota-mode", choices=["refuse", "queue"],
+                        help="Whether calls over the budget are refused or queued until the budget resets")
+    parser.add_argument("--output-format", choices=["json", "compact", "columnar", "csv", "ndjson"],
+                        help="Default encoding of tool results (default: json)")
+    parser.add_argument("--no-validate-queries", dest="validate_queries", action="store_false", default=None,
+                        help="Send search queries to ZoomEye without local validation and canonicalization")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the local response cache")
+    parser.add_argument("--cache-size", type=int, help="Maximum number of responses kept in memory")
+    parser.add_argument("--cache-path", type=str, help="SQLite file used to persist cached responses")
+    parser.add_argument("--cache-ttl-search", type=float, help="Seconds zoomeye_search responses are cached")
+    parser.add_argument("--cache-ttl-vuldb", type=float,
+                        help="Seconds vulnerability lookups by ID are cached")
+    parser.add_argument("--cache-ttl-vuldb-keyword", type=float,
+                        help="Seconds vulnerability keyword searches are cached")
+
+    parser.add_argument("--results-dir", type=str, help="Directory where large search results are stored")
+    parser.add_argument("--spill-threshold", type=int,
+                        help="Page size from which zoomeye_search stores rows on disk without spill: true "
+                             "(default: 0, only when asked)")
+    parser.add_argument("--watch-path", type=str,
+                        help="SQLite file storing the state of zoomeye_watch queries (use :memory: to not persist)")
+    parser.add_argument("--watch-full-interval", type=float,
+                        help="Seconds between full runs of a watched query (default: 86400)")
+    parser.add_argument("--max-ip-sets", type=int,
+                        help="IP sets of search results kept in memory for zoomeye_ipset (default: 200)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics over HTTP on this port")
+    parser.add_argument("--metrics-host", type=str, help="Address of the metrics endpoint (default: 127.0.0.1)")
+    parser.add_argument("--metrics-file", type=str, help="File the Prometheus metrics are written to periodically")
+    parser.add_argument("--metrics-interval", type=float,
+                        help="Seconds between writes of --metrics-file (default: 15)")
+    parser.add_argument("--vuldb-index", type=str,
+                        help="SQLite file (or :memory:) of the local vulnerability index; disabled when unset")
+    parser.add_argument("--vuldb-index-max-age", type=float,
+                        help="Seconds local vulnerability index results stay fresh (default: 86400)")
+    parser.add_argument("--vuldb-dump", type=str, help="JSON or NDJSON dump bulk-loaded into the vulnerability index")
 
     args = parser.parse_args()
-    asyncio.run(serve(args.key))
+    # Loaded before the options below fall back to environment variables.
+    load_dotenv()
+    keys = parse_keys(args.keys or "")
+    if not keys and args.keys_file:
+        keys = KeyPool.read_file(args.keys_file)
+    if not keys and args.key:
+        keys = [args.key]
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            max_entries=args.cache_size,
+            path=args.cache_path,
+            ttls={
+                SEARCH: args.cache_ttl_search,
+                VULDB_BY_ID: args.cache_ttl_vuldb,
+                VULDB_BY_KEYWORD: args.cache_ttl_vuldb_keyword,
+            },
+        )
+    vuln_index = None
+    if args.vuldb_index or args.vuldb_dump or os.getenv("ZOOMEYE_VULDB_INDEX"):
+        vuln_index = VulnerabilityIndex(path=args.vuldb_index, max_age=args.vuldb_index_max_age)
+        if args.vuldb_dump:
+            vuln_index.load_dump(args.vuldb_dump)
+    asyncio.run(serve(
+        args.key,
+        output_format=args.output_format,
+        transport=args.transport,
+        host=args.host,
+        port=args.port,
+        shutdown_timeout=args.shutdown_timeout,
+        client_concurrency=args.client_concurrency,
+        tool_deadlines=parse_tool_deadlines(args.tool_deadline) if args.tool_deadline else None,
+        short_descriptions=args.short_descriptions,
+        metrics_port=args.metrics_port,
+        metrics_host=args.metrics_host,
+        metrics_file=args.metrics_file,
+        metrics_interval=args.metrics_interval,
+        base_url=args.base_url,
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_keepalive_connections,
+        keepalive_expiry=args.keepalive_expiry,
+        timeout=args.timeout,
+        connect_timeout=args.connect_timeout,
+        http2=args.http2,
+        cache=cache,
+        page_concurrency=args.page_concurrency,
+        batch_concurrency=args.batch_concurrency,
+        rate_limiter=TokenBucket(rate=args.rate_limit, burst=args.rate_burst),
+        retry_policy=RetryPolicy(max_retries=args.max_retries),
+        quota=QuotaTracker(budget=args.quota_budget, period=args.quota_period, mode=args.quota_mode),
+        vuln_index=vuln_index,
+        keys=KeyPool(keys, rate=args.key_rate_limit, budget=args.key_budget, cooldown=args.key_cooldown),
+        validate_queries=args.validate_queries,
+        result_store=ResultStore(directory=args.results_dir),
+        spill_threshold=args.spill_threshold,
+        watch_store=WatchStore(path=args.watch_path, full_interval=args.watch_full_interval),
+        ip_sets=IpSetIndex(max_sets=args.max_ip_sets),
+    ))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
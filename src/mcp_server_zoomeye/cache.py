@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .config import env_float, env_int
+from .jsonstream import RowTable, json_default
+
+SEARCH = "search"
+VULDB_BY_ID = "vuldb_by_id"
+VULDB_BY_KEYWORD = "vuldb_by_keyword"
+
+DEFAULT_TTLS = {
+    SEARCH: 600.0,
+    VULDB_BY_ID: 86400.0,
+    VULDB_BY_KEYWORD: 3600.0,
+}
+
+
+def _normalize_list(value: Optional[str]) -> str:
+    """Normalize a comma separated list so that "port, ip" and "ip,port" compare equal."""
+    if not value:
+        return ""
+    return ",".join(sorted({item.strip() for item in value.split(",") if item.strip()}))
+
+
+def make_key(endpoint: str, **params) -> str:
+    """Build a stable key for a ZoomEye request.
+
+    ``fields`` and ``facets`` are normalized, an empty ``sub_type`` is treated as
+    the API default ``v4`` and ``None`` values are dropped, so requests that the API
+    would answer identically share one key.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if name in ("fields", "facets"):
+            value = _normalize_list(value)
+        elif name == "sub_type":
+            value = value or "v4"
+        elif name in ("page", "pagesize", "page_size") and value is not None:
+            value = int(value)
+        if value is None or value == "":
+            continue
+        normalized[name] = value
+    return endpoint + ":" + json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
+
+class ResponseCache:
+    """Two-tier cache of ZoomEye API responses.
+
+    Responses are kept in a bounded in-memory LRU and, when ``path`` is set, in an
+    SQLite database so that they survive restarts. Every endpoint has its own TTL.
+    The rows of a search read back from the database are a ``RowTable`` again, as
+    they were when stored.
+
+    Options fall back to ``ZOOMEYE_CACHE_SIZE``, ``ZOOMEYE_CACHE_PATH``,
+    ``ZOOMEYE_CACHE_TTL_SEARCH``, ``ZOOMEYE_CACHE_TTL_VULDB_BY_ID`` and
+    ``ZOOMEYE_CACHE_TTL_VULDB_BY_KEYWORD``.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, path: Optional[str] = None,
+                 ttls: Optional[dict[str, float]] = None):
+        self.max_entries = max_entries or env_int("ZOOMEYE_CACHE_SIZE", 1024)
+        self.path = path or os.getenv("ZOOMEYE_CACHE_PATH") or None
+        self.ttls = {
+            endpoint: env_float(f"ZOOMEYE_CACHE_TTL_{endpoint.upper()}", default)
+            for endpoint, default in DEFAULT_TTLS.items()
+        }
+        self.ttls.update({endpoint: ttl for endpoint, ttl in (ttls or {}).items() if ttl is not None})
+
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._stats = {endpoint: {"memory_hits": 0, "disk_hits": 0, "misses": 0} for endpoint in self.ttls}
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """The disk tier, opened on first use; None without a ``path``."""
+        if self._connection is None and self.path:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, expires REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._connection.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, expires: float, value: Any) -> None:
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, endpoint: str, key: str) -> Optional[Any]:
+        """Return the cached response for ``key``, or ``None`` on a miss."""
+        stats = self._stats.setdefault(endpoint, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > now:
+                self._memory.move_to_end(key)
+                stats["memory_hits"] += 1
+                return value
+            del self._memory[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT expires, value FROM responses WHERE key = ?", (self._digest(key),)
+            ).fetchone()
+            if row is not None and row[0] > now:
+                value = json.loads(row[1])
+                if endpoint == SEARCH and isinstance(value, dict) and isinstance(value.get("data"), list):
+                    table = RowTable()
+                    table.extend(value["data"])
+                    value["data"] = table
+                self._remember(key, row[0], value)
+                stats["disk_hits"] += 1
+                return value
+
+        stats["misses"] += 1
+        return None
+
+    def set(self, endpoint: str, key: str, value: Any) -> None:
+        ttl = self.ttls.get(endpoint, 0)
+        if ttl <= 0:
+            return
+        expires = time.time() + ttl
+        self._remember(key, expires, value)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, expires, value) VALUES (?, ?, ?, ?)",
+                (self._digest(key), endpoint, expires, json.dumps(value, ensure_ascii=False, default=json_default)),
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit and miss counters per endpoint, with the configured TTLs."""
+        endpoints = {}
+        for endpoint, counters in self._stats.items():
+            lookups = sum(counters.values())
+            hits = counters["memory_hits"] + counters["disk_hits"]
+            endpoints[endpoint] = {
+                **counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "ttl": self.ttls.get(endpoint, 0),
+            }
+        return {
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "path": self.path,
+            "endpoints": endpoints,
+        }
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
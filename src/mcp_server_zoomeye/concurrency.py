@@ -0,0 +1,95 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def bounded_map(func: Callable[[T], Awaitable[R]], items: Iterable[T], limit: int,
+                      return_exceptions: bool = False) -> AsyncIterator[tuple[T, R | BaseException]]:
+    """Run ``func`` over ``items`` with at most ``limit`` calls in flight.
+
+    Results are yielded as ``(item, result)`` pairs in the order of ``items``.
+    An exception is raised at its position unless ``return_exceptions`` is set, in
+    which case it is yielded as the result. Outstanding calls are cancelled when the
+    iteration fails or the consumer stops early, so wrap the iterator in
+    ``contextlib.aclosing`` when breaking out of it.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await func(item)
+
+    items = list(items)
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        for item, task in zip(items, tasks):
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                result = e
+            yield item, result
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in tasks:
+            # Mark failures of tasks that were never awaited as retrieved.
+            if not task.cancelled():
+                task.exception()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one underlying call.
+
+    The first caller for a key starts the call; callers arriving while it is in
+    flight wait for the same result or exception. A cancelled waiter does not
+    cancel the shared call unless it was the last one waiting for it; callers
+    arriving after that start a new call.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, list] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: Hashable, flight: list) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[R]]) -> R:
+        flight = self._flights.get(key)
+        if flight is not None and (flight[0].cancelled() or getattr(flight[0], "cancelling", lambda: 0)()):
+            # The call was cancelled by its last waiter but has not finished yet;
+            # joining it would only get its cancellation.
+            self._forget(key, flight)
+            flight = None
+        if flight is None:
+            # [task, number of waiters]
+            flight = [asyncio.ensure_future(func()), 0]
+            self._flights[key] = flight
+            flight[0].add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if flight[1] == 1 and not task.done():
+                task.cancel()
+                # Task.cancelling() is new in Python 3.11; later callers start a new call.
+                self._forget(key, flight)
+            raise
+        finally:
+            flight[1] -= 1
@@ -0,0 +1,48 @@
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def state_dir(*parts: str) -> str:
+    """A private per-user directory of the server's files, created with mode 0o700.
+
+    It is ``ZOOMEYE_STATE_DIR`` when set, otherwise ``mcp-server-zoomeye`` under
+    ``%LOCALAPPDATA%`` on Windows and ``$XDG_CACHE_HOME`` (default ``~/.cache``)
+    elsewhere, followed by ``parts``.
+    """
+    return private_dir(state_path(*parts))
+
+
+def state_path(*parts: str) -> str:
+    """The path of ``state_dir(*parts)``, without creating it."""
+    base = os.getenv("ZOOMEYE_STATE_DIR")
+    if not base:
+        if os.name == "nt":
+            root = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            root = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        base = os.path.join(root, "mcp-server-zoomeye")
+    return os.path.join(base, *parts)
+
+
+def private_dir(path: str) -> str:
+    """Create ``path`` if needed and make it accessible to the current user only."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.name != "nt":
+        os.chmod(path, 0o700)
+    return path
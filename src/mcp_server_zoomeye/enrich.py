@@ -0,0 +1,50 @@
+"""Annotating search results with the vulnerabilities of the products they run.
+
+The rows of a search are grouped by their ``product`` and ``version``; every
+distinct pair is looked up once with a vulnerability keyword search, and each row
+is annotated with the IDs found for its pair. The vulnerabilities themselves are
+summarized once per result rather than repeated on every row.
+"""
+from typing import Optional
+
+from .vulindex import record_id
+
+# Fields an enrichment search always requests: the asset identity and the product.
+ENRICH_FIELDS = ("ip", "port", "domain", "product", "version")
+# Fields of a vulnerability record kept in the summary of an enrichment result.
+VULNERABILITY_SUMMARY_FIELDS = ("title", "severity", "level", "cvss", "score", "published")
+
+
+def enrich_fields(fields: Optional[str]) -> str:
+    """``fields`` extended with the fields needed to group rows by product."""
+    names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    return ",".join(names + [name for name in ENRICH_FIELDS if name not in names])
+
+
+def product_version(row) -> Optional[tuple[str, str]]:
+    """The ``(product, version)`` of a search row, or None when it has no product."""
+    if not isinstance(row, dict):
+        return None
+    product = row.get("product")
+    if isinstance(product, list):
+        product = next((item for item in product if isinstance(item, str) and item.strip()), None)
+    if not isinstance(product, str) or not product.strip():
+        return None
+    version = row.get("version")
+    return product.strip(), version.strip() if isinstance(version, str) else ""
+
+
+def lookup_keyword(pair: tuple[str, str]) -> str:
+    """Vulnerability search keyword of a product and version."""
+    product, version = pair
+    return f"{product} {version}" if version else product
+
+
+def summarize(record) -> Optional[tuple[str, dict]]:
+    """The ID of a vulnerability record and its summary fields."""
+    if not isinstance(record, dict):
+        return None
+    vul_id = record_id(record)
+    if vul_id is None:
+        return None
+    return vul_id, {name: record[name] for name in VULNERABILITY_SUMMARY_FIELDS if name in record}
@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+from typing import Any, Optional
+
+from .jsonstream import RowTable, json_default
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+OUTPUT_FORMATS = ("json", "compact", "columnar", "csv", "ndjson")
+# Rows of a ``RowTable`` serialized at a time.
+_TABLE_BATCH = 500
+
+
+def _encode(value: Any, indent: bool = False) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=json_default, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            pass
+    if indent:
+        return json.dumps(value, ensure_ascii=False, indent=2, default=json_default).encode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+
+
+def dumps(value: Any, indent: bool = False) -> str:
+    """Serialize ``value`` to JSON, using orjson when it is installed."""
+    return _encode(value, indent).decode("utf-8")
+
+
+def _dumps_table(meta: dict, rows: RowTable, indent: bool) -> str:
+    """``dumps`` of a search result whose rows are a ``RowTable``, in batches of rows.
+
+    Only one batch of rows is turned back into dicts and encoded at a time instead
+    of the whole page. Each batch is encoded as ``{"data": [...]}``, which puts its
+    rows at the right indentation, and is appended to the output without that
+    wrapper. The rows are written after the other members.
+    """
+    opening, closing = (b'{\n  "data": [\n', b"\n  ]\n}") if indent else (b'{"data":[', b"]}")
+    output = bytearray(_encode(meta, indent)[:-1].rstrip())
+    if meta:
+        output += b","
+    if not rows:
+        output += b'\n  "data": []\n}' if indent else b'"data":[]}'
+        return output.decode("utf-8")
+    output += opening[1:]
+    for start in range(0, len(rows), _TABLE_BATCH):
+        if start:
+            output += b",\n" if indent else b","
+        encoded = _encode({"data": rows[start:start + _TABLE_BATCH]}, indent)
+        output += memoryview(encoded)[len(opening):-len(closing)]
+    output += closing
+    return output.decode("utf-8")
+
+
+def split_rows(result: Any) -> tuple[Optional[dict], Optional[list]]:
+    """Split an API response into its metadata and its list of result rows.
+
+    Search responses keep their rows in ``data``, vulnerability searches in
+    ``data.list``. ``(None, None)`` is returned for responses without rows.
+    """
+    if not isinstance(result, dict):
+        return None, None
+    data = result.get("data")
+    if isinstance(data, (list, RowTable)):
+        return {name: value for name, value in result.items() if name != "data"}, data
+    if isinstance(data, dict) and isinstance(data.get("list"), list):
+        meta = {name: value for name, value in result.items() if name != "data"}
+        meta.update({name: value for name, value in data.items() if name != "list"})
+        return meta, data["list"]
+    return None, None
+
+
+def _truncate(value: Any, max_length: int) -> Any:
+    if isinstance(value, str) and len(value) > max_length:
+        return f"{value[:max_length]}...[+{len(value) - max_length} chars]"
+    if isinstance(value, list):
+        return [_truncate(item, max_length) for item in value]
+    if isinstance(value, dict):
+        return {name: _truncate(item, max_length) for name, item in value.items()}
+    return value
+
+
+def shape_rows(rows: list, select: Optional[list[str]] = None, max_field_length: Optional[int] = None) -> list:
+    """Project rows onto ``select`` and truncate long string values."""
+    if select:
+        rows = [{name: row.get(name) for name in select} if isinstance(row, dict) else row for row in rows]
+    if max_field_length:
+        rows = [_truncate(row, max_field_length) for row in rows]
+    return rows
+
+
+def columns_of(rows: list) -> list[str]:
+    """Column names of ``rows`` in first-seen order."""
+    if isinstance(rows, RowTable):
+        return list(rows.columns)
+    columns = {}
+    for row in rows:
+        if isinstance(row, dict):
+            columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return dumps(value)
+    return value
+
+
+def output_options(arguments: dict, default_format: str = "json") -> tuple[str, Optional[list[str]], Optional[int]]:
+    """The ``output_format``, ``select`` and ``max_field_length`` arguments of a tool call.
+
+    Tools check them before any request is made, so an invalid value spends no quota.
+
+    Raises:
+        ValueError: If a value is invalid.
+    """
+    output_format = arguments.get("output_format") or default_format
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output_format: {output_format}. Supported: {', '.join(OUTPUT_FORMATS)}")
+    select = arguments.get("select")
+    if select is not None and not isinstance(select, str):
+        raise ValueError("select must be a string of keys separated by commas")
+    max_field_length = arguments.get("max_field_length")
+    if max_field_length is not None and (isinstance(max_field_length, bool) or not isinstance(max_field_length, int)
+                                         or max_field_length < 1):
+        raise ValueError(f"max_field_length must be a positive integer, got {max_field_length!r}")
+    names = [name.strip() for name in select.split(",") if name.strip()] if select else None
+    return output_format, names or None, max_field_length
+
+
+def format_result(result: Any, output_format: str = "json", select: Optional[list[str]] = None,
+                  max_field_length: Optional[int] = None) -> str:
+    """Serialize a tool result.
+
+    Formats:
+        json: indented JSON, the historical output.
+        compact: JSON without whitespace.
+        columnar: compact JSON with the rows replaced by ``columns`` and ``rows`` value arrays.
+        csv: a ``#``-prefixed JSON metadata line followed by the rows as CSV.
+        ndjson: the metadata object on the first line, then one row per line.
+
+    Results without rows are written as compact JSON by the row oriented formats.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output_format: {output_format}. Supported: {', '.join(OUTPUT_FORMATS)}")
+    if result is None:
+        return ""
+
+    meta, rows = split_rows(result)
+    if rows is not None and (select or max_field_length):
+        rows = shape_rows(rows, select, max_field_length)
+        if isinstance(result["data"], dict):
+            result = {**result, "data": {**result["data"], "list": rows}}
+        else:
+            result = {**result, "data": rows}
+    elif rows is None and max_field_length:
+        result = _truncate(result, max_field_length)
+
+    if isinstance(rows, RowTable) and output_format in ("json", "compact"):
+        return _dumps_table(meta, rows, indent=output_format == "json")
+    if output_format == "json":
+        return dumps(result, indent=True)
+    if output_format == "compact" or rows is None:
+        return dumps(result)
+
+    columns = columns_of(rows)
+    if output_format == "columnar":
+        if isinstance(rows, RowTable):
+            return dumps({**meta, "columns": columns, "rows": rows.value_rows()})
+        values = [[row.get(name) for name in columns] if isinstance(row, dict) else row for row in rows]
+        return dumps({**meta, "columns": columns, "rows": values})
+    if output_format == "ndjson":
+        return "\n".join([dumps(meta)] + [dumps(row) for row in rows])
+
+    buffer = io.StringIO()
+    buffer.write("# " + dumps(meta) + "\n")
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        if isinstance(row, dict):
+            writer.writerow([_csv_value(row.get(name)) for name in columns])
+    return buffer.getvalue()
@@ -0,0 +1,167 @@
+import ipaddress
+import socket
+import sys
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+from .config import env_int
+
+IP_SET_OPERATIONS = ("union", "intersection", "difference", "within", "info")
+# Array type code of unsigned 32 bit integers, which packed IPv4 addresses are read
+# into: "I" on every common platform, "L" where C ints are narrower.
+V4_TYPECODE = next((code for code in "IL" if array(code).itemsize == 4), None)
+if V4_TYPECODE is None:
+    raise ImportError("No array type code holds unsigned 32 bit integers on this platform")
+
+
+def parse_ip(value: str) -> Optional[tuple[int, int]]:
+    """``(version, integer)`` of an IPv4 or IPv6 address, or None if ``value`` is not one."""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, value), "big")
+    except (OSError, TypeError):
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, value), "big")
+    except (OSError, TypeError):
+        return None
+
+
+def parse_networks(cidrs: Iterable[str]) -> list:
+    """The networks of ``cidrs``, with overlapping ones collapsed.
+
+    Raises:
+        ValueError: If a value is not an IPv4 or IPv6 network.
+    """
+    networks = {4: [], 6: []}
+    for cidr in cidrs:
+        try:
+            network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+        except ValueError:
+            raise ValueError(f"Invalid CIDR: {cidr}")
+        networks[network.version].append(network)
+    return [*ipaddress.collapse_addresses(networks[4]), *ipaddress.collapse_addresses(networks[6])]
+
+
+class IpSet:
+    """Distinct IP addresses held as sorted integers.
+
+    IPv4 addresses take four bytes each in an unsigned ``array``; IPv6 addresses are
+    kept as a sorted list of ints. Sorting makes CIDR containment a pair of binary
+    searches per network.
+    """
+
+    __slots__ = ("v4", "v6")
+
+    def __init__(self, v4: Iterable[int] = (), v6: Iterable[int] = ()):
+        self.v4 = array(V4_TYPECODE, sorted(set(v4)))
+        self.v6 = sorted(set(v6))
+
+    @classmethod
+    def from_values(cls, values: Iterable) -> "IpSet":
+        """The addresses among ``values``; lists of addresses, as in web results, are flattened."""
+        # IPv4 addresses are packed in network order and converted in one go.
+        packed, v6 = bytearray(), []
+        for value in values:
+            for address in value if isinstance(value, (list, tuple)) else (value,):
+                if not isinstance(address, str):
+                    continue
+                try:
+                    packed += socket.inet_pton(socket.AF_INET, address)
+                    continue
+                except OSError:
+                    pass
+                parsed = parse_ip(address)
+                if parsed is not None:
+                    v6.append(parsed[1])
+        v4 = array(V4_TYPECODE)
+        v4.frombytes(packed)
+        if sys.byteorder == "little":
+            v4.byteswap()
+        return cls(v4, v6)
+
+    def __len__(self) -> int:
+        return len(self.v4) + len(self.v6)
+
+    def __iter__(self):
+        for number in self.v4:
+            yield str(ipaddress.IPv4Address(number))
+        for number in self.v6:
+            yield str(ipaddress.IPv6Address(number))
+
+    def union(self, other: "IpSet") -> "IpSet":
+        return IpSet(set(self.v4).union(other.v4), set(self.v6).union(other.v6))
+
+    def intersection(self, other: "IpSet") -> "IpSet":
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        return IpSet(set(small.v4).intersection(large.v4), set(small.v6).intersection(large.v6))
+
+    def difference(self, other: "IpSet") -> "IpSet":
+        return IpSet(set(self.v4).difference(other.v4), set(self.v6).difference(other.v6))
+
+    def _range(self, network) -> tuple[list, int, int]:
+        numbers = self.v4 if network.version == 4 else self.v6
+        first = int(network.network_address)
+        return numbers, bisect_left(numbers, first), bisect_right(numbers, first + network.num_addresses - 1)
+
+    def count_within(self, network) -> int:
+        _, start, end = self._range(network)
+        return end - start
+
+    def within(self, networks: list) -> "IpSet":
+        """The addresses inside any of ``networks``, which must not overlap (see ``parse_networks``)."""
+        result = IpSet()
+        for network in sorted(networks, key=lambda network: (network.version, network.network_address)):
+            numbers, start, end = self._range(network)
+            if network.version == 4:
+                result.v4.extend(numbers[start:end])
+            else:
+                result.v6.extend(numbers[start:end])
+        return result
+
+    def sample(self, size: int) -> list[str]:
+        sample = []
+        for address in self:
+            if len(sample) >= size:
+                break
+            sample.append(address)
+        return sample
+
+
+class IpSetIndex:
+    """In-process IP sets of search results, keyed by result set ID.
+
+    Search results register the IPs of their rows here, so that the results of
+    different queries can be combined without sending their rows again. The sets
+    used least recently are dropped once more than ``max_sets`` are stored.
+
+    ``max_sets`` falls back to ``ZOOMEYE_IP_SETS_MAX`` (default 200).
+    """
+
+    def __init__(self, max_sets: Optional[int] = None):
+        self.max_sets = max_sets or env_int("ZOOMEYE_IP_SETS_MAX", 200)
+        self._sets: dict[str, tuple[IpSet, dict]] = {}
+
+    def add(self, ips: IpSet, set_id: Optional[str] = None, source: Optional[dict] = None) -> str:
+        set_id = set_id or uuid.uuid4().hex[:16]
+        self._sets.pop(set_id, None)
+        self._sets[set_id] = (ips, {"created": time.time(), **(source or {})})
+        while len(self._sets) > self.max_sets:
+            del self._sets[next(iter(self._sets))]
+        return set_id
+
+    def __contains__(self, set_id: str) -> bool:
+        return set_id in self._sets
+
+    def get(self, set_id: str) -> IpSet:
+        entry = self._sets.pop(set_id, None)
+        if entry is None:
+            raise ValueError(f"Unknown IP set: {set_id}")
+        self._sets[set_id] = entry
+        return entry[0]
+
+    def list(self) -> list[dict]:
+        return [{"ip_set": set_id, "count": len(ips), "ipv4": len(ips.v4), "ipv6": len(ips.v6), **source}
+                for set_id, (ips, source) in self._sets.items()]
@@ -0,0 +1,286 @@
+import codecs
+import json
+import operator
+import re
+from collections.abc import Sequence
+from typing import Any, Iterable, Optional
+
+_WHITESPACE = " \t\r\n"
+_SKIP_WHITESPACE = re.compile(r"[ \t\r\n]*").match
+_decoder = json.JSONDecoder()
+# Value of a column that a row does not have.
+_MISSING = object()
+
+
+def _incomplete(text: str, end: int) -> bool:
+    """Whether a number or literal decoded up to ``end`` may continue in the next chunk.
+
+    "12" may continue as "123" and "1" as "1.5" or "1e3".
+    """
+    return end >= len(text) or text[end] in ".eE"
+
+
+class RowStream:
+    """Incremental parser for a JSON object whose rows are in one top-level array.
+
+    Bytes are passed to ``feed`` as they arrive; every complete element of the
+    ``rows_key`` array is decoded and returned as soon as it has been received, so
+    only the current row (plus the latest network chunk) is buffered at a time.
+    All other top-level members are decoded into ``fields``; ``has_rows`` tells
+    whether the document had a ``rows_key`` array.
+
+    Elements are decoded with the C accelerated JSON scanner; an
+    element that fails to decode is assumed to be incomplete and is retried when
+    more bytes arrive, so malformed input is reported by ``close``.
+    """
+
+    def __init__(self, rows_key: str = "data"):
+        self.rows_key = rows_key
+        self.fields: dict[str, Any] = {}
+        self.rows_seen = 0
+        self.has_rows = False
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._text = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def _skip_whitespace(self) -> Optional[str]:
+        text = self._text
+        while self._pos < len(text) and text[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return text[self._pos] if self._pos < len(text) else None
+
+    def _decode(self, scalar_needs_delimiter: bool = False):
+        """Decode the value at the current position, returning ``(value, end)`` or None if incomplete."""
+        try:
+            value, end = _decoder.raw_decode(self._text, self._pos)
+        except json.JSONDecodeError:
+            return None
+        if scalar_needs_delimiter and not isinstance(value, (str, list, dict)) and _incomplete(self._text, end):
+            return None
+        return value, end
+
+    def feed(self, chunk: bytes) -> list:
+        """Consume ``chunk`` and return the rows it completed."""
+        self._text = self._text[self._pos:] + self._utf8.decode(chunk)
+        self._pos = 0
+        rows = []
+        while True:
+            char = self._skip_whitespace()
+            if char is None or self._state == "done":
+                break
+            if self._state == "start":
+                if char != "{":
+                    raise json.JSONDecodeError("Expected a JSON object", self._text, self._pos)
+                self._pos += 1
+                self._state = "key"
+            elif self._state in ("key", "rows") and char == ",":
+                self._pos += 1
+            elif self._state == "key":
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                    continue
+                if char != '"':
+                    raise json.JSONDecodeError("Expected an object key", self._text, self._pos)
+                decoded = self._decode()
+                if decoded is None:
+                    break
+                key, end = decoded
+                separator = self._text.find(":", end)
+                if separator < 0:
+                    break
+                self._key = key
+                self._pos = separator + 1
+                self._state = "value"
+            elif self._state == "value":
+                if self._key == self.rows_key and char == "[":
+                    self._pos += 1
+                    self.has_rows = True
+                    self._state = "rows"
+                    continue
+                decoded = self._decode(scalar_needs_delimiter=True)
+                if decoded is None:
+                    break
+                self.fields[self._key], self._pos = decoded
+                self._state = "key"
+            else:  # rows
+                if char == "]":
+                    self._pos += 1
+                    self._state = "key"
+                    continue
+                if not self._read_rows(rows):
+                    break
+        return rows
+
+    def _read_rows(self, rows: list) -> bool:
+        """Decode the rows at the current position, returning False when more bytes are needed.
+
+        This is the hot loop of large responses, kept free of the per-value
+        bookkeeping of ``feed``.
+        """
+        text = self._text
+        size = len(text)
+        scan = _decoder.scan_once
+        pos = self._pos
+        try:
+            while True:
+                pos = _SKIP_WHITESPACE(text, pos).end()
+                if pos >= size:
+                    return False
+                char = text[pos]
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "]":
+                    return True
+                try:
+                    row, end = scan(text, pos)
+                except (StopIteration, ValueError):
+                    return False
+                if not isinstance(row, (dict, list, str)) and _incomplete(text, end):
+                    return False
+                rows.append(row)
+                self.rows_seen += 1
+                pos = end
+        finally:
+            self._pos = pos
+
+    def close(self) -> None:
+        """Check that the whole document has been received."""
+        self.feed(b"")
+        if self._state != "done":
+            raise json.JSONDecodeError("Incomplete or invalid JSON document", self._text, self._pos)
+
+
+def _row_values(row: dict) -> tuple:
+    return tuple(row.values())
+
+
+class RowTable(Sequence):
+    """Search result rows stored as tuples of values over shared column names.
+
+    Every decoded row dict holds its own key strings and a hash table; the table
+    keeps the column names once and each row as a tuple, a fraction of the memory
+    for the wide rows of large pages. With ``fields``, only those keys (or, for
+    dotted names such as ``ssl.jarm``, their top-level key) are kept.
+
+    Rows are read back as new dicts, by index or iteration, with the keys they had.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        self.columns: list[str] = []
+        self.values: list = []
+        self._index: dict[str, int] = {}
+        # Keys of a row that had a value for every column, and the function taking
+        # those values in ``columns`` order: rows with the same keys skip the lookups.
+        self._keys: Optional[tuple] = None
+        self._take = None
+        # Whether every row has a value for every column.
+        self._dense = True
+        self._allowed = None
+        if fields:
+            self._allowed = set()
+            for name in fields:
+                self._allowed.update((name, name.split(".", 1)[0]))
+
+    @staticmethod
+    def fields_of(fields: Optional[str]) -> Optional[list[str]]:
+        """The names in a comma separated ``fields`` argument."""
+        return [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+
+    def append(self, row) -> None:
+        if not isinstance(row, dict):
+            self.values.append(row)
+            return
+        keys = tuple(row)
+        if keys == self._keys:
+            self.values.append(self._take(row))
+            return
+        width = len(self.columns)
+        values = [_MISSING] * width
+        for name, value in row.items():
+            index = self._index.get(name)
+            if index is None:
+                if self._allowed is not None and name not in self._allowed:
+                    continue
+                index = self._index[name] = len(self.columns)
+                self.columns.append(name)
+                values.append(_MISSING)
+            values[index] = value
+        if (self.values and len(self.columns) > width) or _MISSING in values:
+            self._dense = False
+        else:
+            kept = tuple(name for name in keys if name in self._index)
+            if kept and kept == tuple(self.columns):
+                self._keys = keys
+                if kept == keys:
+                    self._take = _row_values
+                elif len(kept) == 1:
+                    self._take = lambda row, name=kept[0]: (row[name],)
+                else:
+                    self._take = operator.itemgetter(*kept)
+        self.values.append(tuple(values))
+
+    def extend(self, rows: Iterable) -> None:
+        for row in rows:
+            self.append(row)
+
+    def _row(self, values):
+        if not isinstance(values, tuple):
+            return values
+        if self._dense:
+            return dict(zip(self.columns, values))
+        return {name: value for name, value in zip(self.columns, values) if value is not _MISSING}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(values) for values in self.values[index]]
+        return self._row(self.values[index])
+
+    def __iter__(self):
+        for values in self.values:
+            yield self._row(values)
+
+    def __repr__(self) -> str:
+        return f"RowTable({len(self.values)} rows, columns={self.columns})"
+
+    def column(self, name: str) -> list:
+        """The values of column ``name``, ``None`` for rows without it."""
+        index = self._index.get(name)
+        if index is None:
+            return [None] * len(self.values)
+        column = []
+        for values in self.values:
+            value = values[index] if isinstance(values, tuple) and index < len(values) else None
+            column.append(None if value is _MISSING else value)
+        return column
+
+    def value_rows(self) -> list:
+        """The rows as value lists in ``columns`` order, ``None`` for missing values."""
+        width = len(self.columns)
+        rows = []
+        for values in self.values:
+            if not isinstance(values, tuple):
+                rows.append(values)
+            elif self._dense or (len(values) == width and _MISSING not in values):
+                rows.append(values)
+            else:
+                values = values + (None,) * (width - len(values))
+                rows.append(tuple(None if value is _MISSING else value for value in values))
+        return rows
+
+
+def json_default(value):
+    """``default`` hook of ``json.dumps`` and orjson, serializing a ``RowTable`` as a list of rows."""
+    if isinstance(value, RowTable):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import time
+from typing import Iterable, Optional
+
+from .config import env_float, env_int
+from .ratelimit import TokenBucket
+
+# Responses that say something about the key rather than the request: invalid key,
+# exhausted account quota and rate limiting.
+KEY_FAILURE_STATUS_CODES = frozenset({401, 402, 429})
+
+
+def parse_keys(text: str) -> list[str]:
+    """Keys separated by commas, whitespace or newlines; ``#`` starts a comment line."""
+    keys = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            keys.extend(key for key in line.replace(",", " ").split() if key)
+    return list(dict.fromkeys(keys))
+
+
+class ApiKey:
+    """Usage and health of one API key in a ``KeyPool``."""
+
+    def __init__(self, key: str, rate: float, burst: Optional[int], budget: int):
+        self.key = key
+        self.name = f"{key[:4]}...{key[-4:]}" if len(key) > 12 else "****"
+        self.bucket = TokenBucket(rate=rate, burst=burst)
+        self.budget = budget
+        self.consumed = 0
+        # Units left on the account, as last reported by the API.
+        self.remaining: Optional[int] = None
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.last_status: Optional[int] = None
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+
+    def cooling_down(self, now: float) -> bool:
+        return self.cooldown_until > now
+
+    def headroom(self, most_remaining: Optional[int] = None) -> float:
+        """Share of this key's quota and rate still available, from 0 to 1.
+
+        The quota share is the lower of the share of ``budget`` left and, when the API
+        reported it, the ``remaining`` units relative to ``most_remaining``, the most
+        any key of the pool has left.
+        """
+        quota = max(0.0, 1 - self.consumed / self.budget) if self.budget > 0 else 1.0
+        if self.remaining is not None and most_remaining:
+            quota = min(quota, self.remaining / most_remaining)
+        rate = self.bucket.available() / self.bucket.burst if self.bucket.enabled else 1.0
+        return min(quota, rate) / (1 + self.in_flight)
+
+    def stats(self, now: float, most_remaining: Optional[int] = None) -> dict:
+        stats = {
+            "key": self.name,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consumed": self.consumed,
+            "in_flight": self.in_flight,
+            "last_status": self.last_status,
+            "headroom": round(self.headroom(most_remaining), 3),
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+        }
+        if self.budget > 0:
+            stats["budget"] = self.budget
+        if self.remaining is not None:
+            stats["remaining"] = self.remaining
+        return stats
+
+
+class KeyPool:
+    """Rotates requests over several ZoomEye API keys.
+
+    Every request goes to the available key with the most headroom, the lower of its
+    remaining quota share and its available rate tokens (with a per-key ``rate``),
+    shared between its requests in flight. The quota share follows the units the API
+    reports as remaining for the key, relative to the key with the most left, and the
+    per-key ``budget``; a key the API has not reported on yet counts as unused. A key answered
+    with 429 is rested for ``Retry-After`` or ``cooldown`` seconds, one answered with
+    401 or 402 for ``penalty`` seconds. When every key is resting, a request waits
+    for a key rested after 429 to come back, for at most ``max_wait`` seconds; keys
+    refused with 401 or 402, or longer rests, fail the request at once.
+
+    Keys fall back to ``ZOOMEYE_API_KEYS`` (separated by commas or whitespace), the
+    file named by ``ZOOMEYE_API_KEYS_FILE`` (one key per line) and ``ZOOMEYE_API_KEY``.
+    The other options fall back to ``ZOOMEYE_KEY_RATE_LIMIT``, ``ZOOMEYE_KEY_RATE_BURST``,
+    ``ZOOMEYE_KEY_BUDGET``, ``ZOOMEYE_KEY_COOLDOWN``, ``ZOOMEYE_KEY_PENALTY`` and
+    ``ZOOMEYE_KEY_MAX_WAIT``.
+    """
+
+    def __init__(self, keys: Optional[Iterable[str]] = None, rate: Optional[float] = None,
+                 burst: Optional[int] = None, budget: Optional[int] = None, cooldown: Optional[float] = None,
+                 penalty: Optional[float] = None, max_wait: Optional[float] = None):
+        keys = [key.strip() for key in keys or [] if key and key.strip()]
+        if not keys:
+            keys = parse_keys(os.getenv("ZOOMEYE_API_KEYS", ""))
+        if not keys and os.getenv("ZOOMEYE_API_KEYS_FILE"):
+            keys = self.read_file(os.getenv("ZOOMEYE_API_KEYS_FILE"))
+        if not keys and os.getenv("ZOOMEYE_API_KEY"):
+            keys = [os.getenv("ZOOMEYE_API_KEY")]
+        rate = rate if rate is not None else env_float("ZOOMEYE_KEY_RATE_LIMIT", 0.0)
+        burst = burst or env_int("ZOOMEYE_KEY_RATE_BURST", 0) or None
+        budget = budget if budget is not None else env_int("ZOOMEYE_KEY_BUDGET", 0)
+        self.cooldown = cooldown if cooldown is not None else env_float("ZOOMEYE_KEY_COOLDOWN", 60.0)
+        self.penalty = penalty if penalty is not None else env_float("ZOOMEYE_KEY_PENALTY", 3600.0)
+        self.max_wait = max_wait if max_wait is not None else env_float("ZOOMEYE_KEY_MAX_WAIT", 60.0)
+        self.keys = [ApiKey(key, rate, burst, budget) for key in dict.fromkeys(keys)]
+
+    @staticmethod
+    def read_file(path: str) -> list[str]:
+        with open(path, "r", encoding="utf-8") as f:
+            return parse_keys(f.read())
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _most_remaining(self) -> Optional[int]:
+        return max((key.remaining for key in self.keys if key.remaining is not None), default=None)
+
+    def _choose(self, now: float, exclude: Iterable[ApiKey] = ()) -> Optional[ApiKey]:
+        candidates = [key for key in self.keys if not key.cooling_down(now) and key not in exclude]
+        if not candidates:
+            return None
+        most_remaining = self._most_remaining()
+        # Most headroom first, least recently used on ties so equal keys take turns.
+        return max(candidates, key=lambda key: (round(key.headroom(most_remaining), 3), -key.last_used))
+
+    async def acquire(self, exclude: Iterable[ApiKey] = ()) -> ApiKey:
+        """Take the key with the most headroom, waiting for its rate limit if needed.
+
+        Keys in ``exclude`` are only used when no other key is available. When every
+        key is cooling down, waits for the first key rested after 429 to come back,
+        if it does within ``max_wait`` seconds.
+
+        Raises:
+            ValueError: If the pool has no keys, or every key was refused with 401 or
+                402 or rests for longer than ``max_wait``.
+        """
+        if not self.keys:
+            raise ValueError(
+                "ZoomEye API key is required. Please set it via environment variable ZOOMEYE_API_KEY or pass it to the constructor.")
+        while True:
+            now = time.monotonic()
+            key = self._choose(now, exclude) or self._choose(now)
+            if key is not None:
+                break
+            waits = [entry.cooldown_until - now for entry in self.keys if entry.last_status == 429]
+            if not waits or min(waits) > self.max_wait:
+                raise ValueError(self._exhausted_message(now))
+            await asyncio.sleep(min(waits))
+        key.in_flight += 1
+        key.last_used = now
+        try:
+            await key.bucket.acquire()
+        except BaseException:
+            key.in_flight -= 1
+            raise
+        return key
+
+    def _exhausted_message(self, now: float) -> str:
+        rejected = sum(1 for key in self.keys if key.last_status in (401, 402))
+        return (f"All ZoomEye API keys are rejected or over quota ({rejected} of {len(self.keys)} refused with "
+                f"401 or 402); the first key comes back in "
+                f"{min(key.cooldown_until for key in self.keys) - now:.0f}s. Check the keys and their quota.")
+
+    def release(self, key: ApiKey, status: Optional[int], consumed: int = 0,
+                retry_after: Optional[float] = None, remaining: Optional[int] = None) -> None:
+        """Record the outcome of a request made with ``key``, and the ``remaining`` units the API reported."""
+        key.in_flight -= 1
+        key.requests += 1
+        key.consumed += consumed
+        if remaining is not None:
+            key.remaining = remaining
+        key.last_status = status
+        if status in KEY_FAILURE_STATUS_CODES:
+            key.failures += 1
+            if len(self.keys) > 1:
+                # A single key is left to the retry policy, there is nothing to rotate to.
+                rest = (retry_after if retry_after is not None else self.cooldown) if status == 429 else self.penalty
+                key.cooldown_until = time.monotonic() + rest
+
+    def available(self, exclude: Iterable[ApiKey] = ()) -> int:
+        """Number of keys, other than those in ``exclude``, that are not cooling down."""
+        now = time.monotonic()
+        return sum(1 for key in self.keys if not key.cooling_down(now) and key not in exclude)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        most_remaining = self._most_remaining()
+        return {
+            "keys": len(self.keys),
+            "available": self.available(),
+            "usage": [key.stats(now, most_remaining) for key in self.keys],
+        }
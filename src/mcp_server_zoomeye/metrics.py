@@ -0,0 +1,232 @@
+import asyncio
+import bisect
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Upper bounds, in bytes, of the payload size histogram buckets.
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_HELP = {
+    "zoomeye_upstream_requests_total": "ZoomEye API requests by endpoint and HTTP status or error class",
+    "zoomeye_upstream_request_seconds": "Time from sending a ZoomEye API request to receiving its body",
+    "zoomeye_upstream_response_bytes": "Size of ZoomEye API response bodies",
+    "zoomeye_upstream_in_flight": "ZoomEye API requests in progress",
+    "zoomeye_decode_seconds": "Time spent decoding ZoomEye API response JSON",
+    "zoomeye_service_call_seconds": "Duration of ZoomeyeService method calls",
+    "zoomeye_service_errors_total": "ZoomeyeService method calls that raised, by exception type",
+    "zoomeye_tool_calls_total": "MCP tool calls by tool and outcome",
+    "zoomeye_tool_call_seconds": "Duration of MCP tool calls, including serialization",
+    "zoomeye_tool_in_flight": "MCP tool calls in progress",
+    "zoomeye_serialize_seconds": "Time spent serializing tool results, by output format",
+    "zoomeye_tool_output_bytes": "Size of serialized tool results",
+}
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate of the ``q`` quantile, interpolated linearly within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
+
+
+def label_value(value, known) -> str:
+    """``value`` if it is one of ``known``, else ``"unknown"``.
+
+    Labels taken from client input go through here, so that a client cannot
+    create an unbounded number of series.
+    """
+    return value if value in known else "unknown"
+
+
+def _labels_text(labels: tuple, extra: str = "") -> str:
+    parts = ['{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """In-process counters, gauges and histograms.
+
+    Updates are plain dictionary operations on the event loop thread, cheap enough
+    to stay enabled in production. Series are keyed by metric name and a tuple of
+    label pairs. ``snapshot()`` returns a JSON friendly summary with p50/p99
+    estimates and ``prometheus()`` the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._gauges: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, _Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        series = self._counters.setdefault(name, {})
+        key = tuple(labels.items())
+        series[key] = series.get(key, 0) + value
+
+    def add(self, name: str, delta: float, **labels) -> None:
+        series = self._gauges.setdefault(name, {})
+        key = tuple(labels.items())
+        series[key] = series.get(key, 0) + delta
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels) -> None:
+        series = self._histograms.setdefault(name, {})
+        key = tuple(labels.items())
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = _Histogram(buckets)
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def in_flight(self, name: str, **labels):
+        self.add(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add(name, -1, **labels)
+
+    def snapshot(self) -> dict:
+        def series_name(name: str, key: tuple) -> str:
+            return name + _labels_text(key)
+
+        histograms = {}
+        for name, series in self._histograms.items():
+            for key, histogram in series.items():
+                histograms[series_name(name, key)] = {
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "p50": _round(histogram.quantile(0.5)),
+                    "p99": _round(histogram.quantile(0.99)),
+                }
+        return {
+            "uptime": round(time.time() - self.started, 3),
+            "counters": {series_name(name, key): value
+                         for name, series in self._counters.items() for key, value in series.items()},
+            "gauges": {series_name(name, key): value
+                       for name, series in self._gauges.items() for key, value in series.items()},
+            "histograms": histograms,
+        }
+
+    def prometheus(self) -> str:
+        lines = []
+
+        def header(name: str, kind: str) -> None:
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in sorted(self._counters.items()):
+            header(name, "counter")
+            lines.extend(f"{name}{_labels_text(key)} {value:g}" for key, value in series.items())
+        for name, series in sorted(self._gauges.items()):
+            header(name, "gauge")
+            lines.extend(f"{name}{_labels_text(key)} {value:g}" for key, value in series.items())
+        for name, series in sorted(self._histograms.items()):
+            header(name, "histogram")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append("{}_bucket{} {}".format(name, _labels_text(key, 'le="%g"' % bound), cumulative))
+                lines.append("{}_bucket{} {}".format(name, _labels_text(key, 'le="+Inf"'), histogram.count))
+                lines.append(f"{name}_sum{_labels_text(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_labels_text(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def instrumented(method):
+    """Record the duration and exceptions of a ``ZoomeyeService`` coroutine method."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        except Exception as e:
+            self.metrics.inc("zoomeye_service_errors_total", method=name, error=type(e).__name__)
+            raise
+        finally:
+            self.metrics.observe("zoomeye_service_call_seconds", time.perf_counter() - start, method=name)
+
+    return wrapper
+
+
+async def serve_prometheus(metrics: Metrics, host: str, port: int) -> asyncio.AbstractServer:
+    """Serve ``metrics.prometheus()`` over HTTP on every path."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = metrics.prometheus().encode("utf-8")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def write_prometheus(metrics: Metrics, path: str) -> None:
+    """Atomically replace ``path`` with the Prometheus text of ``metrics``."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(metrics.prometheus())
+    os.replace(temporary, path)
+
+
+async def dump_periodically(metrics: Metrics, path: str, interval: float) -> None:
+    """Write the metrics to ``path`` every ``interval`` seconds, e.g. for a textfile collector."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_prometheus(metrics, path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
@@ -0,0 +1,55 @@
+import logging
+
+from mcp.types import ProgressNotification, ProgressNotificationParams, ServerNotification
+
+logger = logging.getLogger(__name__)
+
+
+class Progress:
+    """Requests completed and rows fetched by a multi-request tool call.
+
+    When the client asked for progress with a ``progressToken``, every completed
+    request sends it an MCP progress notification: ``progress`` counts the requests
+    done and ``total`` those planned so far, which grows as pages and shards are
+    discovered; ``rows`` and ``message`` tell how many rows have been fetched, so
+    the client can cancel the call once it has enough. Without a token the
+    counters are only kept.
+    """
+
+    def __init__(self, session=None, token=None):
+        self.session = session if token is not None else None
+        self.token = token
+        self.done = 0
+        self.total = 0
+        self.rows = 0
+
+    @classmethod
+    def from_request(cls, server) -> "Progress":
+        """Progress reported to the client of the request ``server`` is handling."""
+        try:
+            context = server.request_context
+        except LookupError:
+            # Called in process, outside of a client session.
+            return cls()
+        return cls(context.session, context.meta.progressToken if context.meta else None)
+
+    def expect(self, requests: int) -> None:
+        """Plan ``requests`` more requests."""
+        self.total += max(0, requests)
+
+    async def advance(self, rows: int = 0) -> None:
+        """Record a completed request that returned ``rows`` rows and notify the client."""
+        self.done += 1
+        self.rows += rows
+        self.total = max(self.total, self.done)
+        if self.session is None:
+            return
+        params = ProgressNotificationParams(progressToken=self.token, progress=self.done, total=self.total,
+                                            rows=self.rows,
+                                            message=f"{self.done} of {self.total} requests, {self.rows} rows")
+        try:
+            await self.session.send_notification(
+                ServerNotification(ProgressNotification(method="notifications/progress", params=params)))
+        except Exception as e:
+            # A client that went away must not fail the call; its cancellation does.
+            logger.debug("Could not send progress notification: %s", e)
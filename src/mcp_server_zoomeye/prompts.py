@@ -168,9 +168,6 @@ SEARCH_SYNTAX_GUIDE = """
 - Search for webcams in Tokyo
   city=tokyo && device=webcam
 
-- Search for industrial control devices with component 6ES7 315-2EH14-0AB0 running on port 102
-  port=102 && module_id=6ES7 215-1BG40-0XB0
-
 - Search for assets indexed after 2020-01-01 with port 50050 open
   after="2020-01-01" && port=50050
 
@@ -200,4 +197,8 @@ SEARCH_SYNTAX_GUIDE = """
 
 - Search for specific Header hash
   http.header_hash="9763f6e29aa78e7ca2179ac82decbc25"
-"""
\ No newline at end of file
+"""
+
+SEARCH_SYNTAX_SUMMARY = """Search ZoomEye for network assets (IPv4, IPv6 and websites) with a ZoomEye query, e.g.
+app="nginx" && country="US". The search syntax guide with every operator and field is the
+zoomeye://search-syntax resource."""
@@ -0,0 +1,322 @@
+"""Parser, validator and canonicalizer for the ZoomEye search syntax.
+
+The grammar follows ``prompts.SEARCH_SYNTAX_GUIDE``::
+
+    expression := or
+    or         := and ("||" and)*
+    and        := primary ("&&" primary)*
+    primary    := "(" expression ")" | term
+    term       := KEYWORD ("=" | "==" | "!=") value | value
+    value      := quoted string | bare word
+
+Quoted strings use ``"`` or ``'`` and ``\\`` escapes; bare words may escape
+parentheses, quotes and operators with ``\\``. ``*`` is a wildcard inside values.
+"""
+import base64
+import binascii
+import difflib
+import re
+from dataclasses import dataclass, replace
+from typing import Union
+
+KEYWORDS = frozenset({
+    # Geographical location
+    "country", "subdivisions", "city",
+    # Certificates
+    "ssl", "ssl.cert.fingerprint", "ssl.chain_count", "ssl.cert.alg", "ssl.cert.issuer.cn",
+    "ssl.cert.pubkey.rsa.bits", "ssl.cert.pubkey.ecdsa.bits", "ssl.cert.pubkey.type", "ssl.cert.serial",
+    "ssl.cipher.bits", "ssl.cipher.name", "ssl.cipher.version", "ssl.version", "ssl.cert.subject.cn",
+    "ssl.jarm", "ssl.ja3s",
+    # IP or domain name
+    "ip", "cidr", "org", "isp", "asn", "port", "hostname", "domain", "banner", "http.header",
+    "http.header_hash", "http.header.server", "http.header.version", "http.header.status_code", "http.body",
+    "http.body_hash",
+    # Fingerprints
+    "app", "service", "device", "os", "title", "industry", "product", "protocol", "is_honeypot",
+    # Time
+    "after", "before",
+    # Misc
+    "dig", "iconhash", "filehash", "is_ipv4", "is_ipv6", "is_domain",
+})
+TIME_KEYWORDS = frozenset({"after", "before"})
+OPERATORS = ("==", "!=", "=")
+
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_KEYWORD = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+
+class QuerySyntaxError(ValueError):
+    """A query that ZoomEye would reject, with the offending position."""
+
+    def __init__(self, message: str, query: str, position: int):
+        self.query = query
+        self.position = position
+        super().__init__(f"{message} at position {position}\n  {query}\n  {' ' * position}^")
+
+
+@dataclass(frozen=True)
+class Term:
+    keyword: str | None
+    operator: str | None
+    value: str
+    position: int = 0
+
+
+@dataclass(frozen=True)
+class BoolOp:
+    operator: str  # "&&" or "||"
+    operands: tuple["Node", ...]
+    # Whether the query put this group in parentheses.
+    grouped: bool = False
+
+
+Node = Union[Term, BoolOp]
+
+
+@dataclass(frozen=True)
+class _Token:
+    kind: str  # "and", "or", "(", ")", "op", "word", "string"
+    text: str
+    position: int
+
+
+def _tokenize(query: str) -> list[_Token]:
+    tokens = []
+    i = 0
+    length = len(query)
+    while i < length:
+        char = query[i]
+        if char.isspace():
+            i += 1
+        elif query.startswith("&&", i):
+            tokens.append(_Token("and", "&&", i))
+            i += 2
+        elif query.startswith("||", i):
+            tokens.append(_Token("or", "||", i))
+            i += 2
+        elif char in "()":
+            tokens.append(_Token(char, char, i))
+            i += 1
+        elif query.startswith("==", i) or query.startswith("!=", i):
+            tokens.append(_Token("op", query[i:i + 2], i))
+            i += 2
+        elif char == "=":
+            tokens.append(_Token("op", "=", i))
+            i += 1
+        elif char in "\"'":
+            start = i
+            i += 1
+            chars = []
+            while i < length and query[i] != char:
+                if query[i] == "\\" and i + 1 < length:
+                    i += 1
+                chars.append(query[i])
+                i += 1
+            if i >= length:
+                raise QuerySyntaxError("Unterminated quoted string", query, start)
+            tokens.append(_Token("string", "".join(chars), start))
+            i += 1
+        else:
+            start = i
+            chars = []
+            while i < length:
+                char = query[i]
+                if char == "\\" and i + 1 < length:
+                    chars.append(query[i + 1])
+                    i += 2
+                    continue
+                if (char.isspace() or char in "()=\"'" or query.startswith("&&", i) or query.startswith("||", i)
+                        or query.startswith("!=", i)):
+                    break
+                chars.append(char)
+                i += 1
+            tokens.append(_Token("word", "".join(chars), start))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = _tokenize(query)
+        self.index = 0
+
+    def _peek(self) -> _Token | None:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def _next(self) -> _Token:
+        token = self._peek()
+        if token is None:
+            raise QuerySyntaxError("Unexpected end of query", self.query, len(self.query))
+        self.index += 1
+        return token
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise QuerySyntaxError("Empty query", self.query, 0)
+        node = self._expression()
+        token = self._peek()
+        if token is not None:
+            if token.kind == ")":
+                raise QuerySyntaxError("Unbalanced closing parenthesis", self.query, token.position)
+            raise QuerySyntaxError(f"Expected && or || before {token.text!r}", self.query, token.position)
+        return node
+
+    def _expression(self) -> Node:
+        return self._binary("or", "||", self._and)
+
+    def _and(self) -> Node:
+        return self._binary("and", "&&", self._primary)
+
+    def _binary(self, kind: str, operator: str, operand) -> Node:
+        operands = [operand()]
+        while (token := self._peek()) is not None and token.kind == kind:
+            self.index += 1
+            operands.append(operand())
+        return operands[0] if len(operands) == 1 else BoolOp(operator, tuple(operands))
+
+    def _primary(self) -> Node:
+        token = self._next()
+        if token.kind == "(":
+            node = self._expression()
+            closing = self._peek()
+            if closing is None or closing.kind != ")":
+                raise QuerySyntaxError("Unbalanced opening parenthesis", self.query, token.position)
+            self.index += 1
+            return replace(node, grouped=True) if isinstance(node, BoolOp) else node
+        if token.kind in ("word", "string"):
+            following = self._peek()
+            if following is not None and following.kind == "op":
+                return self._term(token, self._next())
+            if token.kind == "word" and not token.text:
+                raise QuerySyntaxError("Empty search term", self.query, token.position)
+            return Term(None, None, token.text, token.position)
+        if token.kind == "op":
+            raise QuerySyntaxError(f"Missing keyword before {token.text!r}", self.query, token.position)
+        raise QuerySyntaxError(f"Unexpected {token.text!r}", self.query, token.position)
+
+    def _term(self, keyword_token: _Token, operator: _Token) -> Term:
+        keyword = keyword_token.text.lower()
+        if keyword_token.kind != "word" or not _KEYWORD.match(keyword):
+            raise QuerySyntaxError(f"Invalid keyword {keyword_token.text!r}", self.query, keyword_token.position)
+        if keyword not in KEYWORDS:
+            suggestion = difflib.get_close_matches(keyword, KEYWORDS, n=1)
+            hint = f", did you mean {suggestion[0]!r}?" if suggestion else ""
+            raise QuerySyntaxError(f"Unknown keyword {keyword_token.text!r}{hint}", self.query,
+                                   keyword_token.position)
+        value = self._peek()
+        if value is None or value.kind not in ("word", "string") or (value.kind == "word" and not value.text):
+            raise QuerySyntaxError(f"Missing value for {keyword}{operator.text}", self.query,
+                                   operator.position + len(operator.text))
+        self.index += 1
+        if keyword in TIME_KEYWORDS and not _DATE.match(value.text):
+            raise QuerySyntaxError(f"{keyword} expects a date formatted as YYYY-MM-DD", self.query, value.position)
+        if keyword == "port" and value.text != "*" and not (value.text.isdigit() and int(value.text) <= 65535):
+            raise QuerySyntaxError("port expects a number between 0 and 65535", self.query, value.position)
+        return Term(keyword, operator.text, value.text, keyword_token.position)
+
+
+def _has_filter(node: Node) -> bool:
+    """Whether ``node`` always constrains the results by something other than time."""
+    if isinstance(node, Term):
+        return node.keyword not in TIME_KEYWORDS
+    if node.operator == "&&":
+        return any(_has_filter(operand) for operand in node.operands)
+    return all(_has_filter(operand) for operand in node.operands)
+
+
+def _check_time_filters(node: Node, query: str, combined: bool = False) -> None:
+    if isinstance(node, Term):
+        if node.keyword in TIME_KEYWORDS and not combined:
+            raise QuerySyntaxError(f"{node.keyword} must be combined with another filter using &&", query,
+                                   node.position)
+        return
+    for operand in node.operands:
+        siblings = [other for other in node.operands if other is not operand]
+        _check_time_filters(operand, query,
+                            combined or (node.operator == "&&" and any(map(_has_filter, siblings))))
+
+
+def parse(query: str) -> Node:
+    """Parse and validate ``query``.
+
+    Raises:
+        QuerySyntaxError: If the query is malformed or uses an unknown keyword.
+    """
+    node = _Parser(query).parse()
+    _check_time_filters(node, query)
+    return node
+
+
+def quote(value: str) -> str:
+    return '"' + re.sub(r'([\\"()])', r"\\\1", value) + '"'
+
+
+def _sort_key(node: Node) -> tuple:
+    return (0, node.keyword or "", node.operator or "", node.value) if isinstance(node, Term) else (1, node.operator)
+
+
+def _mixed(node: BoolOp) -> bool:
+    """Whether ``node`` has an operand of the other operator that the query did not put in parentheses."""
+    return any(isinstance(operand, BoolOp) and operand.operator != node.operator and not operand.grouped
+               for operand in node.operands)
+
+
+def _canonical_operands(node: BoolOp, ordered: bool = False) -> list[str]:
+    # The search syntax does not define the precedence of && and ||, so a chain
+    # mixing them without parentheses is kept in the order it was written.
+    ordered = ordered or _mixed(node)
+    operands = []
+    for operand in node.operands:
+        # Flatten nested groups of the same operator: (a && b) && c == a && b && c.
+        if isinstance(operand, BoolOp) and operand.operator == node.operator and not ordered:
+            operands.extend(operand.operands)
+        else:
+            operands.append(operand)
+    rendered = []
+    for operand in operands:
+        if isinstance(operand, BoolOp) and (operand.grouped or not ordered):
+            group = _canonical_operands(operand)
+            text = f" {operand.operator} ".join(group)
+            rendered.append(f"({text})" if len(group) > 1 else text)
+        elif isinstance(operand, BoolOp):
+            rendered.append(f" {operand.operator} ".join(_canonical_operands(operand, ordered)))
+        else:
+            rendered.append(_canonical(operand))
+    return rendered if ordered else sorted(set(rendered))
+
+
+def _canonical(node: Node) -> str:
+    if isinstance(node, Term):
+        if node.keyword is None:
+            return quote(node.value)
+        return f"{node.keyword}{node.operator}{quote(node.value)}"
+    return f" {node.operator} ".join(_canonical_operands(node))
+
+
+def canonicalize(query: str) -> str:
+    """Validate ``query`` and return its canonical form.
+
+    Keywords are lower-cased, values are double quoted, and operands of ``&&`` and
+    ``||`` are flattened, deduplicated and sorted, so equivalent queries produce the
+    same string. Groups of the other operator are always put in parentheses; a
+    chain that mixes ``&&`` and ``||`` without parentheses keeps its written order.
+
+    The canonical form identifies a query for caching, it is not sent to ZoomEye.
+    """
+    return _canonical(parse(query))
+
+
+def encode_query(query: str) -> str:
+    return base64.b64encode(query.encode("utf-8")).decode("ascii")
+
+
+def decode_qbase64(qbase64: str) -> str:
+    try:
+        return base64.b64decode(qbase64, validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("qbase64 is not a valid base64 encoded query string")
+
+
+def canonical_qbase64(qbase64: str) -> str:
+    """Validate a base64 encoded query and re-encode its canonical form."""
+    return encode_query(canonicalize(decode_qbase64(qbase64)))
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from .config import env_float, env_int
+from .jsonstream import RowTable
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter.
+
+    ``rate`` tokens are added per second up to ``burst``. A rate of 0 disables the
+    limiter. Options fall back to ``ZOOMEYE_RATE_LIMIT`` and ``ZOOMEYE_RATE_BURST``.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.rate = rate if rate is not None else env_float("ZOOMEYE_RATE_LIMIT", 0.0)
+        self.burst = burst or env_int("ZOOMEYE_RATE_BURST", max(1, int(self.rate)))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until ``tokens`` are available and take them.
+
+        Waiters are served in arrival order.
+        """
+        if not self.enabled:
+            return
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def available(self) -> float:
+        """Tokens that can be taken without waiting."""
+        if self.enabled:
+            self._refill()
+        return self._tokens
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "available": round(self.available(), 2)}
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for 429, 5xx and transport errors.
+
+    Options fall back to ``ZOOMEYE_MAX_RETRIES``, ``ZOOMEYE_BACKOFF_BASE`` and
+    ``ZOOMEYE_BACKOFF_MAX``.
+    """
+
+    def __init__(self, max_retries: Optional[int] = None, backoff_base: Optional[float] = None,
+                 backoff_max: Optional[float] = None):
+        self.max_retries = max_retries if max_retries is not None else env_int("ZOOMEYE_MAX_RETRIES", 3)
+        self.backoff_base = backoff_base if backoff_base is not None else env_float("ZOOMEYE_BACKOFF_BASE", 0.5)
+        self.backoff_max = backoff_max if backoff_max is not None else env_float("ZOOMEYE_BACKOFF_MAX", 30.0)
+
+    def should_retry(self, attempt: int, status_code: Optional[int] = None) -> bool:
+        """Whether a failed attempt (0-based) is retried; ``status_code`` is None for transport errors."""
+        if attempt >= self.max_retries:
+            return False
+        return status_code is None or status_code in RETRYABLE_STATUS_CODES
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt.
+
+        A ``Retry-After`` header, in seconds or as an HTTP date, takes precedence over
+        the backoff; otherwise a "full jitter" delay in ``[0, base * 2**attempt]`` is used.
+        """
+        if retry_after:
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    return min(self.backoff_max, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class QuotaExceededError(ValueError):
+    """Raised when a request would exceed the configured quota budget."""
+
+
+class QuotaTracker:
+    """Running count of the ZoomEye quota consumed by this process.
+
+    When a response reports its quota in its metadata, that is what is counted (see
+    ``usage``). Otherwise a search is estimated to consume one unit per returned
+    row, read from the response ``data``, and any other call one unit. With a ``budget``, calls whose estimated cost
+    would exceed it are refused (``mode="refuse"``) or, when a ``period`` is set, held
+    until the budget window resets (``mode="queue"``).
+
+    Options fall back to ``ZOOMEYE_QUOTA_BUDGET``, ``ZOOMEYE_QUOTA_PERIOD`` and
+    ``ZOOMEYE_QUOTA_MODE``.
+    """
+
+    def __init__(self, budget: Optional[int] = None, period: Optional[float] = None, mode: Optional[str] = None):
+        self.budget = budget if budget is not None else env_int("ZOOMEYE_QUOTA_BUDGET", 0)
+        self.period = period if period is not None else env_float("ZOOMEYE_QUOTA_PERIOD", 0.0)
+        self.mode = mode or os.getenv("ZOOMEYE_QUOTA_MODE") or "refuse"
+        if self.mode not in ("refuse", "queue"):
+            raise ValueError(f"Invalid quota mode: {self.mode}")
+        self.consumed = 0
+        self.consumed_by_endpoint: dict[str, int] = {}
+        self._window_start = time.monotonic()
+        self._window_consumed = 0
+        self._reserved = 0
+        self._changed = asyncio.Condition()
+
+    def _roll_window(self) -> None:
+        if self.period > 0 and time.monotonic() - self._window_start >= self.period:
+            self._window_start = time.monotonic()
+            self._window_consumed = 0
+
+    async def reserve(self, cost: int) -> None:
+        """Reserve ``cost`` units of the budget before a request is sent.
+
+        Raises:
+            QuotaExceededError: If the budget would be exceeded and the call is not queued.
+        """
+        if self.budget <= 0:
+            return
+        if cost > self.budget:
+            raise QuotaExceededError(f"Request cost {cost} exceeds the quota budget of {self.budget}")
+        async with self._changed:
+            while True:
+                self._roll_window()
+                if self._window_consumed + self._reserved + cost <= self.budget:
+                    self._reserved += cost
+                    return
+                if self.mode != "queue" or self.period <= 0:
+                    raise QuotaExceededError(
+                        f"Quota budget exhausted: {self._window_consumed} of {self.budget} units consumed"
+                        f"{f' in the last {self.period:g}s' if self.period > 0 else ''}")
+                remaining = self.period - (time.monotonic() - self._window_start)
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=max(remaining, 0.01))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, reserved: int, endpoint: str, consumed: int) -> None:
+        """Replace a reservation with the cost actually consumed."""
+        self.consumed += consumed
+        self.consumed_by_endpoint[endpoint] = self.consumed_by_endpoint.get(endpoint, 0) + consumed
+        if self.budget <= 0:
+            return
+        async with self._changed:
+            self._roll_window()
+            self._reserved = max(0, self._reserved - reserved)
+            self._window_consumed += consumed
+            self._changed.notify_all()
+
+    @staticmethod
+    def reported(result) -> tuple[Optional[int], Optional[int]]:
+        """Units ``(consumed, remaining)`` reported in the metadata of a response, None when not reported.
+
+        Read from a ``quota`` object with ``consumed`` and ``remaining`` members, or
+        from a top-level ``remaining`` member.
+        """
+        if not isinstance(result, dict):
+            return None, None
+        quota = result.get("quota") if isinstance(result.get("quota"), dict) else {}
+
+        def units(value) -> Optional[int]:
+            return value if isinstance(value, int) and not isinstance(value, bool) and value >= 0 else None
+
+        return units(quota.get("consumed")), units(quota.get("remaining", result.get("remaining")))
+
+    @classmethod
+    def usage(cls, result, previous_remaining: Optional[int] = None) -> tuple[int, Optional[int]]:
+        """Units consumed by a response and remaining after it, None when it does not report them.
+
+        A reported ``consumed`` count is used as is. Otherwise the drop of the reported
+        ``remaining`` units since ``previous_remaining``, the value last reported for
+        the same key, is used, and without either the cost is estimated by ``cost_of``.
+        """
+        consumed, remaining = cls.reported(result)
+        if consumed is None:
+            if remaining is not None and previous_remaining is not None and remaining <= previous_remaining:
+                consumed = previous_remaining - remaining
+            else:
+                consumed = cls.cost_of(result)
+        return consumed, remaining
+
+    @staticmethod
+    def cost_of(result) -> int:
+        """Estimated quota consumed by a response: the number of rows returned for searches, else 1."""
+        if isinstance(result, dict) and "total" in result:
+            if isinstance(result.get("data"), (list, RowTable)):
+                return len(result["data"])
+            if isinstance(result.get("count"), int):
+                # Summary of a search spilled to disk.
+                return result["count"]
+        return 1
+
+    def stats(self) -> dict:
+        self._roll_window()
+        stats = {"consumed": self.consumed, "by_endpoint": dict(self.consumed_by_endpoint)}
+        if self.budget > 0:
+            stats.update({
+                "budget": self.budget,
+                "period": self.period or None,
+                "mode": self.mode,
+                "window_consumed": self._window_consumed,
+                "remaining": max(0, self.budget - self._window_consumed - self._reserved),
+            })
+        return stats
@@ -1,17 +1,81 @@
+import asyncio
 import json
+import logging
+import math
 import os
+import re
+import time
+import weakref
+from contextlib import aclosing, nullcontext
 from enum import Enum
-from typing import Optional, Sequence
+from typing import Iterable, Optional, Sequence
+from urllib.parse import parse_qs, urlsplit
 
 import httpx
-from dotenv import load_dotenv
 from mcp.server import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
+from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource, Resource, ResourceTemplate
+from pydantic import AnyUrl
 
-from .prompts import SEARCH_SYNTAX_GUIDE
+from .cache import SEARCH, VULDB_BY_ID, VULDB_BY_KEYWORD, ResponseCache, make_key
+from .concurrency import SingleFlight, bounded_map
+from .config import env_bool, env_float, env_int
+from .enrich import enrich_fields, lookup_keyword, product_version, summarize
+from .formatting import OUTPUT_FORMATS, dumps, format_result, output_options, split_rows
+from .ipset import IP_SET_OPERATIONS, IpSet, IpSetIndex, parse_networks
+from .prompts import SEARCH_SYNTAX_GUIDE, SEARCH_SYNTAX_SUMMARY
+from .query_syntax import canonical_qbase64, canonicalize, decode_qbase64, encode_query, parse as parse_query
+from .jsonstream import RowStream, RowTable
+from .keypool import KEY_FAILURE_STATUS_CODES, KeyPool
+from .metrics import (SIZE_BUCKETS, Metrics, dump_periodically, instrumented, label_value, serve_prometheus,
+                      write_prometheus)
+from .progress import Progress
+from .ratelimit import QuotaTracker, RetryPolicy, TokenBucket
+from .sharding import FACET_DIMENSIONS, SHARD_DIMENSIONS, plan_shards
+from .spill import RESULTS_URI_PREFIX, SPILL_FORMATS, ResultStore
+from .transport import TRANSPORTS, run_sse
+from .vulindex import VulnerabilityIndex
+from .watch import WatchStore, watch_fields
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.zoomeye.ai"
+
+CACHE_STATS_URI = "zoomeye://cache/stats"
+QUOTA_STATS_URI = "zoomeye://quota"
+VULDB_INDEX_STATS_URI = "zoomeye://vuldb-index/stats"
+WATCHES_URI = "zoomeye://watches"
+METRICS_URI = "zoomeye://metrics"
+PROMETHEUS_METRICS_URI = "zoomeye://metrics/prometheus"
+KEYS_URI = "zoomeye://keys"
+IP_SETS_URI = "zoomeye://ip-sets"
+SEARCH_SYNTAX_URI = "zoomeye://search-syntax"
+
+VULNERABILITY_ID_PATTERN = re.compile(r"^(CVE-\d{4}-\d{4,}|CNVD-\d{4}-\d{4,}|CNNVD-\d{6}-\d+)$")
+MAX_BATCH_IDS = 500
+MAX_RESULT_SLICE = 1000
+MAX_IP_SET_SAMPLE = 100
+MAX_ENRICH_LOOKUPS = 200
+# Search pages from this size on are decoded row by row while the body arrives.
+STREAM_DECODE_PAGESIZE = 500
+
+OUTPUT_PROPERTIES = {
+    "output_format": {
+        "type": "string",
+        "description": "Result encoding: json (indented), compact (JSON without whitespace), columnar (a column "
+                       "header plus value arrays), csv or ndjson. The row oriented formats use far fewer tokens",
+        "enum": list(OUTPUT_FORMATS)
+    },
+    "select": {
+        "type": "string",
+        "description": "Keys to keep in each result row, separated by commas"
+    },
+    "max_field_length": {
+        "type": "integer",
+        "description": "Truncate string values, such as banners and bodies, longer than this many characters"
+    },
+}
 
 
 class ZoomeyeTools(str, Enum):
@@ -23,8 +87,69 @@ class ZoomeyeTools(str, Enum):
     ZOOMEYE_VULDB_BY_KEYWORD = "zoomeye_vuldb_by_keyword"
     """Query vulnerability by keyword."""
 
+    ZOOMEYE_SEARCH_ALL = "zoomeye_search_all"
+    """Search query for ZoomEye, fetching every page up to a result budget."""
+
+    ZOOMEYE_VULDB_BATCH = "zoomeye_vuldb_batch"
+    """Query vulnerabilities for a list of IDs."""
+
+    ZOOMEYE_WATCH = "zoomeye_watch"
+    """Search query for ZoomEye, returning only the assets changed since the previous run."""
+
+    ZOOMEYE_ENRICH = "zoomeye_enrich"
+    """Search query for ZoomEye, annotating assets with the vulnerabilities of their products."""
+
+    ZOOMEYE_IPSET = "zoomeye_ipset"
+    """Set operations on the IPs of search results."""
+
+
+TOOL_NAMES = frozenset(tool.value for tool in ZoomeyeTools)
+
+# Seconds a call of each tool may run before it is cancelled with its upstream requests.
+TOOL_DEADLINES = {
+    ZoomeyeTools.ZOOMEYE_SEARCH.value: 120.0,
+    ZoomeyeTools.ZOOMEYE_SEARCH_ALL.value: 600.0,
+    ZoomeyeTools.ZOOMEYE_WATCH.value: 600.0,
+    ZoomeyeTools.ZOOMEYE_ENRICH.value: 600.0,
+    ZoomeyeTools.ZOOMEYE_IPSET.value: 60.0,
+    ZoomeyeTools.ZOOMEYE_VULDB_BY_ID.value: 60.0,
+    ZoomeyeTools.ZOOMEYE_VULDB_BATCH.value: 300.0,
+    ZoomeyeTools.ZOOMEYE_VULDB_BY_KEYWORD.value: 60.0,
+}
 
-def zoomeye_search(qbase64: str, page: int = 1, pagesize: int = 10, fields: str = "", sub_type: str = "",
+
+def short_description(tool: Tool) -> str:
+    """The first paragraph of the description of ``tool``.
+
+    The search syntax guide is replaced by a summary pointing to its resource.
+    """
+    if tool.description == SEARCH_SYNTAX_GUIDE:
+        return SEARCH_SYNTAX_SUMMARY
+    return (tool.description or "").strip().split("\n\n", 1)[0]
+
+
+def parse_tool_deadlines(values: Iterable[str]) -> dict[str, float]:
+    """Tool deadlines from ``SECONDS`` (every tool) or ``TOOL=SECONDS`` items separated by commas.
+
+    Raises:
+        ValueError: If a tool is unknown or a number is invalid.
+    """
+    deadlines = {}
+    for item in ",".join(values).split(","):
+        name, _, seconds = item.strip().rpartition("=")
+        if not seconds:
+            continue
+        if name and name not in TOOL_DEADLINES:
+            raise ValueError(f"Unknown tool in deadline: {name}")
+        try:
+            seconds = float(seconds)
+        except ValueError:
+            raise ValueError(f"Invalid tool deadline: {item.strip()}")
+        deadlines.update({name: seconds} if name else dict.fromkeys(TOOL_DEADLINES, seconds))
+    return deadlines
+
+
+async def zoomeye_search(qbase64: str, page: int = 1, pagesize: int = 10, fields: str = "", sub_type: str = "",
                    facets: str = "", ignore_cache: bool = False):
     """Search query for ZoomEye.
     ### Parameters
@@ -38,38 +163,280 @@ def zoomeye_search(qbase64: str, page: int = 1, pagesize: int = 10, fields: str
     |facets|string|false|Statistical items, separated by commas if there are multiple. Supports country, subdivisions, city, product, service, device, OS, and port.|
     |ignore_cache|boolean|false|Whether to ignore the cache. false, supported by Business plan and above.|
     """
-    service = ZoomeyeService()
-    return service.query(
-        qbase64=qbase64,
-        page=page,
-        pagesize=pagesize,
-        fields=fields,
-        sub_type=sub_type,
-        facets=facets,
-        ignore_cache=ignore_cache
-    )
-
-
-def zoomeye_query_vuldb_by_id(cve_id: str):
+    async with ZoomeyeService() as service:
+        return await service.query(
+            qbase64=qbase64,
+            page=page,
+            pagesize=pagesize,
+            fields=fields,
+            sub_type=sub_type,
+            facets=facets,
+            ignore_cache=ignore_cache
+        )
+
+
+async def zoomeye_query_vuldb_by_id(cve_id: str):
     """Search for vulnerabilities by ID. eg: CVE-XXXX-XXXX,CNVD-XXXX-XXXX,CNNVD-XXXX-XXXX"""
-    service = ZoomeyeService()
-    return service.query_vulnerability_by_id(cve_id)
+    async with ZoomeyeService() as service:
+        return await service.query_vulnerability_by_id(cve_id)
+
+
+def asset_key(row: dict):
+    """Identity of a search result row, used to deduplicate rows across pages."""
+    if "ip" in row or "port" in row or "domain" in row:
+        return row.get("ip"), row.get("port"), row.get("domain")
+    return json.dumps(row, sort_keys=True, ensure_ascii=False)
 
 
 class ZoomeyeService:
-    def __init__(self, key: Optional[str] = None):
-        self.key = key
-        if not self.key:
-            self.key = os.getenv("ZOOMEYE_API_KEY")
+    """Client for the ZoomEye API.
 
-    async def get_client(self):
+    A single pooled ``httpx.AsyncClient`` is shared by every request made through
+    the service, so TCP/TLS connections to the API are reused between tool calls.
+    The client, with its TLS context, is created on the first request and released
+    by ``aclose()``, so starting the server makes no network setup; the service can
+    also be used as an async context manager. When a ``ResponseCache`` is given, responses
+    are served from it until their TTL expires.
+
+    Search queries are validated locally before they are sent as given, so
+    malformed queries fail without spending quota; equivalent queries share cache
+    entries through their canonical form. Vulnerability responses feed the optional ``VulnerabilityIndex``, which then
+    answers repeated keyword searches locally. Concurrent identical requests are
+    coalesced into one upstream call. Requests
+    that reach the API share one ``TokenBucket`` rate limiter, are retried according
+    to the ``RetryPolicy`` and are accounted against the ``QuotaTracker``. With a
+    ``KeyPool`` of several API keys, each request is sent with the key that has the
+    most headroom, and a key refused with 401, 402 or 429 is swapped for another one.
+    The IPs of search results are kept in an ``IpSetIndex`` for set operations.
+    The result and watch stores, like the disk tiers of the cache and the index, are
+    only created and opened when a call first needs them.
+
+    Every option falls back to an environment variable when not passed explicitly:
+    ``ZOOMEYE_API_BASE_URL``, ``ZOOMEYE_MAX_CONNECTIONS``, ``ZOOMEYE_MAX_KEEPALIVE_CONNECTIONS``,
+    ``ZOOMEYE_KEEPALIVE_EXPIRY``, ``ZOOMEYE_TIMEOUT``, ``ZOOMEYE_CONNECT_TIMEOUT``, ``ZOOMEYE_HTTP2``,
+    ``ZOOMEYE_PAGE_CONCURRENCY``, ``ZOOMEYE_BATCH_CONCURRENCY``, ``ZOOMEYE_VALIDATE_QUERIES`` and
+    ``ZOOMEYE_SPILL_THRESHOLD``.
+    """
+
+    def __init__(self, key: Optional[str] = None, base_url: Optional[str] = None,
+                 max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None, timeout: Optional[float] = None,
+                 connect_timeout: Optional[float] = None, http2: Optional[bool] = None,
+                 cache: Optional[ResponseCache] = None, page_concurrency: Optional[int] = None,
+                 rate_limiter: Optional[TokenBucket] = None, retry_policy: Optional[RetryPolicy] = None,
+                 quota: Optional[QuotaTracker] = None, batch_concurrency: Optional[int] = None,
+                 vuln_index: Optional[VulnerabilityIndex] = None, validate_queries: Optional[bool] = None,
+                 result_store: Optional[ResultStore] = None, spill_threshold: Optional[int] = None,
+                 watch_store: Optional[WatchStore] = None, metrics: Optional[Metrics] = None,
+                 keys: Optional[KeyPool] = None, ip_sets: Optional[IpSetIndex] = None):
+        self.keys = keys if keys is not None else KeyPool([key] if key else None)
+        self.key = self.keys.keys[0].key if self.keys else None
+        self.base_url = (base_url or os.getenv("ZOOMEYE_API_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max_connections or env_int("ZOOMEYE_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=max_keepalive_connections or env_int("ZOOMEYE_MAX_KEEPALIVE_CONNECTIONS", 20),
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else env_float(
+                "ZOOMEYE_KEEPALIVE_EXPIRY", 60.0),
+        )
+        self.timeout = httpx.Timeout(
+            timeout if timeout is not None else env_float("ZOOMEYE_TIMEOUT", 30.0),
+            connect=connect_timeout if connect_timeout is not None else env_float("ZOOMEYE_CONNECT_TIMEOUT", 10.0),
+        )
+        self.http2 = http2 if http2 is not None else env_bool("ZOOMEYE_HTTP2")
+        self.cache = cache
+        self.page_concurrency = page_concurrency or env_int("ZOOMEYE_PAGE_CONCURRENCY", 5)
+        self.batch_concurrency = batch_concurrency or env_int("ZOOMEYE_BATCH_CONCURRENCY", 10)
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.quota = quota or QuotaTracker()
+        self.vuln_index = vuln_index
+        self.validate_queries = validate_queries if validate_queries is not None else env_bool(
+            "ZOOMEYE_VALIDATE_QUERIES", True)
+        self._result_store = result_store
+        self.spill_threshold = spill_threshold if spill_threshold is not None else env_int(
+            "ZOOMEYE_SPILL_THRESHOLD", 0)
+        self._watch_store = watch_store
+        self.ip_sets = ip_sets if ip_sets is not None else IpSetIndex()
+        self.metrics = metrics or Metrics()
+        self._single_flight = SingleFlight()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    def _build_client(self) -> httpx.AsyncClient:
         proxy = None
         https_proxy = os.getenv("https_proxy")
         http_proxy = os.getenv("http_proxy")
         if https_proxy or http_proxy:
             proxy = https_proxy or http_proxy
-        return httpx.AsyncClient(proxy=proxy)
 
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1. "
+                               "Install mcp-server-zoomeye[http2] to enable it.")
+                http2 = False
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            proxy=proxy,
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=http2,
+        )
+
+    async def get_client(self) -> httpx.AsyncClient:
+        """Return the shared pooled client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    @property
+    def result_store(self) -> ResultStore:
+        """The store of spilled search results; a default one is created on first use."""
+        if self._result_store is None:
+            self._result_store = ResultStore()
+        return self._result_store
+
+    @property
+    def watch_store(self) -> WatchStore:
+        """The store of watched searches; a default one is created on first use."""
+        if self._watch_store is None:
+            self._watch_store = WatchStore()
+        return self._watch_store
+
+    @property
+    def coalesced_requests(self) -> int:
+        """Number of calls answered by joining an identical in-flight request."""
+        return self._single_flight.coalesced
+
+    async def aclose(self) -> None:
+        """Close the shared client and its pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self.cache is not None:
+            self.cache.close()
+        if self.vuln_index is not None:
+            self.vuln_index.close()
+        if self._watch_store is not None:
+            self._watch_store.close()
+
+    async def _request(self, method: str, url: str, endpoint: str, cost: int = 1, stream=None, **kwargs):
+        """Send a request through the shared client and decode the JSON response.
+
+        The request first reserves ``cost`` units of the quota budget and waits for the
+        rate limiter; 429, 5xx and transport errors are retried with backoff. The quota
+        consumed is taken from the response metadata when the API reports it, and
+        estimated from the returned rows otherwise. A key
+        refused with 401, 402 or 429 is first swapped for another key of the pool,
+        without counting as a retry. When ``stream`` is given, the response body is
+        not read up front; ``stream`` is awaited with the streaming response and its
+        return value is the result.
+        """
+        await self.quota.reserve(cost)
+        consumed = 0
+        tried = []
+        try:
+            attempt = 0
+            while True:
+                await self.rate_limiter.acquire()
+                api_key = await self.keys.acquire(exclude=tried)
+                headers = {"API-KEY": api_key.key, "Content-Type": "application/json"}
+                retry_after = None
+                remaining = None
+                metrics = self.metrics
+                status = "error"
+                start = time.perf_counter()
+                try:
+                    with metrics.in_flight("zoomeye_upstream_in_flight"):
+                        client = await self.get_client()
+                        if stream is not None:
+                            async with client.stream(method, url, headers=headers, **kwargs) as response:
+                                status = response.status_code
+                                response.raise_for_status()  # Raise exception for HTTP errors
+                                result = await stream(response)
+                                size = response.num_bytes_downloaded
+                        else:
+                            response = await client.request(method, url, headers=headers, **kwargs)
+                            status = response.status_code
+                            response.raise_for_status()  # Raise exception for HTTP errors
+                            size = len(response.content)
+                            metrics.observe("zoomeye_upstream_request_seconds", time.perf_counter() - start,
+                                            endpoint=endpoint)
+                            with metrics.timer("zoomeye_decode_seconds", endpoint=endpoint):
+                                result = response.json()
+                    if stream is not None:
+                        # Streamed bodies are decoded while they are received.
+                        metrics.observe("zoomeye_upstream_request_seconds", time.perf_counter() - start,
+                                        endpoint=endpoint)
+                    metrics.observe("zoomeye_upstream_response_bytes", size, SIZE_BUCKETS, endpoint=endpoint)
+                    consumed, remaining = self.quota.usage(result, api_key.remaining)
+                    return result
+                except httpx.HTTPStatusError as e:
+                    if e.response.headers.get("Retry-After"):
+                        retry_after = self.retry_policy.delay(attempt, e.response.headers["Retry-After"])
+                    if status in KEY_FAILURE_STATUS_CODES and self.keys.available(exclude=[*tried, api_key]):
+                        tried.append(api_key)
+                        logger.info("Key %s refused with %d, retrying %s %s with another key",
+                                    api_key.name, status, method, url)
+                        continue
+                    if not self.retry_policy.should_retry(attempt, e.response.status_code):
+                        raise ValueError(f"Error querying ZoomEye API: {str(e)}")
+                    delay = retry_after if retry_after is not None else self.retry_policy.delay(attempt)
+                except httpx.TransportError as e:
+                    status = type(e).__name__
+                    if not self.retry_policy.should_retry(attempt):
+                        raise ValueError(f"Error querying ZoomEye API: {str(e)}")
+                    delay = self.retry_policy.delay(attempt)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                    raise ValueError(f"Error querying ZoomEye API: {str(e)}")
+                except json.JSONDecodeError:
+                    status = "invalid_json"
+                    raise ValueError("Invalid JSON response from ZoomEye API")
+                except asyncio.CancelledError:
+                    # The tool call was cancelled by its client or its deadline; leaving
+                    # the client context closes the connection of an unfinished response.
+                    status = "cancelled"
+                    raise
+                finally:
+                    metrics.inc("zoomeye_upstream_requests_total", endpoint=endpoint, status=status)
+                    self.keys.release(api_key, status if isinstance(status, int) else None, consumed, retry_after,
+                                      remaining)
+                logger.info("Retrying %s %s in %.2fs (attempt %d)", method, url, delay, attempt + 1)
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            await self.quota.release(cost, endpoint, consumed)
+
+    async def _cached(self, endpoint: str, cache_key: str, fetch, ignore_cache=None):
+        """Serve ``cache_key`` from the response cache, calling ``fetch`` on a miss.
+
+        ``ignore_cache=True`` skips the lookup but still refreshes the stored entry.
+        Concurrent misses for the same key share a single upstream call, with or
+        without a cache.
+        """
+        if self.cache is not None and not ignore_cache:
+            cached = self.cache.get(endpoint, cache_key)
+            if cached is not None:
+                return cached
+
+        async def fetch_and_store():
+            result = await fetch()
+            if self.cache is not None:
+                self.cache.set(endpoint, cache_key, result)
+            return result
+
+        return await self._single_flight.do((cache_key, bool(ignore_cache)), fetch_and_store)
+
+    @instrumented
     async def query(self, qbase64, page=1, pagesize=10, fields=None, sub_type=None, facets=None, ignore_cache=None):
         """Query ZoomEye API with the given parameters.
         
@@ -83,17 +450,53 @@ class ZoomeyeService:
             ignore_cache (bool, optional): Whether to ignore cache. Defaults to None.
             
         Returns:
-            dict: The API response data.
+            dict: The API response data. The rows in ``data`` are a ``RowTable`` that
+            only keeps the requested ``fields``.
             
         Raises:
+            QuerySyntaxError: If the query is malformed.
             ValueError: If API key is not provided or API request fails.
         """
-        if not self.key:
+        data, query_key = self._search_payload(qbase64, page, pagesize, fields, sub_type, facets, ignore_cache)
+        url = "/v2/search"
+
+        async def decode(response: httpx.Response) -> dict:
+            # Rows are decoded as the body arrives, so neither the raw body nor a
+            # dict per row is held for the whole page.
+            rows = RowStream()
+            table = RowTable(RowTable.fields_of(fields))
+            async for chunk in response.aiter_bytes():
+                table.extend(rows.feed(chunk))
+            rows.close()
+            return {**rows.fields, "data": table} if rows.has_rows else rows.fields
+
+        async def fetch():
+            if pagesize >= STREAM_DECODE_PAGESIZE:
+                return await self._request("POST", url, SEARCH, cost=pagesize, json=data, stream=decode)
+            # Small bodies decode faster in one go.
+            result = await self._request("POST", url, SEARCH, cost=pagesize, json=data)
+            if isinstance(result, dict) and isinstance(result.get("data"), list):
+                table = RowTable(RowTable.fields_of(fields))
+                table.extend(result["data"])
+                result["data"] = table
+            return result
+
+        cache_key = make_key(SEARCH, qbase64=query_key, page=page, pagesize=pagesize, fields=fields,
+                             sub_type=sub_type, facets=facets)
+        return await self._cached(SEARCH, cache_key, fetch, ignore_cache=ignore_cache)
+
+    def _search_payload(self, qbase64, page, pagesize, fields, sub_type, facets, ignore_cache) -> tuple[dict, str]:
+        """Validate a search and build its request body.
+
+        Returns:
+            tuple: The request body, which sends the query as given, and the query
+            its response is cached under: the canonical form of a validated query.
+        """
+        if not self.keys:
             raise ValueError(
                 "ZoomEye API key is required. Please set it via environment variable ZOOMEYE_API_KEY or pass it to the constructor.")
 
-        url = "https://api.zoomeye.ai/v2/search"
-        headers = {"API-KEY": self.key, "Content-Type": "application/json"}
+        query_key = canonical_qbase64(qbase64) if self.validate_queries else qbase64
 
         # Prepare request data
         data = {"qbase64": qbase64, "page": page, "pagesize": pagesize}
@@ -107,72 +510,636 @@ class ZoomeyeService:
             data["facets"] = facets
         if ignore_cache is not None:
             data["ignore_cache"] = ignore_cache
+        return data, query_key
+
+    @instrumented
+    async def query_to_store(self, store: ResultStore, qbase64, page=1, pagesize=10, fields=None, sub_type=None,
+                             facets=None, ignore_cache=None, output_format="ndjson", sample_size=5):
+        """Stream a search into ``store`` instead of holding it in memory.
+
+        Rows are decoded one at a time as the response body arrives and written to
+        an NDJSON or Parquet file, so peak memory does not depend on ``pagesize``.
+        The response cache is not used.
+
+        Returns:
+            dict: A summary with the response metadata (total, facets, ...), the row
+            ``count``, a ``sample`` of the first rows, the ``uri`` of the stored result
+            and, when the rows have IPs, their ``ip_set`` (the ``result_id``).
+
+        Raises:
+            ValueError: If API key is not provided or API request fails.
+        """
+        data, _ = self._search_payload(qbase64, page, pagesize, fields, sub_type, facets, ignore_cache)
+
+        async def spill(response: httpx.Response) -> dict:
+            writer = store.create(output_format, sample_size=sample_size,
+                                  query={name: value for name, value in data.items() if name != "ignore_cache"})
+            addresses = []
+            try:
+                rows = RowStream()
+                async for chunk in response.aiter_bytes():
+                    for row in rows.feed(chunk):
+                        writer.write(row)
+                        if isinstance(row, dict):
+                            addresses.append(row.get("ip"))
+                rows.close()
+            except BaseException:
+                writer.discard()
+                raise
+            summary = writer.finish(rows.fields)
+            set_id = self.register_ip_set(addresses, {"query": decode_qbase64(data["qbase64"])},
+                                          set_id=summary["result_id"])
+            if set_id:
+                summary["ip_set"] = set_id
+            return summary
+
+        return await self._request("POST", "/v2/search", SEARCH, cost=pagesize, json=data, stream=spill)
+
+    @instrumented
+    async def query_all(self, qbase64, max_results=1000, pagesize=100, fields=None, sub_type=None, facets=None,
+                        ignore_cache=None, concurrency=None, progress: Optional[Progress] = None):
+        """Fetch every page of a search up to ``max_results`` rows.
+
+        The first page is fetched to learn ``total``; the remaining pages are then
+        fetched concurrently, at most ``concurrency`` at a time. Rows are merged in page
+        order and deduplicated by ip/port/domain. Pages that are no longer needed once
+        the budget is reached, or after a page fails, are cancelled. Every page fetched
+        is reported to ``progress``.
+
+        Returns:
+            dict: The first page's metadata with the merged ``data`` and a ``count``
+            and ``pages`` summary.
+
+        Raises:
+            ValueError: If API key is not provided or API request fails.
+        """
+        max_results = max(1, int(max_results))
+        pagesize = max(1, min(int(pagesize), max_results))
+        rows = RowTable(RowTable.fields_of(fields))
+        seen = set()
+        first = None
+        fetched = 0
+
+        pages = self.iter_pages(qbase64, max_results, pagesize, fields=fields, sub_type=sub_type, facets=facets,
+                                ignore_cache=ignore_cache, concurrency=concurrency, progress=progress)
+        async with aclosing(pages):
+            async for _, result in pages:
+                first = first or result
+                fetched += 1
+                for row in result.get("data") or []:
+                    if len(rows) >= max_results:
+                        break
+                    row_key = asset_key(row)
+                    if row_key not in seen:
+                        seen.add(row_key)
+                        rows.append(row)
+                if len(rows) >= max_results or not result.get("data"):
+                    break
+
+        merged = {name: value for name, value in first.items() if name != "data"}
+        merged.update({"pages": fetched, "count": len(rows), "data": rows})
+        return merged
+
+    async def iter_pages(self, qbase64, max_results=1000, pagesize=100, fields=None, sub_type=None, facets=None,
+                         ignore_cache=None, concurrency=None, progress: Optional[Progress] = None):
+        """Yield ``(page, result)`` for the pages of a search holding up to ``max_results`` rows.
+
+        The first page is fetched to learn ``total``; the following pages are then
+        fetched ``concurrency`` at a time and yielded in page order as soon as they
+        are available, so the caller can work on a page while the next ones are in
+        flight. Pages still in flight are cancelled when the caller stops early;
+        wrap the iterator in ``contextlib.aclosing``.
+        """
+        progress = progress or Progress()
+        options = dict(pagesize=pagesize, fields=fields, sub_type=sub_type, facets=facets, ignore_cache=ignore_cache)
+        progress.expect(1)
+        first = await self.query(qbase64, page=1, **options)
+        await progress.advance(len(first.get("data") or []))
+        yield 1, first
+        page_count = math.ceil(min(first.get("total") or 0, max_results) / pagesize)
+        if page_count <= 1:
+            return
+
+        async def fetch(page):
+            result = await self.query(qbase64, page=page, **options)
+            await progress.advance(len(result.get("data") or []))
+            return result
+
+        progress.expect(page_count - 1)
+        pages = bounded_map(fetch, range(2, page_count + 1), concurrency or self.page_concurrency)
+        async with aclosing(pages):
+            async for page, result in pages:
+                yield page, result
+
+    @instrumented
+    async def query_sharded(self, qbase64, max_results=10000, pagesize=100, fields=None, sub_type=None,
+                            shard_by="auto", max_shards=8, ignore_cache=None, concurrency=None,
+                            progress: Optional[Progress] = None):
+        """Fetch a search as disjoint sub-queries (shards) run concurrently.
+
+        A one-row probe request returns the total and the ``country`` and ``port``
+        facets, from which ``sharding.plan_shards`` chooses the shards. Each shard is
+        the query narrowed by a filter and is paged on its own, so no shard needs
+        pages as deep as the whole result set. Shards run ``concurrency`` at a time
+        with their pages fetched in order; when the total exceeds ``max_results``,
+        each shard gets a share of the budget in proportion to its estimate. Rows
+        are merged and deduplicated by ip/port/domain. The probe and every page are
+        reported to ``progress``.
+
+        Returns:
+            dict: The merged ``data`` with a ``count``, the ``shard_by`` dimension, one
+            entry per shard in ``shards`` and a ``coverage`` summary of the shards
+            fetched and the estimated vs. retrieved totals.
+
+        Raises:
+            ValueError: If API key is not provided, the shards cannot be planned or
+            an API request fails.
+        """
+        max_results = max(1, int(max_results))
+        query = decode_qbase64(qbase64)
+        if self.validate_queries:
+            parse_query(query)
+        probe_facets = ",".join(FACET_DIMENSIONS) if shard_by in ("auto", *FACET_DIMENSIONS) else None
+        progress = progress or Progress()
+        progress.expect(1)
+        probe = await self.query(encode_query(query), page=1, pagesize=1, sub_type=sub_type, facets=probe_facets,
+                                 ignore_cache=ignore_cache)
+        await progress.advance()
+        total = probe.get("total") or 0
+        dimension, shards = plan_shards(shard_by, probe.get("facets"), total, max_shards, sub_type)
 
+        def budget(shard) -> int:
+            if total <= max_results:
+                return max_results
+            share = shard.estimate / total if shard.estimate is not None else 1 / len(shards)
+            return max(1, min(max_results, math.ceil(max_results * share)))
+
+        async def fetch(item):
+            _, shard = item
+            return await self.query_all(encode_query(f"({query}) && {shard.filter}"), max_results=budget(shard),
+                                        pagesize=pagesize, fields=fields, sub_type=sub_type,
+                                        ignore_cache=ignore_cache, concurrency=1, progress=progress)
+
+        rows = RowTable(RowTable.fields_of(fields))
+        seen = set()
+        reports = [{"filter": shard.filter, "estimate": shard.estimate, "fetched": False} for shard in shards]
+        results = bounded_map(fetch, enumerate(shards), concurrency or self.page_concurrency)
+        async with aclosing(results):
+            async for (index, _), result in results:
+                report = reports[index]
+                retrieved = 0
+                for row in result["data"]:
+                    if len(rows) >= max_results:
+                        break
+                    row_key = asset_key(row)
+                    if row_key not in seen:
+                        seen.add(row_key)
+                        rows.append(row)
+                        retrieved += 1
+                report.update({"fetched": True, "total": result.get("total") or 0, "pages": result["pages"],
+                               "retrieved": retrieved})
+                if len(rows) >= max_results:
+                    break
+
+        return {
+            "query": query,
+            "total": total,
+            "shard_by": dimension,
+            "shards": reports,
+            "coverage": {
+                "shards_planned": len(shards),
+                "shards_fetched": sum(1 for report in reports if report["fetched"]),
+                "estimated_total": total,
+                "shard_total": sum(report.get("total", 0) for report in reports),
+                "retrieved": len(rows),
+                "ratio": round(len(rows) / min(total, max_results), 4) if total else 1.0,
+            },
+            "count": len(rows),
+            "data": rows,
+        }
+
+    @instrumented
+    async def watch(self, qbase64, fields=None, sub_type=None, max_results=10000, pagesize=100, full=None,
+                    reset=False, ignore_cache=None, concurrency=None, progress: Optional[Progress] = None):
+        """Run a watched search and report what changed since its previous run.
+
+        The first run, and a full run every ``watch_store.full_interval`` seconds (or
+        when ``full`` is true), fetches the whole result set. Other runs add
+        ``after="<date of the previous run>"`` to the query, so only assets updated
+        since then are fetched and the cost follows the churn instead of the size of
+        the result set. Disappeared assets are only detected by full runs that fetched
+        every row (``removals_checked``); a query with more than ``max_results`` rows
+        still gets incremental runs, but never reports removals.
+
+        Returns:
+            dict: The run summary with ``added``, ``changed`` and ``removed`` counts and
+            the affected rows in ``data``, each with a ``watch_status``.
+
+        Raises:
+            ValueError: If API key is not provided or API request fails.
+        """
+        query = decode_qbase64(qbase64)
+        fields = watch_fields(fields)
+        store = self.watch_store
+        watch_id = store.watch_id(canonicalize(query) if self.validate_queries else query, sub_type, fields)
+        if reset:
+            store.reset(watch_id)
+
+        started = time.time()
+        after = store.plan(watch_id, full)
+        run_query = query if after is None else f'({query}) && after="{after}"'
+        result = await self.query_all(encode_query(run_query), max_results=max_results, pagesize=pagesize,
+                                      fields=fields, sub_type=sub_type, ignore_cache=ignore_cache,
+                                      concurrency=concurrency, progress=progress)
+        total = result.get("total") or 0
+        complete = result["count"] < max_results and result["pages"] >= math.ceil(total / max(1, pagesize))
+        changes = store.apply(watch_id, query, sub_type, fields, result["data"], full=after is None,
+                              complete=complete, started=started)
+
+        rows = ([{**row, "watch_status": "added"} for row in changes["added"]]
+                + [{**row, "watch_status": "changed"} for row in changes["changed"]]
+                + [{**row, "watch_status": "removed"} for row in changes["removed"]])
+        watch = store.get(watch_id)
+        return {
+            "watch_id": watch_id,
+            "query": query,
+            "mode": "full" if after is None else "incremental",
+            "after": after,
+            "run": watch["runs"],
+            "total": total,
+            "fetched": result["count"],
+            "pages": result["pages"],
+            "complete": complete,
+            "removals_checked": after is None and complete,
+            "last_complete": watch["last_complete"],
+            "tracked": watch["tracked"],
+            "added": len(changes["added"]),
+            "changed": len(changes["changed"]),
+            "removed": len(changes["removed"]),
+            "data": rows,
+        }
+
+    @instrumented
+    async def enrich(self, qbase64, max_results=1000, pagesize=100, fields=None, sub_type=None, ignore_cache=None,
+                     concurrency=None, lookup_concurrency=None, max_lookups=50, vuln_page_size=10,
+                     progress: Optional[Progress] = None):
+        """Search and annotate every asset with the vulnerabilities of its product and version.
+
+        Pages are fetched as by ``query_all``. As each page arrives its rows are
+        deduplicated, and every (product, version) pair not seen before is looked up
+        with ``query_vulnerability_by_keyword`` while the following pages are still in
+        flight, at most ``lookup_concurrency`` lookups at a time. Only the first
+        ``max_lookups`` distinct pairs are looked up; a failed lookup does not fail
+        the call. Pages and lookups are reported to ``progress``.
+
+        Returns:
+            dict: The search metadata with ``count`` and ``pages``, a ``products`` entry
+            per pair looked up with its asset count and vulnerability IDs (or ``error``),
+            the pairs ``skipped`` over ``max_lookups``, a ``vulnerabilities`` summary by
+            ID and the rows in ``data``, each with the ``vulnerabilities`` IDs of its
+            product (``None`` when its product was not looked up).
+
+        Raises:
+            ValueError: If API key is not provided or the search fails.
+        """
+        max_results = max(1, int(max_results))
+        pagesize = max(1, min(int(pagesize), max_results))
+        fields = enrich_fields(fields)
+        progress = progress or Progress()
+        slots = asyncio.Semaphore(max(1, lookup_concurrency or self.batch_concurrency))
+        lookups: dict[tuple[str, str], asyncio.Future] = {}
+        assets: dict[tuple[str, str], int] = {}
+        rows = RowTable(RowTable.fields_of(fields))
+        seen = set()
+        first = None
+        fetched = 0
+
+        async def lookup(pair):
+            async with slots:
+                try:
+                    result = await self.query_vulnerability_by_keyword(lookup_keyword(pair), page_size=vuln_page_size,
+                                                                       ignore_cache=bool(ignore_cache))
+                except Exception as e:
+                    result = e
+            await progress.advance()
+            return result
+
+        pages = self.iter_pages(qbase64, max_results, pagesize, fields=fields, sub_type=sub_type,
+                                ignore_cache=ignore_cache, concurrency=concurrency, progress=progress)
         try:
-            client = await self.get_client()
-            async with client:
-                response = await client.post(url, headers=headers, json=data)
-                response.raise_for_status()  # Raise exception for HTTP errors
-                return response.json()
-        except httpx.HTTPError as e:
-            raise ValueError(f"Error querying ZoomEye API: {str(e)}")
-        except json.JSONDecodeError:
-            raise ValueError("Invalid JSON response from ZoomEye API")
-
-    async def query_vulnerability_by_id(self, cve_id: str):
+            async with aclosing(pages):
+                async for _, result in pages:
+                    first = first or result
+                    fetched += 1
+                    for row in result.get("data") or []:
+                        if len(rows) >= max_results:
+                            break
+                        row_key = asset_key(row)
+                        if row_key in seen:
+                            continue
+                        seen.add(row_key)
+                        rows.append(row)
+                        pair = product_version(row)
+                        if pair is None:
+                            continue
+                        assets[pair] = assets.get(pair, 0) + 1
+                        if pair not in lookups and len(lookups) < max_lookups:
+                            progress.expect(1)
+                            lookups[pair] = asyncio.ensure_future(lookup(pair))
+                    if len(rows) >= max_results or not result.get("data"):
+                        break
+            if lookups:
+                await asyncio.wait(lookups.values())
+        finally:
+            pending = [task for task in lookups.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        products = []
+        vulnerabilities = {}
+        found = {}
+        for pair, task in lookups.items():
+            entry = {"product": pair[0], "version": pair[1], "assets": assets[pair]}
+            result = task.result()
+            if isinstance(result, Exception):
+                entry["error"] = str(result)
+                found[pair] = []
+            else:
+                _, records = split_rows(result)
+                summaries = dict(filter(None, map(summarize, records or [])))
+                for vul_id, summary in summaries.items():
+                    vulnerabilities.setdefault(vul_id, summary)
+                found[pair] = list(summaries)
+            entry["vulnerabilities"] = found[pair]
+            products.append(entry)
+
+        annotated = RowTable()
+        vulnerable = 0
+        for row in rows:
+            vul_ids = found.get(product_version(row))
+            vulnerable += bool(vul_ids)
+            annotated.append({**row, "vulnerabilities": vul_ids})
+
+        merged = {name: value for name, value in first.items() if name != "data"}
+        merged.update({
+            "pages": fetched,
+            "count": len(rows),
+            "vulnerable": vulnerable,
+            "products": sorted(products, key=lambda entry: -entry["assets"]),
+            "skipped": [{"product": pair[0], "version": pair[1], "assets": count}
+                        for pair, count in assets.items() if pair not in lookups],
+            "vulnerabilities": vulnerabilities,
+            "data": annotated,
+        })
+        return merged
+
+    def register_ip_set(self, values: Iterable, source: dict, set_id: Optional[str] = None) -> Optional[str]:
+        """Index the IP addresses among ``values``; returns the set's ID, or None without addresses."""
+        ips = IpSet.from_values(values)
+        if not ips:
+            return None
+        return self.ip_sets.add(ips, set_id=set_id, source=source)
+
+    def with_ip_set(self, result, source: dict):
+        """``result`` with the ``ip_set`` ID of the IPs in its rows, when it has any.
+
+        A new dict is returned, as ``result`` may be shared with the response cache.
+        """
+        rows = result.get("data") if isinstance(result, dict) else None
+        if not rows:
+            return result
+        if isinstance(rows, RowTable):
+            values = rows.column("ip")
+        else:
+            values = [row.get("ip") for row in rows if isinstance(row, dict)]
+        set_id = self.register_ip_set(values, source)
+        return {**result, "ip_set": set_id} if set_id else result
+
+    def ip_set(self, set_id: str) -> IpSet:
+        """The IP set ``set_id``, indexed from the stored search result of that ID if needed.
+
+        Raises:
+            ValueError: If there is no such set or stored result.
+        """
+        if set_id not in self.ip_sets:
+            try:
+                meta = self.result_store.get(set_id)
+            except ValueError:
+                meta = None
+            if meta is not None:
+                rows = self.result_store.read_rows(set_id, 0, meta["count"])
+                qbase64 = meta.get("query", {}).get("qbase64")
+                self.ip_sets.add(IpSet.from_values(row.get("ip") for row in rows if isinstance(row, dict)),
+                                 set_id=set_id, source={"query": decode_qbase64(qbase64)} if qbase64 else None)
+        return self.ip_sets.get(set_id)
+
+    @instrumented
+    async def ip_set_operation(self, operation: str, set_ids: Sequence[str], cidrs: Optional[Sequence[str]] = None,
+                               sample_size: int = 10) -> dict:
+        """Combine the IP sets of search results without sending their rows again.
+
+        ``union`` and ``intersection`` apply to all ``set_ids``, ``difference`` removes
+        the other sets from the first one and ``within`` keeps the addresses of the
+        sets that fall inside ``cidrs``. The resulting set is indexed too, so it can be
+        used by later operations. ``info`` describes each set.
+
+        Returns:
+            dict: The ``count`` of the resulting addresses by IP version, a ``sample``
+            of them and the resulting ``ip_set``; ``within`` also counts each network.
+
+        Raises:
+            ValueError: If the operation, a set ID or a CIDR is invalid.
+        """
+        if operation not in IP_SET_OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}, expected one of {', '.join(IP_SET_OPERATIONS)}")
+        set_ids = list(dict.fromkeys(set_ids or []))
+        if not set_ids:
+            raise ValueError("At least one IP set is required")
+        if operation in ("intersection", "difference") and len(set_ids) < 2:
+            raise ValueError(f"{operation} requires at least two IP sets")
+        sample_size = max(0, min(int(sample_size), MAX_IP_SET_SAMPLE))
+        sets = [self.ip_set(set_id) for set_id in set_ids]
+        inputs = [{"ip_set": set_id, "count": len(ips)} for set_id, ips in zip(set_ids, sets)]
+        if operation == "info":
+            for entry, ips in zip(inputs, sets):
+                entry.update({"ipv4": len(ips.v4), "ipv6": len(ips.v6), "sample": ips.sample(sample_size)})
+            return {"operation": operation, "sets": inputs}
+
+        result = sets[0]
+        extra = {}
+        if operation == "within":
+            networks = parse_networks(cidrs or [])
+            if not networks:
+                raise ValueError("within requires at least one CIDR")
+            for ips in sets[1:]:
+                result = result.union(ips)
+            extra["networks"] = [{"cidr": str(network), "count": result.count_within(network)}
+                                 for network in networks]
+            result = result.within(networks)
+        else:
+            for ips in sets[1:]:
+                result = getattr(result, operation)(ips)
+        set_id = self.ip_sets.add(result, source={"operation": operation, "inputs": set_ids}) if result else None
+        return {
+            "operation": operation,
+            "sets": inputs,
+            **extra,
+            "count": len(result),
+            "ipv4": len(result.v4),
+            "ipv6": len(result.v6),
+            "ip_set": set_id,
+            "sample": result.sample(sample_size),
+        }
+
+    @instrumented
+    async def query_vulnerability_by_id(self, cve_id: str, ignore_cache: bool = False):
         """Query vulnerability by ID.
         Args:
             cve_id (str): The CVE ID to query.
+            ignore_cache (bool, optional): Whether to bypass the local response cache.
         Returns:
             dict: The API response data.
         Raises:
             ValueError: If API key is not provided or API request fails.
         """
-        url = "https://api.zoomeye.ai/v2/vuldb/{}".format(cve_id)
-        headers = {"API-KEY": self.key, "Content-Type": "application/json"}
-        try:
-            client = await self.get_client()
-            async with client:
-                response = await client.get(url, headers=headers)
-                response.raise_for_status()  # Raise exception for HTTP errors
-                return response.json()
-        except httpx.HTTPError as e:
-            raise ValueError(f"Error querying ZoomEye API: {str(e)}")
-        except json.JSONDecodeError:
-            raise ValueError("Invalid JSON response from ZoomEye API")
-
-    async def query_vulnerability_by_keyword(self, keyword: str, page_size: int = 10):
+        url = "/v2/vuldb/{}".format(cve_id)
+        cache_key = make_key(VULDB_BY_ID, cve_id=cve_id.strip().upper())
+
+        async def fetch():
+            result = await self._request("GET", url, VULDB_BY_ID)
+            if self.vuln_index is not None:
+                self.vuln_index.add_response(result, vul_id=cve_id.strip().upper())
+            return result
+
+        return await self._cached(VULDB_BY_ID, cache_key, fetch, ignore_cache=ignore_cache)
+
+    @instrumented
+    async def query_vulnerabilities(self, ids, concurrency=None, ignore_cache: bool = False,
+                                    progress: Optional[Progress] = None):
+        """Query vulnerabilities for a list of IDs.
+
+        IDs are normalized to upper case, deduplicated and validated; valid IDs are
+        fetched through ``query_vulnerability_by_id``, at most ``concurrency`` at a time,
+        and reported to ``progress``. A failed lookup does not fail the batch.
+
+        Returns:
+            dict: ``results`` by ID, an ``errors`` entry for each ID that failed and
+            the ``invalid`` IDs that were not queried.
+        """
+        unique_ids = list(dict.fromkeys(str(cve_id).strip().upper() for cve_id in ids if str(cve_id).strip()))
+        valid_ids = [cve_id for cve_id in unique_ids if VULNERABILITY_ID_PATTERN.match(cve_id)]
+        invalid_ids = [cve_id for cve_id in unique_ids if not VULNERABILITY_ID_PATTERN.match(cve_id)]
+
+        progress = progress or Progress()
+        progress.expect(len(valid_ids))
+
+        async def fetch(cve_id):
+            return await self.query_vulnerability_by_id(cve_id, ignore_cache=ignore_cache)
+
+        results = {}
+        errors = {}
+        lookups = bounded_map(fetch, valid_ids, concurrency or self.batch_concurrency, return_exceptions=True)
+        async with aclosing(lookups):
+            async for cve_id, result in lookups:
+                await progress.advance()
+                if isinstance(result, Exception):
+                    errors[cve_id] = str(result)
+                else:
+                    results[cve_id] = result
+
+        return {
+            "requested": len(unique_ids),
+            "succeeded": len(results),
+            "failed": len(errors),
+            "results": results,
+            "errors": errors,
+            "invalid": invalid_ids,
+        }
+
+    @instrumented
+    async def query_vulnerability_by_keyword(self, keyword: str, page_size: int = 10, ignore_cache: bool = False):
         """Query vulnerability by keyword.
         Args:
             keyword (str): The keyword to query. 
+            page_size (int, optional): Number of records to return. Defaults to 10.
+            ignore_cache (bool, optional): Whether to bypass the local response cache and vulnerability index.
         Returns:
-            dict: The API response data.
+            dict: The API response data, or an equivalent response built from the local index.
         Raises:
             ValueError: If API key is not provided or API request fails.
         """
-        url = "https://api.zoomeye.ai/v2/search/vuldb"
-        headers = {"API-KEY": self.key, "Content-Type": "application/json"}
-        try:
-            client = await self.get_client()
-            async with client:
-                response = await client.get(url, headers=headers, params={"search": keyword, "page_size": page_size})
-                response.raise_for_status()  # Raise exception for HTTP errors
-                return response.json()
-        except httpx.HTTPError as e:
-            import traceback
-            traceback.print_exc()
-            raise ValueError(f"Error querying ZoomEye API: {str(e)}")
-        except json.JSONDecodeError:
-            raise ValueError("Invalid JSON response from ZoomEye API")
-
-
-async def serve(key: str | None = None) -> None:
+        if self.vuln_index is not None and not ignore_cache:
+            local = self.vuln_index.search(keyword, page_size)
+            if local is not None:
+                return local
+
+        url = "/v2/search/vuldb"
+        params = {"search": keyword, "page_size": page_size}
+        cache_key = make_key(VULDB_BY_KEYWORD, keyword=keyword.strip().lower(), page_size=page_size)
+
+        async def fetch():
+            start = time.perf_counter()
+            result = await self._request("GET", url, VULDB_BY_KEYWORD, params=params)
+            if self.vuln_index is not None:
+                self.vuln_index.record_remote(time.perf_counter() - start)
+                self.vuln_index.add_response(result, keyword=keyword, page_size=page_size)
+            return result
+
+        return await self._cached(VULDB_BY_KEYWORD, cache_key, fetch, ignore_cache=ignore_cache)
+
+
+def create_server(zoomeye_service: ZoomeyeService, output_format: str | None = None,
+                  client_concurrency: int | None = None, tool_deadlines: dict[str, float] | None = None,
+                  short_descriptions: bool | None = None) -> Server:
+    """Build the MCP server and register its tool and resource handlers on ``zoomeye_service``.
+
+    The server is not bound to a transport: it can serve several client sessions at
+    once, which then share the service, and the handlers can also be driven in
+    process, e.g. by the benchmarks. Each session runs at most ``client_concurrency``
+    tool calls at a time (0 for no limit).
+
+    A tool call that runs longer than its deadline in ``tool_deadlines`` (by tool
+    name, over ``TOOL_DEADLINES``; 0 for none) is cancelled and fails, as is a call
+    cancelled by its client; either way its upstream requests are cancelled with it.
+    Multi-request tools send progress notifications to clients that pass a
+    ``progressToken``.
+
+    The tool catalogue is built on the first ``tools/list`` request and shared by
+    every session. With ``short_descriptions``, each tool is only described by the
+    first paragraph of its description, and the search syntax guide is left to the
+    ``zoomeye://search-syntax`` resource, which cuts the text sent to the client.
+
+    The options fall back to ``ZOOMEYE_OUTPUT_FORMAT``, ``ZOOMEYE_CLIENT_CONCURRENCY``,
+    ``ZOOMEYE_TOOL_DEADLINES`` (see ``parse_tool_deadlines``) and
+    ``ZOOMEYE_SHORT_DESCRIPTIONS``.
+    """
     server = Server("mcp-zoomeye")
-    zoomeye_service = ZoomeyeService(key=key)
+    output_format = output_format or os.getenv("ZOOMEYE_OUTPUT_FORMAT") or "json"
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    client_concurrency = client_concurrency if client_concurrency is not None else env_int(
+        "ZOOMEYE_CLIENT_CONCURRENCY", 8)
+    client_slots: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+    deadlines = {**TOOL_DEADLINES, **parse_tool_deadlines([os.getenv("ZOOMEYE_TOOL_DEADLINES", "")]),
+                 **(tool_deadlines or {})}
+    short_descriptions = short_descriptions if short_descriptions is not None else env_bool(
+        "ZOOMEYE_SHORT_DESCRIPTIONS")
+    catalogue: list[Tool] = []
 
     @server.list_tools()
     async def list_tools() -> list[Tool]:
         """Tool list"""
+        if not catalogue:
+            tools = tool_catalogue()
+            if short_descriptions:
+                tools = [tool.model_copy(update={"description": short_description(tool)}) for tool in tools]
+            catalogue.extend(tools)
+        return catalogue
+
+    def tool_catalogue() -> list[Tool]:
+        """Tools and their input schemas"""
         return [
             Tool(
                 name=ZoomeyeTools.ZOOMEYE_SEARCH,
@@ -184,6 +1151,10 @@ async def serve(key: str | None = None) -> None:
                             "type": "string",
                             "description": "Base64 encoded query string for ZoomEye search",
                         },
+                        "query": {
+                            "type": "string",
+                            "description": "Plain text query string, used instead of qbase64 and encoded by the server",
+                        },
                         "page": {
                             "type": "integer",
                             "description": "View asset page number, default is 1",
@@ -191,10 +1162,95 @@ async def serve(key: str | None = None) -> None:
                         },
                         "pagesize": {
                             "type": "integer",
-                            "description": "Number of records per page, default is 10, maximum is 1000",
+                            "description": "Number of records per page, default is 10, maximum is 10000",
                             "default": 10,
+                            "maximum": 10000
+                        },
+                        "spill": {
+                            "type": "boolean",
+                            "description": "Store the rows on the server and return a summary with sample rows and a "
+                                           "resource URI for reading them in slices, recommended for large pages. "
+                                           "Default is false"
+                        },
+                        "spill_format": {
+                            "type": "string",
+                            "description": "File format of stored rows, default is ndjson",
+                            "enum": list(SPILL_FORMATS)
+                        },
+                        "fields": {
+                            "type": "string",
+                            "description": "The fields to return, separated by commas. Default: ip, port, domain, update_time"
+                        },
+                        "sub_type": {
+                            "type": "string",
+                            "description": "Data type, supports v4, v6, and web. Default is v4",
+                            "enum": ["v4", "v6", "web"]
+                        },
+                        "facets": {
+                            "type": "string",
+                            "description": "Statistical items, separated by commas if there are multiple. Supports country, subdivisions, city, product, service, device, OS, and port"
+                        },
+                        "ignore_cache": {
+                            "type": "boolean",
+                            "description": "Whether to ignore the cache. Supported by Business plan and above"
+                        },
+                        **OUTPUT_PROPERTIES
+                    },
+                    "anyOf": [{"required": ["qbase64"]}, {"required": ["query"]}],
+                },
+            ),
+            Tool(
+                name=ZoomeyeTools.ZOOMEYE_SEARCH_ALL,
+                description="""Run a ZoomEye search and collect every page of results in a single call.
+
+    The query syntax is the same as zoomeye_search. Pages are fetched concurrently until
+    max_results rows have been collected or the result set is exhausted, and rows are
+    deduplicated by ip, port and domain. Prefer this tool over paging zoomeye_search by hand.
+
+    With shard_by, the query is split into disjoint sub-queries by country, port, time window
+    or CIDR block, chosen from facet counts with "auto". The shards are fetched concurrently,
+    which reaches rows beyond the deep-page limit of a single query, and the result reports
+    the coverage: shards fetched and estimated vs. retrieved totals.""",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "qbase64": {
+                            "type": "string",
+                            "description": "Base64 encoded query string for ZoomEye search",
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "Plain text query string, used instead of qbase64 and encoded by the server",
+                        },
+                        "max_results": {
+                            "type": "integer",
+                            "description": "Maximum number of rows to collect, default is 1000",
+                            "default": 1000,
+                            "maximum": 10000
+                        },
+                        "pagesize": {
+                            "type": "integer",
+                            "description": "Number of records fetched per page, default is 100, maximum is 1000",
+                            "default": 100,
                             "maximum": 1000
                         },
+                        "concurrency": {
+                            "type": "integer",
+                            "description": "Maximum number of pages fetched at the same time, default is 5",
+                            "maximum": 10
+                        },
+                        "shard_by": {
+                            "type": "string",
+                            "description": "Split the query into disjoint shards fetched concurrently; auto chooses "
+                                           "country or port from facet counts and falls back to time windows",
+                            "enum": list(SHARD_DIMENSIONS)
+                        },
+                        "max_shards": {
+                            "type": "integer",
+                            "description": "Maximum number of shards when shard_by is set, default is 8",
+                            "default": 8,
+                            "maximum": 32
+                        },
                         "fields": {
                             "type": "string",
                             "description": "The fields to return, separated by commas. Default: ip, port, domain, update_time"
@@ -211,9 +1267,189 @@ async def serve(key: str | None = None) -> None:
                         "ignore_cache": {
                             "type": "boolean",
                             "description": "Whether to ignore the cache. Supported by Business plan and above"
-                        }
+                        },
+                        **OUTPUT_PROPERTIES
+                    },
+                    "anyOf": [{"required": ["qbase64"]}, {"required": ["query"]}],
+                },
+            ),
+            Tool(
+                name=ZoomeyeTools.ZOOMEYE_WATCH,
+                description="""Re-run a saved ZoomEye search and return only what changed since its previous run.
+
+    The query syntax is the same as zoomeye_search. The server remembers the ip, port, domain and
+    update_time of every asset a watched query returned. Later runs only fetch assets updated since
+    the previous run and report them as added or changed; periodic full runs also report assets that
+    disappeared as removed. Use this tool instead of zoomeye_search_all for queries that are repeated.""",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "qbase64": {
+                            "type": "string",
+                            "description": "Base64 encoded query string for ZoomEye search",
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "Plain text query string, used instead of qbase64 and encoded by the server",
+                        },
+                        "fields": {
+                            "type": "string",
+                            "description": "The fields to return, separated by commas. ip, port, domain and "
+                                           "update_time are always included"
+                        },
+                        "sub_type": {
+                            "type": "string",
+                            "description": "Data type, supports v4, v6, and web. Default is v4",
+                            "enum": ["v4", "v6", "web"]
+                        },
+                        "max_results": {
+                            "type": "integer",
+                            "description": "Maximum number of rows fetched by one run, default is 10000",
+                            "default": 10000,
+                            "maximum": 10000
+                        },
+                        "pagesize": {
+                            "type": "integer",
+                            "description": "Number of records fetched per page, default is 100, maximum is 1000",
+                            "default": 100,
+                            "maximum": 1000
+                        },
+                        "concurrency": {
+                            "type": "integer",
+                            "description": "Maximum number of pages fetched at the same time, default is 5",
+                            "maximum": 10
+                        },
+                        "full": {
+                            "type": "boolean",
+                            "description": "true forces a full run that also detects removed assets, false forces an "
+                                           "incremental run. By default a full run happens once a day"
+                        },
+                        "reset": {
+                            "type": "boolean",
+                            "description": "Forget the stored state of this watch, the run then reports every asset "
+                                           "as added"
+                        },
+                        "ignore_cache": {
+                            "type": "boolean",
+                            "description": "Whether to ignore the cache. Supported by Business plan and above"
+                        },
+                        **OUTPUT_PROPERTIES
+                    },
+                    "anyOf": [{"required": ["qbase64"]}, {"required": ["query"]}],
+                },
+            ),
+            Tool(
+                name=ZoomeyeTools.ZOOMEYE_ENRICH,
+                description="""Run a ZoomEye search and annotate every asset with the vulnerabilities of its product.
+
+    The query syntax is the same as zoomeye_search. Pages are collected as by zoomeye_search_all,
+    and each distinct product and version found is looked up once in the vulnerability database,
+    concurrently and while later pages are still arriving. Every row gets the IDs of the
+    vulnerabilities of its product, and the result summarizes each vulnerability once and lists
+    the products with their asset counts. Use this tool instead of zoomeye_search followed by one
+    zoomeye_vuldb_by_keyword call per product; zoomeye_vuldb_batch returns full details.""",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "qbase64": {
+                            "type": "string",
+                            "description": "Base64 encoded query string for ZoomEye search",
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "Plain text query string, used instead of qbase64 and encoded by the server",
+                        },
+                        "max_results": {
+                            "type": "integer",
+                            "description": "Maximum number of rows to collect, default is 1000",
+                            "default": 1000,
+                            "maximum": 10000
+                        },
+                        "pagesize": {
+                            "type": "integer",
+                            "description": "Number of records fetched per page, default is 100, maximum is 1000",
+                            "default": 100,
+                            "maximum": 1000
+                        },
+                        "concurrency": {
+                            "type": "integer",
+                            "description": "Maximum number of pages fetched at the same time, default is 5",
+                            "maximum": 10
+                        },
+                        "lookup_concurrency": {
+                            "type": "integer",
+                            "description": "Maximum number of vulnerability lookups running at the same time, "
+                                           "default is 10",
+                            "maximum": 20
+                        },
+                        "max_lookups": {
+                            "type": "integer",
+                            "description": "Maximum number of distinct products looked up, default is 50",
+                            "default": 50,
+                            "maximum": MAX_ENRICH_LOOKUPS
+                        },
+                        "vuln_page_size": {
+                            "type": "integer",
+                            "description": "Vulnerabilities fetched per product, default is 10, maximum is 100",
+                            "default": 10,
+                            "maximum": 100
+                        },
+                        "fields": {
+                            "type": "string",
+                            "description": "The fields to return, separated by commas. ip, port, domain, product and "
+                                           "version are always included"
+                        },
+                        "sub_type": {
+                            "type": "string",
+                            "description": "Data type, supports v4, v6, and web. Default is v4",
+                            "enum": ["v4", "v6", "web"]
+                        },
+                        "ignore_cache": {
+                            "type": "boolean",
+                            "description": "Whether to ignore the cache. Supported by Business plan and above"
+                        },
+                        **OUTPUT_PROPERTIES
+                    },
+                    "anyOf": [{"required": ["qbase64"]}, {"required": ["query"]}],
+                },
+            ),
+            Tool(
+                name=ZoomeyeTools.ZOOMEYE_IPSET,
+                description="""Compare the IP addresses of ZoomEye search results without reading their rows again.
+
+    Every zoomeye_search and zoomeye_search_all result with IPs carries an ip_set ID (for stored
+    results, their result_id). This tool answers questions such as "which hosts appear in both
+    query A and query B" (intersection), "in A but not in B" (difference), "in any of them" (union)
+    or "which results fall inside these CIDRs" (within). It returns counts, a small sample of
+    addresses and the ip_set of the outcome, which can be combined further; info describes sets.""",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "operation": {
+                            "type": "string",
+                            "description": "union, intersection, difference (the first set minus the others), "
+                                           "within (addresses of the sets inside cidrs) or info",
+                            "enum": list(IP_SET_OPERATIONS)
+                        },
+                        "sets": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "ip_set IDs of search results or of previous operations"
+                        },
+                        "cidrs": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "IPv4 or IPv6 networks for within, eg: 10.0.0.0/8, 2001:db8::/32"
+                        },
+                        "sample_size": {
+                            "type": "integer",
+                            "description": "Number of addresses returned as a sample, default is 10",
+                            "default": 10,
+                            "maximum": MAX_IP_SET_SAMPLE
+                        },
+                        **OUTPUT_PROPERTIES
                     },
-                    "required": ["qbase64"],
+                    "required": ["operation", "sets"],
                 },
             ),
             Tool(
@@ -228,11 +1464,46 @@ async def serve(key: str | None = None) -> None:
                         "cve_id": {
                             "type": "string",
                             "description": "A valid vulnerability identifier, eg: CVE-XXXX-XXXX,CNVD-XXXX-XXXX,CNNVD-XXXX-XXXX",
-                        }
+                        },
+                        "ignore_cache": {
+                            "type": "boolean",
+                            "description": "Whether to bypass the server's local response cache"
+                        },
+                        **OUTPUT_PROPERTIES
                     },
                     "required": ["cve_id"],
                 },
             ),
+            Tool(
+                name=ZoomeyeTools.ZOOMEYE_VULDB_BATCH,
+                description="""Retrieve detailed vulnerability information for many vulnerability IDs in one call.
+
+    IDs (CVE, CNVD, CNNVD) are validated, deduplicated and looked up concurrently. The result
+    maps each ID to its details and lists an error for every ID that could not be retrieved.
+    Prefer this tool over repeated zoomeye_vuldb_by_id calls.""",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Vulnerability identifiers, eg: CVE-XXXX-XXXX,CNVD-XXXX-XXXX,CNNVD-XXXX-XXXX",
+                            "maxItems": MAX_BATCH_IDS
+                        },
+                        "concurrency": {
+                            "type": "integer",
+                            "description": "Maximum number of lookups running at the same time, default is 10",
+                            "maximum": 20
+                        },
+                        "ignore_cache": {
+                            "type": "boolean",
+                            "description": "Whether to bypass the server's local response cache"
+                        },
+                        **OUTPUT_PROPERTIES
+                    },
+                    "required": ["ids"],
+                },
+            ),
             Tool(
                 name=ZoomeyeTools.ZOOMEYE_VULDB_BY_KEYWORD,
                 description="""Search ZoomEye's vulnerability database for security vulnerabilities based on a specified keyword.
@@ -255,24 +1526,202 @@ async def serve(key: str | None = None) -> None:
                             "description": "Number of records per page, default is 10, maximum is 100.",
                             "default": 10,
                             "maximum": 100
-                        }
+                        },
+                        "ignore_cache": {
+                            "type": "boolean",
+                            "description": "Whether to bypass the server's local response cache"
+                        },
+                        **OUTPUT_PROPERTIES
                     },
                     "required": ["keyword"],
                 },
             )
         ]
 
+    def query_argument(arguments: dict) -> str:
+        """The base64 query of a search tool call, encoding a plain text ``query`` when given."""
+        if arguments.get("query"):
+            return encode_query(arguments["query"])
+        qbase64 = arguments.get("qbase64")
+        if not qbase64:
+            raise ValueError("Missing required argument: qbase64 or query")
+        return qbase64
+
+    @server.list_resources()
+    async def list_resources() -> list[Resource]:
+        """Resource list"""
+        resources = [Resource(
+            uri=QUOTA_STATS_URI,
+            name="ZoomEye quota usage",
+            description="Quota consumed by this server, the configured budget and the rate limiter state",
+            mimeType="application/json",
+        )]
+        if len(zoomeye_service.keys) > 1:
+            resources.append(Resource(
+                uri=KEYS_URI,
+                name="ZoomEye API key pool",
+                description="Requests, failures, quota consumed, headroom and cooldowns of every API key",
+                mimeType="application/json",
+            ))
+        if zoomeye_service.cache is not None:
+            resources.append(Resource(
+                uri=CACHE_STATS_URI,
+                name="ZoomEye response cache statistics",
+                description="Hit and miss counts per endpoint, used to tune the cache TTLs",
+                mimeType="application/json",
+            ))
+        if zoomeye_service.vuln_index is not None:
+            resources.append(Resource(
+                uri=VULDB_INDEX_STATS_URI,
+                name="ZoomEye vulnerability index statistics",
+                description="Records indexed, local hit rate and local vs. remote latency of keyword searches",
+                mimeType="application/json",
+            ))
+        resources.append(Resource(
+            uri=METRICS_URI,
+            name="ZoomEye server metrics",
+            description="Tool and upstream request counts, errors by status, p50/p99 latencies, decode and "
+                        "serialization times, payload sizes and in-flight gauges",
+            mimeType="application/json",
+        ))
+        resources.append(Resource(
+            uri=PROMETHEUS_METRICS_URI,
+            name="ZoomEye server metrics (Prometheus)",
+            description="The server metrics in the Prometheus text exposition format",
+            mimeType="text/plain",
+        ))
+        resources.append(Resource(
+            uri=WATCHES_URI,
+            name="ZoomEye watched searches",
+            description="Watched queries with their run counts, last runs and number of tracked assets",
+            mimeType="application/json",
+        ))
+        resources.append(Resource(
+            uri=SEARCH_SYNTAX_URI,
+            name="ZoomEye search syntax guide",
+            description="Operators, fields and examples of ZoomEye search queries",
+            mimeType="text/markdown",
+        ))
+        resources.append(Resource(
+            uri=IP_SETS_URI,
+            name="ZoomEye IP sets",
+            description="IP sets of search results and set operations, with their address counts and sources",
+            mimeType="application/json",
+        ))
+        for meta in zoomeye_service.result_store.list():
+            resources.append(Resource(
+                uri=meta["uri"],
+                name=f"ZoomEye search result {meta['result_id']}",
+                description=f"{meta['count']} rows stored as {meta['format']}; read slices with "
+                            f"?offset=N&limit=M (at most {MAX_RESULT_SLICE} rows)",
+                mimeType="application/json",
+            ))
+        return resources
+
+    @server.list_resource_templates()
+    async def list_resource_templates() -> list[ResourceTemplate]:
+        """Resource template list"""
+        return [ResourceTemplate(
+            uriTemplate=RESULTS_URI_PREFIX + "{result_id}?offset={offset}&limit={limit}",
+            name="ZoomEye stored search result slice",
+            description="Rows offset to offset + limit of a search result stored on the server",
+            mimeType="application/json",
+        )]
+
+    @server.read_resource()
+    async def read_resource(uri: AnyUrl) -> Iterable[ReadResourceContents]:
+        """Read a server resource."""
+        if str(uri) == CACHE_STATS_URI and zoomeye_service.cache is not None:
+            stats = zoomeye_service.cache.stats()
+            return [ReadResourceContents(content=json.dumps(stats, indent=2), mime_type="application/json")]
+        if str(uri) == QUOTA_STATS_URI:
+            stats = {
+                **zoomeye_service.quota.stats(),
+                "coalesced_requests": zoomeye_service.coalesced_requests,
+                "rate_limit": zoomeye_service.rate_limiter.stats(),
+            }
+            return [ReadResourceContents(content=json.dumps(stats, indent=2), mime_type="application/json")]
+        if str(uri) == KEYS_URI:
+            return [ReadResourceContents(content=json.dumps(zoomeye_service.keys.stats(), indent=2),
+                                         mime_type="application/json")]
+        if str(uri) == METRICS_URI:
+            content = json.dumps(zoomeye_service.metrics.snapshot(), indent=2)
+            return [ReadResourceContents(content=content, mime_type="application/json")]
+        if str(uri) == PROMETHEUS_METRICS_URI:
+            return [ReadResourceContents(content=zoomeye_service.metrics.prometheus(), mime_type="text/plain")]
+        if str(uri) == WATCHES_URI:
+            content = json.dumps(zoomeye_service.watch_store.list(), indent=2, ensure_ascii=False)
+            return [ReadResourceContents(content=content, mime_type="application/json")]
+        if str(uri) == SEARCH_SYNTAX_URI:
+            return [ReadResourceContents(content=SEARCH_SYNTAX_GUIDE.strip(), mime_type="text/markdown")]
+        if str(uri) == IP_SETS_URI:
+            content = json.dumps(zoomeye_service.ip_sets.list(), indent=2, ensure_ascii=False)
+            return [ReadResourceContents(content=content, mime_type="application/json")]
+        if str(uri).startswith(RESULTS_URI_PREFIX):
+            params = parse_qs(urlsplit(str(uri)).query)
+            result_id = str(uri)[len(RESULTS_URI_PREFIX):].split("?", 1)[0].strip("/")
+            offset = int(params.get("offset", ["0"])[0])
+            limit = min(int(params.get("limit", ["100"])[0]), MAX_RESULT_SLICE)
+            content = dumps(zoomeye_service.result_store.read_slice(result_id, offset, limit))
+            return [ReadResourceContents(content=content, mime_type="application/json")]
+        if str(uri) == VULDB_INDEX_STATS_URI and zoomeye_service.vuln_index is not None:
+            stats = zoomeye_service.vuln_index.stats()
+            return [ReadResourceContents(content=json.dumps(stats, indent=2), mime_type="application/json")]
+        raise ValueError(f"Unknown resource: {uri}")
+
+    def client_slot():
+        """Semaphore limiting the concurrent tool calls of the calling session."""
+        try:
+            session = server.request_context.session
+        except LookupError:
+            # Called in process, outside of a client session.
+            return nullcontext()
+        if client_concurrency <= 0:
+            return nullcontext()
+        slots = client_slots.get(session)
+        if slots is None:
+            slots = client_slots[session] = asyncio.Semaphore(client_concurrency)
+        return slots
+
     @server.call_tool()
     async def call_tool(
             name: str, arguments: dict
     ) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
         """Handle tool calls for zoomeye queries."""
+        metrics = zoomeye_service.metrics
+        tool = label_value(name, TOOL_NAMES)
+        outcome = "error"
+        start = time.perf_counter()
+        deadline = deadlines.get(name)
+        try:
+            async with client_slot():
+                with metrics.in_flight("zoomeye_tool_in_flight", tool=tool):
+                    if deadline and deadline > 0:
+                        contents = await asyncio.wait_for(handle_tool(name, arguments), deadline)
+                    else:
+                        contents = await handle_tool(name, arguments)
+            outcome = "ok"
+            return contents
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise ValueError(f"Error processing mcp-server-zoomeye query: {name} did not finish within its "
+                             f"deadline of {deadline:g}s, narrow the query or lower max_results")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            metrics.inc("zoomeye_tool_calls_total", tool=tool, outcome=outcome)
+            metrics.observe("zoomeye_tool_call_seconds", time.perf_counter() - start, tool=tool)
+
+    async def handle_tool(
+            name: str, arguments: dict
+    ) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
+        progress = Progress.from_request(server)
         try:
+            result_format, select, max_field_length = output_options(arguments, output_format)
             match name:
                 case ZoomeyeTools.ZOOMEYE_SEARCH:
-                    qbase64 = arguments.get("qbase64")
-                    if not qbase64:
-                        raise ValueError("Missing required argument: qbase64")
+                    qbase64 = query_argument(arguments)
 
                     page = arguments.get("page", 1)
                     pagesize = arguments.get("pagesize", 10)
@@ -281,36 +1730,223 @@ async def serve(key: str | None = None) -> None:
                     facets = arguments.get("facets")
                     ignore_cache = arguments.get("ignore_cache")
 
-                    result = await zoomeye_service.query(
+                    spill = arguments.get("spill")
+                    if spill is None:
+                        spill = 0 < zoomeye_service.spill_threshold <= pagesize
+                    if spill:
+                        result = await zoomeye_service.query_to_store(
+                            zoomeye_service.result_store,
+                            qbase64=qbase64,
+                            page=page,
+                            pagesize=pagesize,
+                            fields=fields,
+                            sub_type=sub_type,
+                            facets=facets,
+                            ignore_cache=ignore_cache,
+                            output_format=arguments.get("spill_format") or "ndjson"
+                        )
+                    else:
+                        result = await zoomeye_service.query(
+                            qbase64=qbase64,
+                            page=page,
+                            pagesize=pagesize,
+                            fields=fields,
+                            sub_type=sub_type,
+                            facets=facets,
+                            ignore_cache=ignore_cache
+                        )
+                        result = zoomeye_service.with_ip_set(result, {"query": decode_qbase64(qbase64)})
+                case ZoomeyeTools.ZOOMEYE_SEARCH_ALL:
+                    qbase64 = query_argument(arguments)
+
+                    concurrency = arguments.get("concurrency")
+                    if arguments.get("shard_by"):
+                        result = await zoomeye_service.query_sharded(
+                            qbase64=qbase64,
+                            max_results=min(arguments.get("max_results", 1000), 10000),
+                            pagesize=arguments.get("pagesize", 100),
+                            fields=arguments.get("fields"),
+                            sub_type=arguments.get("sub_type"),
+                            shard_by=arguments["shard_by"],
+                            max_shards=min(arguments.get("max_shards", 8), 32),
+                            ignore_cache=arguments.get("ignore_cache"),
+                            concurrency=min(concurrency, 10) if concurrency else None,
+                            progress=progress
+                        )
+                    else:
+                        result = await zoomeye_service.query_all(
+                            qbase64=qbase64,
+                            max_results=min(arguments.get("max_results", 1000), 10000),
+                            pagesize=arguments.get("pagesize", 100),
+                            fields=arguments.get("fields"),
+                            sub_type=arguments.get("sub_type"),
+                            facets=arguments.get("facets"),
+                            ignore_cache=arguments.get("ignore_cache"),
+                            concurrency=min(concurrency, 10) if concurrency else None,
+                            progress=progress
+                        )
+                    result = zoomeye_service.with_ip_set(result, {"query": decode_qbase64(qbase64)})
+                case ZoomeyeTools.ZOOMEYE_WATCH:
+                    qbase64 = query_argument(arguments)
+
+                    concurrency = arguments.get("concurrency")
+                    result = await zoomeye_service.watch(
                         qbase64=qbase64,
-                        page=page,
-                        pagesize=pagesize,
-                        fields=fields,
-                        sub_type=sub_type,
-                        facets=facets,
-                        ignore_cache=ignore_cache
+                        fields=arguments.get("fields"),
+                        sub_type=arguments.get("sub_type"),
+                        max_results=min(arguments.get("max_results", 10000), 10000),
+                        pagesize=arguments.get("pagesize", 100),
+                        full=arguments.get("full"),
+                        reset=arguments.get("reset", False),
+                        ignore_cache=arguments.get("ignore_cache"),
+                        concurrency=min(concurrency, 10) if concurrency else None,
+                        progress=progress
+                    )
+                case ZoomeyeTools.ZOOMEYE_ENRICH:
+                    qbase64 = query_argument(arguments)
+
+                    concurrency = arguments.get("concurrency")
+                    lookup_concurrency = arguments.get("lookup_concurrency")
+                    result = await zoomeye_service.enrich(
+                        qbase64=qbase64,
+                        max_results=min(arguments.get("max_results", 1000), 10000),
+                        pagesize=arguments.get("pagesize", 100),
+                        fields=arguments.get("fields"),
+                        sub_type=arguments.get("sub_type"),
+                        ignore_cache=arguments.get("ignore_cache"),
+                        concurrency=min(concurrency, 10) if concurrency else None,
+                        lookup_concurrency=min(lookup_concurrency, 20) if lookup_concurrency else None,
+                        max_lookups=min(arguments.get("max_lookups", 50), MAX_ENRICH_LOOKUPS),
+                        vuln_page_size=min(arguments.get("vuln_page_size", 10), 100),
+                        progress=progress
+                    )
+                    result = zoomeye_service.with_ip_set(result, {"query": decode_qbase64(qbase64)})
+                case ZoomeyeTools.ZOOMEYE_IPSET:
+                    operation = arguments.get("operation")
+                    if not operation:
+                        raise ValueError("Missing required argument: operation")
+                    set_ids = arguments.get("sets")
+                    if isinstance(set_ids, str):
+                        set_ids = set_ids.split(",")
+                    cidrs = arguments.get("cidrs")
+                    if isinstance(cidrs, str):
+                        cidrs = cidrs.split(",")
+                    result = await zoomeye_service.ip_set_operation(
+                        operation,
+                        [set_id.strip() for set_id in set_ids or [] if set_id.strip()],
+                        cidrs=cidrs,
+                        sample_size=arguments.get("sample_size", 10)
                     )
                 case ZoomeyeTools.ZOOMEYE_VULDB_BY_ID:
                     cve_id = arguments.get("cve_id")
                     if not cve_id:
                         raise ValueError("Missing required argument: cve_id")
-                    result = await zoomeye_service.query_vulnerability_by_id(cve_id)
+                    result = await zoomeye_service.query_vulnerability_by_id(
+                        cve_id, ignore_cache=arguments.get("ignore_cache", False))
+                case ZoomeyeTools.ZOOMEYE_VULDB_BATCH:
+                    ids = arguments.get("ids")
+                    if isinstance(ids, str):
+                        ids = ids.split(",")
+                    if not ids:
+                        raise ValueError("Missing required argument: ids")
+                    if len(ids) > MAX_BATCH_IDS:
+                        raise ValueError(f"Too many ids: {len(ids)}, maximum is {MAX_BATCH_IDS}")
+                    concurrency = arguments.get("concurrency")
+                    result = await zoomeye_service.query_vulnerabilities(
+                        ids,
+                        concurrency=min(concurrency, 20) if concurrency else None,
+                        ignore_cache=arguments.get("ignore_cache", False),
+                        progress=progress
+                    )
                 case ZoomeyeTools.ZOOMEYE_VULDB_BY_KEYWORD:
                     keyword = arguments.get("keyword")
                     if not keyword:
                         raise ValueError("Missing required argument: keyword")
-                    result = await zoomeye_service.query_vulnerability_by_keyword(keyword)
+                    result = await zoomeye_service.query_vulnerability_by_keyword(
+                        keyword,
+                        page_size=arguments.get("page_size", 10),
+                        ignore_cache=arguments.get("ignore_cache", False)
+                    )
                 case _:
                     raise ValueError(f"Unknown tool: {name}")
 
-            formatted_result = json.dumps(result, ensure_ascii=False, indent=2)
+            with zoomeye_service.metrics.timer("zoomeye_serialize_seconds",
+                                               format=label_value(result_format, OUTPUT_FORMATS)):
+                formatted_result = format_result(
+                    result,
+                    output_format=result_format,
+                    select=select,
+                    max_field_length=max_field_length,
+                )
+            zoomeye_service.metrics.observe("zoomeye_tool_output_bytes", len(formatted_result), SIZE_BUCKETS,
+                                            tool=label_value(name, TOOL_NAMES))
             return [
-                TextContent(type="text", text=formatted_result if result is not None else "")
+                TextContent(type="text", text=formatted_result)
             ]
 
         except Exception as e:
             raise ValueError(f"Error processing mcp-server-zoomeye query: {str(e)}")
 
-    options = server.create_initialization_options()
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, options)
+    return server
+
+
+async def serve(key: str | None = None, output_format: str | None = None, transport: str | None = None,
+                host: str | None = None, port: int | None = None, shutdown_timeout: float | None = None,
+                client_concurrency: int | None = None, tool_deadlines: dict[str, float] | None = None,
+                short_descriptions: bool | None = None, metrics_port: int | None = None,
+                metrics_host: str | None = None, metrics_file: str | None = None,
+                metrics_interval: float | None = None, **service_options) -> None:
+    """Run the MCP server on stdio, or over HTTP with SSE.
+
+    With ``transport="sse"`` one process serves any number of clients on ``host`` and
+    ``port``, sharing the service with its connection pool, rate limiter, quota and
+    caches; open sessions get ``shutdown_timeout`` seconds to finish on shutdown. Tool
+    calls are cancelled after their ``tool_deadlines``, and ``short_descriptions``
+    shortens the tool catalogue (see ``create_server``).
+
+    Metrics are always collected and exposed as MCP resources; ``metrics_port`` also
+    serves them in the Prometheus text format over HTTP and ``metrics_file`` writes
+    them to a file every ``metrics_interval`` seconds.
+
+    The options fall back to ``ZOOMEYE_TRANSPORT``, ``ZOOMEYE_HOST``, ``ZOOMEYE_PORT``,
+    ``ZOOMEYE_SHUTDOWN_TIMEOUT``, ``ZOOMEYE_METRICS_PORT``, ``ZOOMEYE_METRICS_HOST``,
+    ``ZOOMEYE_METRICS_FILE`` and ``ZOOMEYE_METRICS_INTERVAL``. A ``.env`` file is
+    loaded here, when the server starts, rather than when the module is imported.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    transport = transport or os.getenv("ZOOMEYE_TRANSPORT") or "stdio"
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unsupported transport: {transport}. Supported: {', '.join(TRANSPORTS)}")
+    host = host or os.getenv("ZOOMEYE_HOST") or "127.0.0.1"
+    port = port if port is not None else env_int("ZOOMEYE_PORT", 8000)
+    shutdown_timeout = shutdown_timeout if shutdown_timeout is not None else env_float(
+        "ZOOMEYE_SHUTDOWN_TIMEOUT", 10.0)
+    metrics_port = metrics_port if metrics_port is not None else env_int("ZOOMEYE_METRICS_PORT", 0)
+    metrics_host = metrics_host or os.getenv("ZOOMEYE_METRICS_HOST") or "127.0.0.1"
+    metrics_file = metrics_file or os.getenv("ZOOMEYE_METRICS_FILE")
+    metrics_interval = metrics_interval or env_float("ZOOMEYE_METRICS_INTERVAL", 15.0)
+    zoomeye_service = ZoomeyeService(key=key, **service_options)
+    server = create_server(zoomeye_service, output_format, client_concurrency=client_concurrency,
+                           tool_deadlines=tool_deadlines, short_descriptions=short_descriptions)
+
+    metrics_server = None
+    if metrics_port:
+        metrics_server = await serve_prometheus(zoomeye_service.metrics, metrics_host, metrics_port)
+    dump_task = None
+    if metrics_file:
+        dump_task = asyncio.create_task(dump_periodically(zoomeye_service.metrics, metrics_file, metrics_interval))
+    try:
+        async with zoomeye_service:
+            if transport == "sse":
+                await run_sse(server, zoomeye_service.metrics, host, port, shutdown_timeout)
+            else:
+                async with stdio_server() as (read_stream, write_stream):
+                    await server.run(read_stream, write_stream, server.create_initialization_options())
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        if dump_task is not None:
+            dump_task.cancel()
+            write_prometheus(zoomeye_service.metrics, metrics_file)
@@ -0,0 +1,115 @@
+"""Splitting a search into disjoint sub-queries that can be fetched in parallel.
+
+A shard is a filter that is added to the original query with ``&&``. Facet shards
+take the most frequent ``country`` or ``port`` values of the query, one shard per
+value, plus a remainder shard excluding all of them, so every asset falls into
+exactly one shard. Time shards cut the query into ``after``/``before`` windows and
+CIDR shards into IPv4 blocks of at most two sizes; both cover everything but come without counts.
+Adjacent time windows overlap by a day, as the bounds are whole days, so the rows
+of the shards must be deduplicated when they are merged.
+"""
+import datetime
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from .query_syntax import quote
+
+SHARD_DIMENSIONS = ("auto", "country", "port", "time", "cidr")
+# Dimensions planned from the facet counts of a probe query.
+FACET_DIMENSIONS = ("country", "port")
+# Time shards split this many days before today; the first shard takes everything older.
+TIME_SPAN_DAYS = 365
+
+
+@dataclass(frozen=True)
+class Shard:
+    filter: str
+    estimate: Optional[int] = None
+
+
+def facet_counts(facets, name: str) -> list[tuple[str, int]]:
+    """``(value, count)`` pairs of facet ``name`` in a search response, most frequent first."""
+    counts = []
+    for item in (facets or {}).get(name) or []:
+        if isinstance(item, dict) and item.get("name") not in (None, "") and item.get("count"):
+            counts.append((str(item["name"]), int(item["count"])))
+    return sorted(counts, key=lambda pair: -pair[1])
+
+
+def facet_shards(keyword: str, counts: list[tuple[str, int]], total: int, max_shards: int) -> list[Shard]:
+    top = counts[:max(1, max_shards - 1)]
+    shards = [Shard(f"{keyword}={quote(value)}", count) for value, count in top]
+    remainder = total - sum(count for _, count in top)
+    if remainder > 0 or len(counts) > len(top):
+        shards.append(Shard(" && ".join(f"{keyword}!={quote(value)}" for value, _ in top), max(0, remainder)))
+    return shards
+
+
+def time_shards(max_shards: int, today: Optional[datetime.date] = None) -> list[Shard]:
+    today = today or datetime.date.today()
+    count = max(2, max_shards)
+    step = TIME_SPAN_DAYS / (count - 1)
+    bounds = [today - datetime.timedelta(days=round(TIME_SPAN_DAYS - step * i)) for i in range(count - 1)]
+    day = datetime.timedelta(days=1)
+    shards = [Shard(f'before="{bounds[0] + day}"')]
+    shards.extend(Shard(f'after="{start}" && before="{end + day}"') for start, end in zip(bounds, bounds[1:]))
+    shards.append(Shard(f'after="{bounds[-1]}"'))
+    return shards
+
+
+def _cidr_shard(start: int, prefix: int) -> Shard:
+    return Shard(f'cidr="{start >> 24}.{(start >> 16) & 255}.0.0/{prefix}"')
+
+
+def cidr_shards(max_shards: int) -> list[Shard]:
+    """Exactly ``max_shards`` (at least 2) IPv4 blocks covering the address space.
+
+    The space is cut into the largest power of two of equal blocks that fits, and
+    the first blocks are halved until there are ``max_shards``.
+    """
+    count = max(2, max_shards)
+    prefix = int(math.log2(count))
+    size = 2 ** (32 - prefix)
+    split = count - 2 ** prefix
+    shards = []
+    for block in range(2 ** prefix):
+        if block < split:
+            shards.append(_cidr_shard(block * size, prefix + 1))
+            shards.append(_cidr_shard(block * size + size // 2, prefix + 1))
+        else:
+            shards.append(_cidr_shard(block * size, prefix))
+    return shards
+
+
+def plan_shards(shard_by: str, facets, total: int, max_shards: int,
+                sub_type: Optional[str] = None) -> tuple[str, list[Shard]]:
+    """Choose the shards of a query from the facets of a probe request.
+
+    ``auto`` takes the facet dimension whose largest shard is the smallest, so the
+    work is spread most evenly, and falls back to time windows without facets.
+
+    Returns:
+        tuple: The dimension used and its shards.
+
+    Raises:
+        ValueError: If ``shard_by`` is unknown or does not apply to ``sub_type``.
+    """
+    if shard_by not in SHARD_DIMENSIONS:
+        raise ValueError(f"Unknown shard_by: {shard_by}, expected one of {', '.join(SHARD_DIMENSIONS)}")
+    max_shards = max(2, int(max_shards))
+    if shard_by in FACET_DIMENSIONS:
+        counts = facet_counts(facets, shard_by)
+        if not counts:
+            raise ValueError(f"The query returned no {shard_by} facets to shard on")
+        return shard_by, facet_shards(shard_by, counts, total, max_shards)
+    if shard_by == "cidr":
+        if sub_type not in (None, "", "v4"):
+            raise ValueError("cidr shards only apply to IPv4 searches (sub_type v4)")
+        return "cidr", cidr_shards(max_shards)
+    if shard_by == "auto":
+        plans = [(dimension, facet_shards(dimension, facet_counts(facets, dimension), total, max_shards))
+                 for dimension in FACET_DIMENSIONS if facet_counts(facets, dimension)]
+        if plans:
+            return min(plans, key=lambda plan: max(shard.estimate for shard in plan[1]))
+    return "time", time_shards(max_shards)
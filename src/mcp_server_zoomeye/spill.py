@@ -0,0 +1,270 @@
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Optional
+
+from .config import env_int, private_dir, state_dir, state_path
+
+SPILL_FORMATS = ("ndjson", "parquet")
+RESULTS_URI_PREFIX = "zoomeye://results/"
+RESULT_ID_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+# NDJSON byte offset recorded every this many rows, so slices can seek close to their start.
+_CHECKPOINT_ROWS = 1000
+_PARQUET_BATCH_ROWS = 1000
+
+
+class _NdjsonWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "wb")
+        self.checkpoints = [0]
+        self.count = 0
+
+    def write(self, row: Any) -> None:
+        self._file.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.count += 1
+        if self.count % _CHECKPOINT_ROWS == 0:
+            self.checkpoints.append(self._file.tell())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet output requires pyarrow, install mcp-server-zoomeye[parquet]")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.checkpoints = []
+        self.count = 0
+        self._batch = []
+        self._writer = None
+
+    def _flush(self) -> None:
+        if not self._batch:
+            return
+        if self._writer is None:
+            table = self._pa.Table.from_pylist(self._batch)
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        else:
+            # Later batches follow the schema of the first one; unknown keys are dropped.
+            table = self._pa.Table.from_pylist(self._batch, schema=self._writer.schema)
+        self._writer.write_table(table)
+        self._batch = []
+
+    def write(self, row: Any) -> None:
+        self._batch.append(row if isinstance(row, dict) else {"value": row})
+        self.count += 1
+        if len(self._batch) >= _PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def close(self) -> None:
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            self._pq.write_table(self._pa.table({}), self.path)
+
+
+class SpillWriter:
+    """Writes the rows of one result to disk while they are received."""
+
+    def __init__(self, store: "ResultStore", result_id: str, output_format: str, sample_size: int, query: dict):
+        self.store = store
+        self.result_id = result_id
+        self.format = output_format
+        self.query = query
+        self.sample_size = sample_size
+        self.sample = []
+        self.path = store.data_path(result_id, output_format)
+        self._writer = _ParquetWriter(self.path) if output_format == "parquet" else _NdjsonWriter(self.path)
+
+    def write(self, row: Any) -> None:
+        if len(self.sample) < self.sample_size:
+            self.sample.append(row)
+        self._writer.write(row)
+
+    def finish(self, fields: dict) -> dict:
+        """Close the file, register the result and return its summary."""
+        self._writer.close()
+        meta = {
+            "result_id": self.result_id,
+            "uri": RESULTS_URI_PREFIX + self.result_id,
+            "format": self.format,
+            "count": self._writer.count,
+            "created": time.time(),
+            "query": self.query,
+            "fields": fields,
+            "checkpoints": self._writer.checkpoints,
+        }
+        self.store.register(meta)
+        summary = {name: value for name, value in fields.items()}
+        summary.update({
+            "result_id": self.result_id,
+            "uri": meta["uri"],
+            "format": self.format,
+            "count": meta["count"],
+            "sample": self.sample,
+            "hint": f"Read rows with resources/read {meta['uri']}?offset=0&limit=100",
+        })
+        return summary
+
+    def discard(self) -> None:
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ResultStore:
+    """Directory of search results spilled to NDJSON or Parquet files.
+
+    Results are listed and read in slices through MCP resources. A sidecar
+    ``<id>.meta.json`` file makes stored results visible again after a restart.
+    The oldest results are removed once more than ``max_results`` are stored.
+
+    The directory defaults to ``results`` in the private per-user state directory
+    (see ``state_dir``) and is made accessible to the current user only. It is
+    created, and stored results are loaded, on first use. Data files
+    are always ``<id>.<format>`` in that directory: a metadata file is only loaded
+    when its ID and format are valid, and never names the file that is read or
+    deleted.
+
+    Options fall back to ``ZOOMEYE_RESULTS_DIR`` and ``ZOOMEYE_RESULTS_MAX``.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_results: Optional[int] = None):
+        self._directory = directory or os.getenv("ZOOMEYE_RESULTS_DIR")
+        self._private = False
+        self.max_results = max_results or env_int("ZOOMEYE_RESULTS_MAX", 100)
+        self._stored: Optional[dict[str, dict]] = None
+
+    @property
+    def directory(self) -> str:
+        if not self._private:
+            self._directory = private_dir(self._directory) if self._directory else state_dir("results")
+            self._private = True
+        return self._directory
+
+    @property
+    def _results(self) -> dict[str, dict]:
+        """Metadata of the stored results by ID, oldest first, read from the directory on first use."""
+        if self._stored is None:
+            results = {}
+            exists = self._private or os.path.isdir(self._directory or state_path("results"))
+            for name in sorted(os.listdir(self.directory)) if exists else ():
+                if name.endswith(".meta.json"):
+                    meta = self._load_meta(name)
+                    if meta is not None:
+                        results[meta["result_id"]] = meta
+            self._stored = dict(sorted(results.items(), key=lambda item: item[1]["created"]))
+        return self._stored
+
+    def data_path(self, result_id: str, output_format: str) -> str:
+        if not RESULT_ID_PATTERN.match(result_id) or output_format not in SPILL_FORMATS:
+            raise ValueError(f"Invalid result: {result_id}")
+        return os.path.join(self.directory, f"{result_id}.{output_format}")
+
+    def _load_meta(self, name: str) -> Optional[dict]:
+        """The metadata in file ``name``, or None unless it describes a stored result of this directory."""
+        try:
+            with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(meta, dict):
+            return None
+        result_id = meta.get("result_id")
+        if (not isinstance(result_id, str) or name != f"{result_id}.meta.json"
+                or not RESULT_ID_PATTERN.match(result_id) or meta.get("format") not in SPILL_FORMATS
+                or not isinstance(meta.get("count"), int) or not isinstance(meta.get("created"), (int, float))
+                or not all(isinstance(offset, int) for offset in meta.get("checkpoints", []))):
+            return None
+        meta.pop("path", None)
+        if not os.path.isfile(self.data_path(result_id, meta["format"])):
+            return None
+        return meta
+
+    def create(self, output_format: str = "ndjson", sample_size: int = 5, query: Optional[dict] = None) -> SpillWriter:
+        if output_format not in SPILL_FORMATS:
+            raise ValueError(f"Unsupported spill format: {output_format}. Supported: {', '.join(SPILL_FORMATS)}")
+        return SpillWriter(self, uuid.uuid4().hex[:16], output_format, sample_size, query or {})
+
+    def register(self, meta: dict) -> None:
+        with open(os.path.join(self.directory, f"{meta['result_id']}.meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._results[meta["result_id"]] = meta
+        while len(self._results) > self.max_results:
+            self.delete(next(iter(self._results)))
+
+    def delete(self, result_id: str) -> None:
+        meta = self._results.pop(result_id, None)
+        if meta is None:
+            return
+        for path in (self.data_path(result_id, meta["format"]),
+                     os.path.join(self.directory, f"{result_id}.meta.json")):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def list(self) -> list[dict]:
+        return list(self._results.values())
+
+    def get(self, result_id: str) -> dict:
+        meta = self._results.get(result_id)
+        if meta is None:
+            raise ValueError(f"Unknown result: {result_id}")
+        return meta
+
+    def read_rows(self, result_id: str, offset: int = 0, limit: int = 100) -> list:
+        """Rows ``[offset, offset + limit)`` of a stored result."""
+        meta = self.get(result_id)
+        path = self.data_path(result_id, meta["format"])
+        offset = max(0, offset)
+        limit = max(0, limit)
+        if meta["format"] == "parquet":
+            import pyarrow.parquet
+            rows = []
+            position = 0
+            for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=_PARQUET_BATCH_ROWS):
+                if position + batch.num_rows > offset:
+                    start = max(0, offset - position)
+                    rows.extend(batch.slice(start, limit - len(rows)).to_pylist())
+                    if len(rows) >= limit:
+                        break
+                position += batch.num_rows
+            return rows
+
+        checkpoint = max(0, min(offset // _CHECKPOINT_ROWS, len(meta["checkpoints"]) - 1))
+        rows = []
+        with open(path, "rb") as f:
+            f.seek(meta["checkpoints"][checkpoint] if meta["checkpoints"] else 0)
+            position = checkpoint * _CHECKPOINT_ROWS
+            for line in f:
+                if position >= offset + limit:
+                    break
+                if position >= offset:
+                    rows.append(json.loads(line))
+                position += 1
+        return rows
+
+    def read_slice(self, result_id: str, offset: int = 0, limit: int = 100) -> dict:
+        meta = self.get(result_id)
+        rows = self.read_rows(result_id, offset, limit)
+        return {
+            "result_id": result_id,
+            "count": meta["count"],
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + len(rows) if offset + len(rows) < meta["count"] else None,
+            "data": rows,
+        }
@@ -0,0 +1,50 @@
+import logging
+
+from mcp.server import Server
+
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("stdio", "sse")
+SSE_PATH = "/sse"
+MESSAGES_PATH = "/messages/"
+
+
+class _SseEndpoint:
+    """ASGI app running one MCP session for every SSE connection."""
+
+    def __init__(self, server: Server, transport, metrics: Metrics):
+        self.server = server
+        self.transport = transport
+        self.metrics = metrics
+        self.options = server.create_initialization_options()
+
+    async def __call__(self, scope, receive, send) -> None:
+        with self.metrics.in_flight("zoomeye_clients"):
+            async with self.transport.connect_sse(scope, receive, send) as (read_stream, write_stream):
+                await self.server.run(read_stream, write_stream, self.options)
+
+
+async def run_sse(server: Server, metrics: Metrics, host: str, port: int, shutdown_timeout: float) -> None:
+    """Serve ``server`` to any number of clients over HTTP with Server-Sent Events.
+
+    Clients open ``GET /sse`` and post their messages to ``/messages/``. On SIGINT or
+    SIGTERM, new connections are refused and open sessions get ``shutdown_timeout``
+    seconds to finish before they are cancelled.
+    """
+    # Imported here so that the stdio transport does not pay for the HTTP stack.
+    import uvicorn
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
+
+    transport = SseServerTransport(MESSAGES_PATH)
+    app = Starlette(routes=[
+        Route(SSE_PATH, endpoint=_SseEndpoint(server, transport, metrics)),
+        Mount(MESSAGES_PATH, app=transport.handle_post_message),
+    ])
+    config = uvicorn.Config(app, host=host, port=port, timeout_graceful_shutdown=shutdown_timeout,
+                            log_level="info")
+    logger.info("Serving MCP over SSE on http://%s:%d%s", host, port, SSE_PATH)
+    await uvicorn.Server(config).serve()
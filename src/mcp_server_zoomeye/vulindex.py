@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Iterable, Optional
+
+from .config import env_float
+from .formatting import split_rows
+
+ID_KEYS = ("vul_id", "cve_id", "id", "cnvd_id", "cnnvd_id")
+
+
+def record_id(record: dict) -> Optional[str]:
+    for name in ID_KEYS:
+        value = record.get(name)
+        if isinstance(value, (str, int)) and str(value).strip():
+            return str(value).strip().upper()
+    return None
+
+
+def _record_text(value: Any) -> str:
+    """All string values of a record, flattened for full-text indexing."""
+    if isinstance(value, dict):
+        return " ".join(_record_text(item) for item in value.values())
+    if isinstance(value, list):
+        return " ".join(_record_text(item) for item in value)
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value)
+    return ""
+
+
+def match_expression(keyword: str) -> Optional[str]:
+    """FTS5 query matching every word of ``keyword``, with FTS syntax neutralized."""
+    tokens = re.findall(r"\w+", keyword, flags=re.UNICODE)
+    if not tokens:
+        return None
+    return " ".join('"{}"'.format(token) for token in tokens)
+
+
+class VulnerabilityIndex:
+    """Local SQLite FTS5 index of vulnerability records.
+
+    Records are added from every vulnerability response the server receives and
+    can be bulk-loaded from a dump. A keyword search is answered locally when that
+    keyword was fetched from the API less than ``max_age`` seconds ago, with the
+    ``total`` the API reported. After a bulk load, less than ``max_age`` seconds
+    ago, keywords that match records of the index are answered locally as well;
+    as a dump need not cover every keyword, such answers have no ``total`` and a
+    keyword without local matches falls back to the API.
+
+    ``path`` may be ``":memory:"``. ``max_age`` falls back to
+    ``ZOOMEYE_VULDB_INDEX_MAX_AGE`` (default one day).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: Optional[float] = None):
+        self.path = path or os.getenv("ZOOMEYE_VULDB_INDEX") or ":memory:"
+        self.max_age = max_age if max_age is not None else env_float("ZOOMEYE_VULDB_INDEX_MAX_AGE", 86400.0)
+        self.local_hits = 0
+        self.remote_fetches = 0
+        self._local_seconds = 0.0
+        self._remote_seconds = 0.0
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, body TEXT NOT NULL, updated REAL NOT NULL);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(id UNINDEXED, text);"
+            "CREATE TABLE IF NOT EXISTS keywords (keyword TEXT PRIMARY KEY, fetched REAL NOT NULL,"
+            " page_size INTEGER NOT NULL, total INTEGER);"
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        columns = {row[1] for row in db.execute("PRAGMA table_info(keywords)")}
+        if "total" not in columns:
+            # Indexes written before the upstream totals were kept.
+            db.execute("ALTER TABLE keywords ADD COLUMN total INTEGER")
+        db.commit()
+        return db
+
+    def _meta(self, name: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def add_records(self, records: Iterable[dict], commit: bool = True) -> int:
+        """Insert or update ``records``; records without an ID are skipped."""
+        now = time.time()
+        count = 0
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            vul_id = record_id(record)
+            if vul_id is None:
+                continue
+            self._db.execute("DELETE FROM records_fts WHERE id = ?", (vul_id,))
+            self._db.execute("INSERT INTO records_fts (id, text) VALUES (?, ?)", (vul_id, _record_text(record)))
+            self._db.execute("INSERT OR REPLACE INTO records (id, body, updated) VALUES (?, ?, ?)",
+                             (vul_id, json.dumps(record, ensure_ascii=False), now))
+            count += 1
+        if commit:
+            self._db.commit()
+        return count
+
+    def add_response(self, result: Any, keyword: Optional[str] = None, page_size: int = 0,
+                     vul_id: Optional[str] = None) -> int:
+        """Index the records of a ``/v2/vuldb`` or ``/v2/search/vuldb`` response.
+
+        For a keyword search the keyword and the ``total`` of the response are
+        remembered, so that repeated searches for it can be answered locally.
+        """
+        meta, rows = split_rows(result)
+        if rows is None:
+            data = result.get("data") if isinstance(result, dict) else None
+            if not isinstance(data, dict):
+                return 0
+            if vul_id and record_id(data) is None:
+                data = {"vul_id": vul_id, **data}
+            rows = [data]
+        else:
+            self._set_meta("layout", "data" if isinstance(result.get("data"), list) else "data.list")
+        count = self.add_records(rows, commit=False)
+        if keyword is not None:
+            total = (meta or {}).get("total")
+            self._db.execute(
+                "INSERT OR REPLACE INTO keywords (keyword, fetched, page_size, total) VALUES (?, ?, ?, ?)",
+                (keyword.strip().lower(), time.time(), page_size, total if isinstance(total, int) else None))
+        self._db.commit()
+        return count
+
+    def load_dump(self, path: str) -> int:
+        """Bulk-load records from a JSON array, an API response or an NDJSON file."""
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        try:
+            parsed = json.loads(content)
+            documents = parsed if isinstance(parsed, list) else [parsed]
+        except json.JSONDecodeError:
+            documents = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+        records = []
+        for document in documents:
+            _, rows = split_rows(document)
+            records.extend(rows if rows is not None else [document])
+        count = self.add_records(records, commit=False)
+        self._set_meta("loaded", str(time.time()))
+        self._db.commit()
+        return count
+
+    def fetched(self, keyword: str, page_size: int) -> Optional[dict]:
+        """The fetch of ``keyword`` from the API, if less than ``max_age`` old and of ``page_size`` rows or more.
+
+        Returns:
+            dict: The upstream ``total`` (None when unknown), or None if there is no such fetch.
+        """
+        row = self._db.execute("SELECT fetched, page_size, total FROM keywords WHERE keyword = ?",
+                               (keyword.strip().lower(),)).fetchone()
+        if row is None or time.time() - row[0] >= self.max_age or row[1] < page_size:
+            return None
+        return {"total": row[2]}
+
+    def loaded_recently(self) -> bool:
+        loaded = self._meta("loaded")
+        return loaded is not None and time.time() - float(loaded) < self.max_age
+
+    def search(self, keyword: str, page_size: int = 10) -> Optional[dict]:
+        """Answer a keyword search from the index, or return ``None`` to fall back to the API."""
+        start = time.perf_counter()
+        expression = match_expression(keyword)
+        if expression is None:
+            return None
+        fetched = self.fetched(keyword, page_size)
+        if fetched is None and not self.loaded_recently():
+            return None
+        rows = self._db.execute(
+            "SELECT records.body FROM records_fts JOIN records ON records.id = records_fts.id "
+            "WHERE records_fts MATCH ? ORDER BY records_fts.rank LIMIT ?",
+            (expression, page_size),
+        ).fetchall()
+        if fetched is None and not rows:
+            # The dump does not cover this keyword, the API may know more.
+            return None
+        records = [json.loads(row[0]) for row in rows]
+        total = fetched["total"] if fetched is not None else None
+        if self._meta("layout") == "data":
+            result = {"code": 60000, "message": "success", "total": total, "data": records}
+        else:
+            result = {"code": 60000, "message": "success", "data": {"total": total, "list": records}}
+        result["source"] = "local_index"
+        result["local_matches"] = len(records)
+        self.local_hits += 1
+        self._local_seconds += time.perf_counter() - start
+        return result
+
+    def record_remote(self, seconds: float) -> None:
+        self.remote_fetches += 1
+        self._remote_seconds += seconds
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.remote_fetches
+        return {
+            "path": self.path,
+            "records": self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0],
+            "fresh_keywords": self._db.execute("SELECT COUNT(*) FROM keywords WHERE fetched > ?",
+                                               (time.time() - self.max_age,)).fetchone()[0],
+            "max_age": self.max_age,
+            "local_hits": self.local_hits,
+            "remote_fetches": self.remote_fetches,
+            "hit_rate": round(self.local_hits / lookups, 4) if lookups else 0.0,
+            "avg_local_ms": round(self._local_seconds / self.local_hits * 1000, 3) if self.local_hits else None,
+            "avg_remote_ms": round(self._remote_seconds / self.remote_fetches * 1000, 3)
+            if self.remote_fetches else None,
+        }
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
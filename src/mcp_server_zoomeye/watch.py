@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from .config import env_float, state_dir
+
+# Fields a watched search always requests, so every row has an identity and a fingerprint.
+WATCH_FIELDS = ("ip", "port", "domain", "update_time")
+# Overlap between an incremental run's ``after=`` date and the previous run, since the
+# filter has a granularity of one day.
+_AFTER_OVERLAP = 86400
+
+
+def watch_fields(fields: Optional[str]) -> Optional[str]:
+    """``fields`` extended with the fields needed to fingerprint rows, or None for the API default."""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return ",".join(names + [name for name in WATCH_FIELDS if name not in names])
+
+
+def asset_id(row: dict) -> str:
+    """Compact identity of a search row: its ip, port and domain as a JSON array."""
+    if any(name in row for name in ("ip", "port", "domain")):
+        return json.dumps([row.get("ip"), row.get("port"), row.get("domain")], ensure_ascii=False,
+                          separators=(",", ":"))
+    return json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def fingerprint(row: dict) -> str:
+    """The row's ``update_time``, or a digest of the row when it has none."""
+    update_time = row.get("update_time")
+    if update_time:
+        return str(update_time)
+    return hashlib.sha1(json.dumps(row, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def _asset_row(asset: str) -> dict:
+    value = json.loads(asset)
+    if isinstance(value, list):
+        return dict(zip(("ip", "port", "domain"), value))
+    return value
+
+
+class WatchStore:
+    """SQLite store of watched searches and the fingerprints of the assets they returned.
+
+    A watch is keyed on the canonical query, ``sub_type`` and ``fields``. For every
+    asset only its identity (ip, port, domain) and ``update_time`` are kept. Runs
+    after the first one are narrowed with ``after=`` to the assets updated since the
+    previous run, and a full run is made every ``full_interval`` seconds. Only full
+    runs that fetched every row detect assets that disappeared; ``last_complete``
+    is the time of the latest one.
+
+    The database defaults to ``watch.sqlite3`` in the private per-user state
+    directory (see ``state_dir``), whose access is restricted to the current user.
+    It is created and opened on first use.
+
+    Options fall back to ``ZOOMEYE_WATCH_PATH`` and ``ZOOMEYE_WATCH_FULL_INTERVAL``
+    (default one day).
+    """
+
+    def __init__(self, path: Optional[str] = None, full_interval: Optional[float] = None):
+        self._path = path or os.getenv("ZOOMEYE_WATCH_PATH")
+        self.full_interval = full_interval if full_interval is not None else env_float(
+            "ZOOMEYE_WATCH_FULL_INTERVAL", 86400.0)
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._path = os.path.join(state_dir(), "watch.sqlite3")
+        return self._path
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS watches (id TEXT PRIMARY KEY, query TEXT NOT NULL, sub_type TEXT,"
+            " fields TEXT, created REAL NOT NULL, last_run REAL, last_full REAL, last_complete REAL,"
+            " runs INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS assets (watch_id TEXT NOT NULL, asset TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL, PRIMARY KEY (watch_id, asset)) WITHOUT ROWID;"
+        )
+        columns = {row[1] for row in db.execute("PRAGMA table_info(watches)")}
+        if "last_complete" not in columns:
+            # Databases written before complete full runs were tracked separately.
+            db.execute("ALTER TABLE watches ADD COLUMN last_complete REAL")
+        db.commit()
+        return db
+
+    @staticmethod
+    def watch_id(query: str, sub_type: Optional[str], fields: Optional[str]) -> str:
+        key = json.dumps([query, sub_type or "v4", fields or ""], ensure_ascii=False)
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, watch_id: str) -> Optional[dict]:
+        row = self._db.execute(
+            "SELECT id, query, sub_type, fields, created, last_run, last_full, last_complete, runs FROM watches"
+            " WHERE id = ?", (watch_id,)).fetchone()
+        if row is None:
+            return None
+        watch = dict(zip(("watch_id", "query", "sub_type", "fields", "created", "last_run", "last_full",
+                          "last_complete", "runs"), row))
+        watch["tracked"] = self._db.execute("SELECT COUNT(*) FROM assets WHERE watch_id = ?",
+                                            (watch_id,)).fetchone()[0]
+        return watch
+
+    def plan(self, watch_id: str, full: Optional[bool] = None) -> Optional[str]:
+        """The ``after=`` date of the next run, or None if it has to be a full run.
+
+        Any earlier run allows an incremental one, whether or not it fetched every
+        row; without ``full``, a full run is also due ``full_interval`` seconds after
+        the previous one.
+        """
+        watch = self.get(watch_id)
+        if full or watch is None or watch["last_run"] is None:
+            return None
+        last_full = watch["last_full"] if watch["last_full"] is not None else watch["last_run"]
+        if full is None and time.time() - last_full >= self.full_interval:
+            return None
+        return time.strftime("%Y-%m-%d", time.gmtime(watch["last_run"] - _AFTER_OVERLAP))
+
+    def apply(self, watch_id: str, query: str, sub_type: Optional[str], fields: Optional[str], rows: list,
+              full: bool, complete: bool, started: float) -> dict:
+        """Compare ``rows`` with the stored fingerprints and store the new ones.
+
+        Assets missing from a ``complete`` full run are reported as removed and
+        forgotten; an incomplete full run cannot tell, and removes nothing. ``started``
+        is the time the run began, used to narrow the next run.
+
+        Returns:
+            dict: ``added``, ``changed`` and ``removed`` rows. Added and changed rows
+            are the search rows; removed rows carry the asset identity and its last
+            known ``update_time``.
+        """
+        self._db.execute("INSERT OR IGNORE INTO watches (id, query, sub_type, fields, created) VALUES (?, ?, ?, ?, ?)",
+                         (watch_id, query, sub_type, fields, time.time()))
+        stored = dict(self._db.execute("SELECT asset, fingerprint FROM assets WHERE watch_id = ?", (watch_id,)))
+        added, changed, seen = [], [], set()
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            asset = asset_id(row)
+            seen.add(asset)
+            current = fingerprint(row)
+            previous = stored.get(asset)
+            if previous == current:
+                continue
+            (added if previous is None else changed).append(row)
+            self._db.execute("INSERT OR REPLACE INTO assets (watch_id, asset, fingerprint) VALUES (?, ?, ?)",
+                             (watch_id, asset, current))
+
+        removed = []
+        if full and complete:
+            gone = [asset for asset in stored if asset not in seen]
+            removed = [{**_asset_row(asset), "update_time": stored[asset]} for asset in gone]
+            self._db.executemany("DELETE FROM assets WHERE watch_id = ? AND asset = ?",
+                                 [(watch_id, asset) for asset in gone])
+        self._db.execute(
+            "UPDATE watches SET last_run = ?, runs = runs + 1, last_full = CASE WHEN ? THEN ? ELSE last_full END,"
+            " last_complete = CASE WHEN ? THEN ? ELSE last_complete END WHERE id = ?",
+            (started, full, started, full and complete, started, watch_id))
+        self._db.commit()
+        return {"added": added, "changed": changed, "removed": removed}
+
+    def reset(self, watch_id: str) -> None:
+        self._db.execute("DELETE FROM assets WHERE watch_id = ?", (watch_id,))
+        self._db.execute("DELETE FROM watches WHERE id = ?", (watch_id,))
+        self._db.commit()
+
+    def list(self) -> list[dict]:
+        ids = [row[0] for row in self._db.execute("SELECT id FROM watches ORDER BY created")]
+        return [self.get(watch_id) for watch_id in ids]
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
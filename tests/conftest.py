@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """Keep stored results and watch state of every test in its own directory."""
+    for name in ("ZOOMEYE_RESULTS_DIR", "ZOOMEYE_WATCH_PATH", "ZOOMEYE_CACHE_PATH", "ZOOMEYE_VULDB_INDEX"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("ZOOMEYE_STATE_DIR", str(tmp_path / "state"))
+    return tmp_path / "state"
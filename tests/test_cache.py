@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.cache import SEARCH, VULDB_BY_ID, ResponseCache, make_key
+from mcp_server_zoomeye.jsonstream import RowTable
+from mcp_server_zoomeye.server import ZoomeyeService
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_make_key_normalizes_equivalent_requests():
+    key = make_key(SEARCH, qbase64="cQ==", page=1, pagesize=10, fields="ip, port", sub_type="v4", facets=None)
+    assert make_key(SEARCH, pagesize="10", qbase64="cQ==", page="1", fields="port,ip,,ip", sub_type="") == key
+    assert make_key(SEARCH, qbase64="cQ==", page=1, pagesize=10, fields="ip,port", sub_type=None, facets="") == key
+    assert make_key(SEARCH, qbase64="cQ==", page=2, pagesize=10, fields="ip,port") != key
+    assert make_key(SEARCH, qbase64="cQ==", page=1, pagesize=10, fields="ip") != key
+    assert make_key(SEARCH, qbase64="cQ==", page=1, pagesize=10, fields="ip,port", sub_type="v6") != key
+    assert make_key(VULDB_BY_ID, qbase64="cQ==", page=1, pagesize=10, fields="ip,port") != key
+
+
+def test_entries_expire_after_their_endpoint_ttl(clock):
+    cache = ResponseCache(ttls={SEARCH: 60, VULDB_BY_ID: 3600})
+    cache.set(SEARCH, "search", {"total": 1})
+    cache.set(VULDB_BY_ID, "vuln", {"id": "CVE-2024-0001"})
+
+    clock[0] += 59
+    assert cache.get(SEARCH, "search") == {"total": 1}
+    clock[0] += 1
+    assert cache.get(SEARCH, "search") is None
+    assert cache.get(VULDB_BY_ID, "vuln") == {"id": "CVE-2024-0001"}
+    assert cache.stats()["endpoints"][SEARCH] == {
+        "memory_hits": 1, "disk_hits": 0, "misses": 1, "hit_rate": 0.5, "ttl": 60}
+
+
+def test_a_zero_ttl_disables_caching(clock):
+    cache = ResponseCache(ttls={SEARCH: 0})
+    cache.set(SEARCH, "search", {"total": 1})
+    assert cache.get(SEARCH, "search") is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = ResponseCache(max_entries=2)
+    cache.set(SEARCH, "a", {"total": 1})
+    cache.set(SEARCH, "b", {"total": 2})
+    assert cache.get(SEARCH, "a") == {"total": 1}
+    cache.set(SEARCH, "c", {"total": 3})
+
+    assert cache.get(SEARCH, "b") is None
+    assert cache.get(SEARCH, "a") == {"total": 1}
+    assert cache.get(SEARCH, "c") == {"total": 3}
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_entries_survive_a_restart(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    rows = [{"ip": "1.1.1.1", "port": 80}, {"ip": "2.2.2.2"}]
+    table = RowTable()
+    table.extend(rows)
+    cache = ResponseCache(path=path, ttls={SEARCH: 60})
+    cache.set(SEARCH, "search", {"total": 2, "data": table})
+    cache.set(VULDB_BY_ID, "vuln", {"id": "CVE-2024-0001"})
+    cache.close()
+
+    cache = ResponseCache(path=path, ttls={SEARCH: 60})
+    result = cache.get(SEARCH, "search")
+    assert result["total"] == 2
+    assert isinstance(result["data"], RowTable)
+    assert list(result["data"]) == rows
+    assert cache.get(VULDB_BY_ID, "vuln") == {"id": "CVE-2024-0001"}
+    assert cache.stats()["endpoints"][SEARCH]["disk_hits"] == 1
+    # The entry is in memory now.
+    assert cache.get(SEARCH, "search") is result
+    cache.close()
+
+    clock[0] += 60
+    cache = ResponseCache(path=path, ttls={SEARCH: 60})
+    assert cache.get(SEARCH, "search") is None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_ignore_cache_fetches_again_and_refreshes_the_entry():
+    async with MockZoomeyeAPI(fixtures=True, total=100) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=ResponseCache())
+        first = await service.query_vulnerability_by_id("CVE-2024-0001")
+        assert await service.query_vulnerability_by_id("CVE-2024-0001") == first
+        assert api.requests == 1
+
+        assert await service.query_vulnerability_by_id("CVE-2024-0001", ignore_cache=True) == first
+        assert api.requests == 2
+        assert await service.query_vulnerability_by_id("CVE-2024-0001") == first
+        assert api.requests == 2
+        assert service.cache.stats()["endpoints"][VULDB_BY_ID]["memory_hits"] == 2
@@ -0,0 +1,121 @@
+import asyncio
+import base64
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.server import ZoomeyeService
+
+QBASE64 = base64.b64encode(b'app="nginx"').decode()
+
+
+class RecordingAPI(MockZoomeyeAPI):
+    """Mock API that records the requests it receives, with slow and failing ones.
+
+    Requests are told apart by search page number, vulnerability search keyword or
+    vulnerability ID: those in ``delays`` are answered after that many seconds,
+    those in ``failing`` with ``400``.
+    """
+
+    def __init__(self, delays=None, failing=(), **kwargs):
+        super().__init__(fixtures=True, **kwargs)
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.pages = []
+        self.keywords = []
+        self.ids = []
+
+    @staticmethod
+    def subject(method, target, body):
+        url = urlsplit(target)
+        if url.path == "/v2/search":
+            return int(json.loads(body or b"{}").get("page", 1))
+        if url.path == "/v2/search/vuldb":
+            return parse_qs(url.query).get("search", [""])[0]
+        return url.path.rsplit("/", 1)[-1]
+
+    def delay(self, method, target, body):
+        # Called as each request arrives, so the requests still in flight are recorded too.
+        subject = self.subject(method, target, body)
+        records = {"/v2/search": self.pages, "/v2/search/vuldb": self.keywords}.get(urlsplit(target).path, self.ids)
+        records.append(subject)
+        return self.delays.get(subject, self.latency)
+
+    def route(self, method, target, body):
+        if self.subject(method, target, body) in self.failing:
+            return 400, {"code": 400, "message": "bad request"}
+        return super().route(method, target, body)
+
+
+async def until(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_results, pages", [(250, [1, 2, 3]), (100, [1]), (5000, [1, 2, 3, 4])])
+async def test_query_all_fetches_the_pages_within_max_results(max_results, pages):
+    async with RecordingAPI(total=380) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        result = await service.query_all(QBASE64, max_results=max_results, pagesize=100, concurrency=4)
+
+    assert sorted(api.pages) == pages
+    assert result["pages"] == len(pages)
+    assert result["count"] == len(result["data"]) == min(max_results, 380)
+    assert result["total"] == 380
+    assert len({(row["ip"], row["port"]) for row in result["data"]}) == result["count"]
+
+
+@pytest.mark.asyncio
+async def test_a_failed_page_cancels_the_pages_in_flight():
+    async with RecordingAPI(total=1000, delays={2: 0.2, 3: 2.0, 4: 2.0, 5: 2.0}, failing={2}) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        start = time.perf_counter()
+        with pytest.raises(ValueError, match="400"):
+            await service.query_all(QBASE64, max_results=500, pagesize=100, concurrency=4)
+
+        assert time.perf_counter() - start < 1.0
+        assert sorted(api.pages) == [1, 2, 3, 4, 5]
+        await until(lambda: 'zoomeye_upstream_requests_total{endpoint="search",status="cancelled"} 3'
+                    in service.metrics.prometheus())
+        assert "zoomeye_upstream_in_flight 0" in service.metrics.prometheus()
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_enrich_looks_up_each_product_once():
+    async with RecordingAPI(total=60, failing={"OpenSSH 7.6p1"}) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        result = await service.enrich(QBASE64, max_results=60, pagesize=10, max_lookups=4)
+
+    # Every page holds each of the five fixture products twice.
+    assert sorted(api.pages) == [1, 2, 3, 4, 5, 6]
+    assert sorted(api.keywords) == ["Apache Tomcat 9.0.65", "Apache httpd 2.4.41", "OpenSSH 7.6p1",
+                                    "nginx 1.18.0"]
+    products = {entry["product"]: entry for entry in result["products"]}
+    assert all(entry["assets"] == 12 for entry in products.values())
+    assert "400" in products["OpenSSH"]["error"]
+    assert products["nginx"]["vulnerabilities"]
+    assert result["skipped"] == [{"product": "Microsoft IIS httpd", "version": "10.0", "assets": 12}]
+    assert result["count"] == 60
+
+
+@pytest.mark.asyncio
+async def test_batch_lookup_reports_invalid_and_failed_ids():
+    ids = ["cve-2024-0001", "CVE-2024-0001 ", "not-an-id", "CNVD-2024-12345", "", "CVE-2024-9999"]
+    async with RecordingAPI(failing={"CVE-2024-9999"}) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        result = await service.query_vulnerabilities(ids)
+
+    assert sorted(api.ids) == ["CNVD-2024-12345", "CVE-2024-0001", "CVE-2024-9999"]
+    assert result["requested"] == 4
+    assert result["invalid"] == ["NOT-AN-ID"]
+    assert result["succeeded"] == 2
+    assert sorted(result["results"]) == ["CNVD-2024-12345", "CVE-2024-0001"]
+    assert result["failed"] == 1
+    assert "400" in result["errors"]["CVE-2024-9999"]
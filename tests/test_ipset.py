@@ -0,0 +1,28 @@
+from array import array
+
+from mcp_server_zoomeye.ipset import V4_TYPECODE, IpSet, parse_networks
+
+
+def test_v4_typecode_holds_32_bit_addresses():
+    assert array(V4_TYPECODE).itemsize == 4
+    assert IpSet.from_values(["255.255.255.255"]).v4.itemsize == 4
+
+
+def test_from_values_packs_and_sorts_addresses():
+    ips = IpSet.from_values(["10.0.0.2", "0.0.0.0", ["255.255.255.255", "10.0.0.2"], "2001:db8::1", None,
+                             "not an ip", 42])
+    assert list(ips.v4) == [0, 0x0A000002, 0xFFFFFFFF]
+    assert list(ips) == ["0.0.0.0", "10.0.0.2", "255.255.255.255", "2001:db8::1"]
+    assert len(ips) == 4
+
+
+def test_set_operations_and_within():
+    left = IpSet.from_values(["1.1.1.1", "10.0.0.1", "10.0.0.2", "2001:db8::1"])
+    right = IpSet.from_values(["10.0.0.2", "192.168.0.1", "2001:db8::1"])
+    assert list(left.union(right)) == ["1.1.1.1", "10.0.0.1", "10.0.0.2", "192.168.0.1", "2001:db8::1"]
+    assert list(left.intersection(right)) == ["10.0.0.2", "2001:db8::1"]
+    assert list(left.difference(right)) == ["1.1.1.1", "10.0.0.1"]
+
+    networks = parse_networks(["10.0.0.0/8", "10.0.0.0/24", "2001:db8::/32"])
+    assert list(left.within(networks)) == ["10.0.0.1", "10.0.0.2", "2001:db8::1"]
+    assert left.count_within(networks[0]) == 2
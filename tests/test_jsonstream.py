@@ -0,0 +1,200 @@
+import json
+import random
+
+import pytest
+
+from mcp_server_zoomeye.jsonstream import RowStream, RowTable, json_default
+
+ROWS = [
+    {"ip": "1.2.3.4", "port": 80, "score": 1.5e3, "ok": True, "title": "Café 東京 \U0001f600"},
+    {"ip": "5.6.7.8", "port": 443, "score": -0.25, "ok": False, "title": None},
+    {"ip": "9.9.9.9", "banner": "quote \" backslash \\ escape é \\u0041", "ssl": {"jarm": "abc", "n": [1, 2]}},
+    12345,
+    "a bare string, with ] and }",
+    [1, 2.0, -3e-2],
+    {"port": 8080, "ip": "10.0.0.1"},
+    {},
+]
+DOCUMENT = {
+    "code": 60000,
+    "total": 1234567,
+    "query": "app=\"nginx\" && title=\"中文\"",
+    "ratio": 0.5,
+    "empty": [],
+    "data": ROWS,
+    "flag": True,
+    "nothing": None,
+}
+
+
+def encode(document, indent=None) -> bytes:
+    return json.dumps(document, ensure_ascii=False, indent=indent).encode("utf-8")
+
+
+def parse_in_chunks(raw: bytes, sizes) -> RowStream:
+    stream = RowStream()
+    rows = []
+    position = 0
+    for size in sizes:
+        if position >= len(raw):
+            break
+        rows.extend(stream.feed(raw[position:position + size]))
+        position += size
+    rows.extend(stream.feed(raw[position:]))
+    stream.close()
+    stream.rows = rows
+    return stream
+
+
+def assert_matches_json_loads(stream: RowStream, raw: bytes):
+    document = json.loads(raw)
+    assert stream.rows == document.pop("data")
+    assert stream.fields == document
+    assert stream.has_rows
+    assert stream.rows_seen == len(ROWS)
+    assert stream.done
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_one_byte_chunks(indent):
+    raw = encode(DOCUMENT, indent)
+    assert_matches_json_loads(parse_in_chunks(raw, [1] * len(raw)), raw)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunks(seed):
+    generator = random.Random(seed)
+    raw = encode(DOCUMENT, generator.choice([None, 1]))
+    sizes = [generator.randint(1, 40) for _ in range(len(raw))]
+    assert_matches_json_loads(parse_in_chunks(raw, sizes), raw)
+
+
+@pytest.mark.parametrize("split", range(1, 4))
+def test_split_utf8_character(split):
+    raw = encode({"data": [{"title": "\U0001f600"}]})
+    boundary = raw.index("\U0001f600".encode("utf-8")) + split
+    stream = parse_in_chunks(raw, [boundary])
+    assert stream.rows == [{"title": "\U0001f600"}]
+
+
+@pytest.mark.parametrize("number", ["12", "1.5", "1e3", "-0.25E-2", "123456789"])
+def test_numbers_split_at_every_position(number):
+    raw = ('{"total": ' + number + ', "data": [' + number + ", " + number + "]}").encode()
+    for boundary in range(1, len(raw)):
+        stream = parse_in_chunks(raw, [boundary])
+        assert stream.fields == {"total": json.loads(number)}
+        assert stream.rows == [json.loads(number)] * 2
+
+
+def test_literals_split_at_every_position():
+    raw = b'{"a": true, "data": [null, false, true], "b": null}'
+    for boundary in range(1, len(raw)):
+        stream = parse_in_chunks(raw, [boundary])
+        assert stream.rows == [None, False, True]
+        assert stream.fields == {"a": True, "b": None}
+
+
+def test_rows_are_returned_as_soon_as_they_are_complete():
+    stream = RowStream()
+    assert stream.feed(b'{"total": 2, "data": [{"ip": "1.1.1.1"}, {"ip"') == [{"ip": "1.1.1.1"}]
+    assert stream.feed(b': "2.2.2.2"}]}') == [{"ip": "2.2.2.2"}]
+    stream.close()
+    assert stream.fields == {"total": 2}
+
+
+def test_other_rows_key_and_missing_rows():
+    stream = RowStream(rows_key="list")
+    assert stream.feed(b'{"data": [1], "list": [2, 3]}') == [2, 3]
+    assert stream.fields == {"data": [1]}
+
+    stream = RowStream()
+    assert stream.feed(b'{"code": 40001, "message": "bad"}') == []
+    stream.close()
+    assert not stream.has_rows
+    assert stream.fields == {"code": 40001, "message": "bad"}
+
+
+@pytest.mark.parametrize("raw", [b'{"data": [1, 2', b'{"data": [{"a": 1}]', b'[1, 2]', b'{"data": [{"a": }]}'])
+def test_incomplete_or_invalid_documents_fail_on_close(raw):
+    stream = RowStream()
+    with pytest.raises(json.JSONDecodeError):
+        stream.feed(raw)
+        stream.close()
+
+
+def test_table_round_trips_heterogeneous_rows():
+    table = RowTable()
+    table.extend(ROWS)
+    assert len(table) == len(ROWS)
+    assert list(table) == ROWS
+    assert table[2] == ROWS[2]
+    assert table[-2:] == ROWS[-2:]
+    assert table.columns == ["ip", "port", "score", "ok", "title", "banner", "ssl"]
+
+
+def test_table_dense_rows_share_the_fast_path():
+    rows = [{"ip": f"10.0.0.{i}", "port": i, "title": str(i)} for i in range(5)]
+    table = RowTable()
+    table.extend(rows)
+    assert list(table) == rows
+    assert table.value_rows() == [(row["ip"], row["port"], row["title"]) for row in rows]
+    assert table.column("port") == list(range(5))
+    assert table.column("missing") == [None] * 5
+
+
+def test_table_rows_with_other_key_order():
+    table = RowTable()
+    table.extend([{"ip": "1.1.1.1", "port": 80}, {"port": 443, "ip": "2.2.2.2"}])
+    assert list(table) == [{"ip": "1.1.1.1", "port": 80}, {"ip": "2.2.2.2", "port": 443}]
+    assert table.value_rows() == [("1.1.1.1", 80), ("2.2.2.2", 443)]
+
+
+def test_table_sparse_rows():
+    rows = [{"ip": "1.1.1.1", "port": 80}, {"ip": "2.2.2.2"}, {"ip": "3.3.3.3", "title": "x"}, {"title": None}]
+    table = RowTable()
+    table.extend(rows)
+    # Missing values are left out of rows, but a present None is kept.
+    assert list(table) == rows
+    assert table.value_rows() == [("1.1.1.1", 80, None), ("2.2.2.2", None, None), ("3.3.3.3", None, "x"),
+                                  (None, None, None)]
+    assert table.column("port") == [80, None, None, None]
+    assert table.column("title") == [None, None, "x", None]
+
+
+def test_table_fields_filter_keys():
+    table = RowTable(RowTable.fields_of("ip, ssl.jarm,,port"))
+    table.extend([
+        {"ip": "1.1.1.1", "port": 80, "banner": "x", "ssl": {"jarm": "a"}},
+        {"banner": "y", "ip": "2.2.2.2", "port": 81, "ssl": {"jarm": "b"}},
+        {"ip": "3.3.3.3", "port": 82, "banner": "z", "ssl": {"jarm": "c"}},
+        {"ip": "4.4.4.4", "title": "t"},
+    ])
+    assert table.columns == ["ip", "port", "ssl"]
+    assert list(table) == [
+        {"ip": "1.1.1.1", "port": 80, "ssl": {"jarm": "a"}},
+        {"ip": "2.2.2.2", "port": 81, "ssl": {"jarm": "b"}},
+        {"ip": "3.3.3.3", "port": 82, "ssl": {"jarm": "c"}},
+        {"ip": "4.4.4.4"},
+    ]
+    assert table.value_rows()[-1] == ("4.4.4.4", None, None)
+
+
+def test_table_single_kept_field():
+    table = RowTable(["ip"])
+    table.extend([{"ip": "1.1.1.1", "port": 80}, {"ip": "2.2.2.2", "port": 81}])
+    assert list(table) == [{"ip": "1.1.1.1"}, {"ip": "2.2.2.2"}]
+    assert table.value_rows() == [("1.1.1.1",), ("2.2.2.2",)]
+
+
+def test_fields_of():
+    assert RowTable.fields_of(None) is None
+    assert RowTable.fields_of("") is None
+    assert RowTable.fields_of(" ip , port,") == ["ip", "port"]
+
+
+def test_json_default_serializes_tables():
+    table = RowTable()
+    table.extend(ROWS)
+    assert json.loads(json.dumps({"data": table}, default=json_default)) == {"data": ROWS}
+    with pytest.raises(TypeError):
+        json.dumps({"x": object()}, default=json_default)
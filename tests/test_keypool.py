@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+from mcp_server_zoomeye.keypool import KeyPool
+
+
+async def exhaust(pool: KeyPool, status: int, retry_after=None) -> None:
+    for _ in pool.keys:
+        key = await pool.acquire()
+        pool.release(key, status, retry_after=retry_after)
+
+
+@pytest.mark.asyncio
+async def test_rotates_to_the_key_with_most_headroom():
+    pool = KeyPool(["key-one-0000000", "key-two-0000000"], budget=100)
+    first = await pool.acquire()
+    pool.release(first, 200, consumed=50)
+    second = await pool.acquire()
+    assert second is not first
+
+
+@pytest.mark.asyncio
+async def test_prefers_the_key_with_most_quota_reported_by_the_api():
+    pool = KeyPool(["key-one-0000000", "key-two-0000000", "key-three-00000"])
+    low, high, empty = pool.keys
+    for key, remaining in ((low, 100), (high, 5000), (empty, 0)):
+        pool.release(await pool.acquire(exclude=[other for other in pool.keys if other is not key]), 200,
+                     consumed=1, remaining=remaining)
+
+    chosen = []
+    for _ in range(5):
+        key = await pool.acquire()
+        chosen.append(key)
+        pool.release(key, 200, consumed=1)
+    assert chosen == [high] * 5
+    assert [usage["remaining"] for usage in pool.stats()["usage"]] == [100, 5000, 0]
+
+
+@pytest.mark.asyncio
+async def test_budget_share_applies_without_reported_quota():
+    pool = KeyPool(["key-one-0000000", "key-two-0000000"], budget=100)
+    first, second = pool.keys
+    pool.release(await pool.acquire(exclude=[second]), 200, consumed=10)
+    pool.release(await pool.acquire(exclude=[first]), 200, consumed=60)
+    assert await pool.acquire() is first
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [401, 402])
+async def test_fails_at_once_when_every_key_is_refused(status):
+    pool = KeyPool(["key-one-0000000", "key-two-0000000"])
+    await exhaust(pool, status)
+    start = time.monotonic()
+    with pytest.raises(ValueError, match="rejected or over quota"):
+        await asyncio.wait_for(pool.acquire(), 5)
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_fails_when_rate_limited_keys_rest_longer_than_max_wait():
+    pool = KeyPool(["key-one-0000000", "key-two-0000000"], max_wait=1)
+    await exhaust(pool, 429, retry_after=120)
+    with pytest.raises(ValueError, match="rejected or over quota"):
+        await asyncio.wait_for(pool.acquire(), 5)
+
+
+@pytest.mark.asyncio
+async def test_waits_for_short_429_cooldowns():
+    pool = KeyPool(["key-one-0000000", "key-two-0000000"], max_wait=5)
+    await exhaust(pool, 429, retry_after=0.2)
+    start = time.monotonic()
+    key = await asyncio.wait_for(pool.acquire(), 5)
+    assert key in pool.keys
+    assert time.monotonic() - start >= 0.1
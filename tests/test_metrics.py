@@ -0,0 +1,34 @@
+import pytest
+from mcp import types
+
+from mcp_server_zoomeye.metrics import Metrics, label_value
+from mcp_server_zoomeye.server import ZoomeyeService, create_server
+
+
+def test_label_value():
+    assert label_value("csv", ("json", "csv")) == "csv"
+    assert label_value("x" * 100, ("json", "csv")) == "unknown"
+
+
+def test_histogram_quantiles_and_prometheus_text():
+    metrics = Metrics()
+    for value in (0.001, 0.002, 0.2):
+        metrics.observe("zoomeye_tool_call_seconds", value, tool="zoomeye_search")
+    metrics.inc("zoomeye_tool_calls_total", tool="zoomeye_search", outcome="ok")
+
+    text = metrics.prometheus()
+    assert 'zoomeye_tool_calls_total{tool="zoomeye_search",outcome="ok"} 1' in text
+    assert 'zoomeye_tool_call_seconds_count{tool="zoomeye_search"} 3' in text
+
+
+@pytest.mark.asyncio
+async def test_unknown_tool_names_share_one_series():
+    service = ZoomeyeService(key="test", cache=None)
+    handler = create_server(service).request_handlers[types.CallToolRequest]
+    for index in range(20):
+        await handler(types.CallToolRequest(method="tools/call",
+                                            params={"name": f"made_up_{index}", "arguments": {}}))
+
+    text = service.metrics.prometheus()
+    assert "made_up" not in text
+    assert 'zoomeye_tool_calls_total{tool="unknown",outcome="error"} 20' in text
@@ -0,0 +1,46 @@
+import pytest
+from mcp import types
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.formatting import output_options
+from mcp_server_zoomeye.server import ZoomeyeService, create_server
+
+
+def test_defaults_and_select_parsing():
+    assert output_options({}, "compact") == ("compact", None, None)
+    assert output_options({"output_format": "csv", "select": " ip, port ,", "max_field_length": 20}) == (
+        "csv", ["ip", "port"], 20)
+
+
+@pytest.mark.parametrize("arguments", [
+    {"output_format": "bogus"},
+    {"select": ["ip"]},
+    {"max_field_length": 0},
+    {"max_field_length": "10"},
+    {"max_field_length": True},
+])
+def test_invalid_values_are_rejected(arguments):
+    with pytest.raises(ValueError):
+        output_options(arguments)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tool, arguments", [
+    ("zoomeye_search", {"query": 'app="nginx"'}),
+    ("zoomeye_search_all", {"query": 'app="nginx"', "max_results": 20}),
+    ("zoomeye_vuldb_by_id", {"cve_id": "CVE-2024-0001"}),
+    ("zoomeye_vuldb_by_keyword", {"keyword": "nginx"}),
+])
+async def test_invalid_output_format_spends_no_request(tool, arguments):
+    async with MockZoomeyeAPI(fixtures=True, total=100) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        server = create_server(service)
+        handler = server.request_handlers[types.CallToolRequest]
+        request = types.CallToolRequest(method="tools/call", params={
+            "name": tool, "arguments": {**arguments, "output_format": "bogus"}})
+        result = await handler(request)
+        await service.aclose()
+
+    assert result.root.isError
+    assert "Unsupported output_format" in result.root.content[0].text
+    assert api.requests == 0
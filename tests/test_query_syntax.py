@@ -0,0 +1,195 @@
+import base64
+import json
+
+import pytest
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.cache import ResponseCache
+from mcp_server_zoomeye.query_syntax import (BoolOp, QuerySyntaxError, Term, canonical_qbase64, canonicalize,
+                                             decode_qbase64, encode_query, parse)
+from mcp_server_zoomeye.server import ZoomeyeService
+
+QUERIES = [
+    'app==""',
+    'title="a\\"b"',
+    "title=foo\\(bar\\)",
+    "title='it\\'s'",
+    'app="x\\\\y"',
+    "(app=a || app=b) && port=80",
+    "app=a || (app=b && port=80)",
+    "(app=a || app=b) && (port=80 || port=443) && after=2024-01-01",
+    'nginx && country="CN"',
+    "APP=x || ((app=y))",
+    "port=80 && app=b || app=a",
+    'title="x && y" || (app=z && port=1)',
+]
+
+
+@pytest.mark.parametrize("query, value", [
+    ('title="a\\"b"', 'a"b'),
+    ("title='a\\'b'", "a'b"),
+    ('title="a\\\\b"', "a\\b"),
+    ("title=foo\\(bar\\)", "foo(bar)"),
+    ("title=a\\&&b", "a&&b"),
+    ('title="a && b || (c)"', "a && b || (c)"),
+])
+def test_escapes_are_resolved_in_values(query, value):
+    assert parse(query) == Term("title", "=", value, 0)
+
+
+@pytest.mark.parametrize("query, canonical", [
+    ('title="a\\"b"', 'title="a\\"b"'),
+    ("title='it\\'s'", 'title="it\'s"'),
+    ("title=foo\\(bar\\)", 'title="foo\\(bar\\)"'),
+    ('app="x\\\\y"', 'app="x\\\\y"'),
+])
+def test_canonical_values_are_double_quoted_and_escaped(query, canonical):
+    assert canonicalize(query) == canonical
+
+
+@pytest.mark.parametrize("query", ['app==""', 'app=""', "app!=''"])
+def test_quoted_empty_values_are_allowed(query):
+    term = parse(query)
+    assert term.value == ""
+    assert canonicalize(query) == f'app{term.operator}""'
+
+
+@pytest.mark.parametrize("query", ["app==", "app== && port=80", '""=x'])
+def test_missing_values_and_keywords_are_rejected(query):
+    with pytest.raises(QuerySyntaxError):
+        parse(query)
+
+
+@pytest.mark.parametrize("query", [
+    "after=2024-01-01 && port=80",
+    "port=80 && before=2024-01-01 && after=2023-01-01",
+    "after=2024-01-01 && (port=80 || app=nginx)",
+    "(after=2024-01-01 && port=80) || app=nginx",
+    "(after=2024-01-01 || port=80) && app=nginx",
+])
+def test_time_filters_combined_with_another_filter(query):
+    parse(query)
+
+
+@pytest.mark.parametrize("query", [
+    "after=2024-01-01",
+    "after=2024-01-01 && before=2024-06-01",
+    "after=2024-01-01 || port=80",
+    "after=2024-01-01 && (port=80 || before=2024-06-01)",
+])
+def test_time_filters_without_another_filter_are_rejected(query):
+    with pytest.raises(QuerySyntaxError, match="must be combined with another filter"):
+        parse(query)
+
+
+@pytest.mark.parametrize("query", ["after=2024/01/01 && port=80", "before=yesterday && port=80"])
+def test_time_filters_need_iso_dates(query):
+    with pytest.raises(QuerySyntaxError, match="YYYY-MM-DD"):
+        parse(query)
+
+
+def test_parentheses_are_recorded():
+    assert parse("app=a || (app=b && port=80)") == BoolOp("||", (
+        Term("app", "=", "a", 0),
+        BoolOp("&&", (Term("app", "=", "b", 10), Term("port", "=", "80", 19)), grouped=True),
+    ))
+    assert not parse("app=a || app=b && port=80").operands[1].grouped
+
+
+def test_parentheses_around_groups_of_the_other_operator_are_kept():
+    assert canonicalize("(app=a || app=b) && port=80") == '(app="a" || app="b") && port="80"'
+    assert canonicalize("port=80 && (app=b || app=a)") == '(app="a" || app="b") && port="80"'
+    assert canonicalize("app=a || (app=b && port=80)") == '(app="b" && port="80") || app="a"'
+    assert (canonicalize('(country="US" && port!=80) || (country="US" && title!="404 Not Found")')
+            == '(country="US" && port!="80") || (country="US" && title!="404 Not Found")')
+
+
+def test_mixed_operators_without_parentheses_keep_their_order():
+    assert canonicalize("port=80 && app=b || app=a") == 'port="80" && app="b" || app="a"'
+    assert canonicalize("app=a || app=b && port=80") == 'app="a" || app="b" && port="80"'
+    assert canonicalize("app=a || app=b && port=80") != canonicalize("app=a || (app=b && port=80)")
+
+
+def test_redundant_parentheses_are_dropped():
+    assert canonicalize("((app=x))") == 'app="x"'
+    assert canonicalize("(app=a && port=80) && app=b") == 'app="a" && app="b" && port="80"'
+    assert canonicalize("(app=x && (app=x)) || app=y") == 'app="x" || app="y"'
+
+
+def test_equivalent_queries_share_a_canonical_form():
+    assert (canonicalize("PORT=80 && app=nginx && port=80")
+            == canonicalize("app='nginx' && (port=\"80\")")
+            == 'app="nginx" && port="80"')
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_canonicalize_is_stable(query):
+    canonical = canonicalize(query)
+    assert canonicalize(canonical) == canonical
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_canonical_form_keeps_the_meaning(query):
+    def shape(node):
+        # The parse tree without positions, with operands in canonical order.
+        if isinstance(node, Term):
+            return node.keyword, node.operator, node.value
+        operands = []
+        for operand in node.operands:
+            if isinstance(operand, BoolOp) and operand.operator == node.operator:
+                operands.extend(shape(operand)[1])
+            else:
+                operands.append(shape(operand))
+        operands = sorted(set(operands), key=repr)
+        return operands[0] if len(operands) == 1 else (node.operator, tuple(operands))
+
+    assert shape(parse(canonicalize(query))) == shape(parse(query))
+
+
+@pytest.mark.parametrize("query, message", [
+    ("(app=a", "Unbalanced opening parenthesis"),
+    ("app=a)", "Unbalanced closing parenthesis"),
+    ('title="abc', "Unterminated quoted string"),
+    ("titel=abc", "did you mean 'title'"),
+    ("port=70000", "port expects a number"),
+    ("app=a port=80", "Expected && or ||"),
+    ("", "Empty query"),
+])
+def test_syntax_errors(query, message):
+    with pytest.raises(QuerySyntaxError, match=message):
+        parse(query)
+
+
+def test_qbase64_round_trip():
+    query = 'title="中文" && port=80'
+    assert decode_qbase64(encode_query(query)) == query
+    assert decode_qbase64(canonical_qbase64(encode_query(query))) == 'port="80" && title="中文"'
+    with pytest.raises(ValueError):
+        decode_qbase64("not base64!")
+
+
+class RecordingAPI(MockZoomeyeAPI):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.queries = []
+
+    def route(self, method, target, body):
+        if target.startswith("/v2/search") and method == "POST":
+            self.queries.append(base64.b64decode(json.loads(body)["qbase64"]).decode())
+        return super().route(method, target, body)
+
+
+@pytest.mark.asyncio
+async def test_queries_are_sent_as_written_and_cached_canonically():
+    query = '(country="US" && port!=80) || (country="US" && title!="404 Not Found")'
+    equivalent = "(title!='404 Not Found' && country=US) || (port!=80 && country=\"US\")"
+    async with RecordingAPI(total=100) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=ResponseCache())
+        first = await service.query(encode_query(query))
+        second = await service.query(encode_query(equivalent))
+
+        assert api.queries == [query]
+        assert list(second["data"]) == list(first["data"])
+        with pytest.raises(QuerySyntaxError):
+            await service.query(encode_query("(app=a"))
+        assert api.requests == 1
@@ -0,0 +1,72 @@
+import base64
+import json
+
+import pytest
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.jsonstream import RowTable
+from mcp_server_zoomeye.ratelimit import QuotaTracker
+from mcp_server_zoomeye.server import ZoomeyeService
+
+
+class QuotaReportingAPI(MockZoomeyeAPI):
+    """Mock API whose responses report the quota, as ``{"quota": {...}}`` members."""
+
+    def __init__(self, quota, **kwargs):
+        super().__init__(fixtures=True, **kwargs)
+        self.quota = quota
+
+    def route(self, method, target, body):
+        status, payload = super().route(method, target, body)
+        if isinstance(payload, bytes):
+            payload = json.loads(payload)
+        return status, {**payload, "quota": self.quota(payload)}
+
+
+def test_reported_quota():
+    assert QuotaTracker.reported({"quota": {"consumed": 5, "remaining": 95}}) == (5, 95)
+    assert QuotaTracker.reported({"remaining": 10, "data": []}) == (None, 10)
+    assert QuotaTracker.reported({"quota": {"consumed": -1, "remaining": True}}) == (None, None)
+    assert QuotaTracker.reported({"quota": "unknown"}) == (None, None)
+    assert QuotaTracker.reported([1, 2]) == (None, None)
+
+
+def test_usage_prefers_reported_quota_over_the_estimate():
+    rows = {"total": 100, "data": [{"ip": "1.1.1.1"}] * 3}
+    assert QuotaTracker.usage(rows) == (3, None)
+    assert QuotaTracker.usage({**rows, "quota": {"consumed": 7}}) == (7, None)
+    assert QuotaTracker.usage({**rows, "quota": {"remaining": 90}}, previous_remaining=100) == (10, 90)
+    # Without an earlier value, or after the account was topped up, the drop is unknown.
+    assert QuotaTracker.usage({**rows, "quota": {"remaining": 90}}) == (3, 90)
+    assert QuotaTracker.usage({**rows, "quota": {"remaining": 200}}, previous_remaining=100) == (3, 200)
+    table = RowTable()
+    table.extend(rows["data"])
+    assert QuotaTracker.usage({"total": 100, "data": table}) == (3, None)
+
+
+@pytest.mark.asyncio
+async def test_search_counts_the_consumed_quota_reported_by_the_api():
+    async with QuotaReportingAPI(lambda payload: {"consumed": 2 * len(payload.get("data", [])),
+                                                  "remaining": 1000}) as api:
+        service = ZoomeyeService(key="test-key-0000000", base_url=api.base_url, cache=None)
+        qbase64 = base64.b64encode(b'app="nginx"').decode()
+        await service.query(qbase64, pagesize=10)
+        await service.query(qbase64, page=2, pagesize=1000)
+
+        assert service.quota.consumed == 2 * 1010
+        [key] = service.keys.stats()["usage"]
+        assert key["consumed"] == 2 * 1010
+        assert key["remaining"] == 1000
+
+
+@pytest.mark.asyncio
+async def test_vuldb_counts_the_drop_of_the_remaining_quota():
+    remaining = iter([100, 97, 92])
+    async with QuotaReportingAPI(lambda payload: {"remaining": next(remaining)}) as api:
+        service = ZoomeyeService(key="test-key-0000000", base_url=api.base_url, cache=None)
+        for cve_id in ("CVE-2024-0001", "CVE-2024-0002", "CVE-2024-0003"):
+            await service.query_vulnerability_by_id(cve_id)
+
+        # The first response has nothing to compare with and is estimated as one unit.
+        assert service.quota.consumed == 1 + 3 + 5
+        assert service.keys.stats()["usage"][0]["remaining"] == 92
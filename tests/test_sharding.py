@@ -0,0 +1,44 @@
+import datetime
+import ipaddress
+import re
+
+import pytest
+
+from mcp_server_zoomeye.sharding import cidr_shards, facet_shards, plan_shards, time_shards
+
+
+def networks(shards):
+    return [ipaddress.ip_network(re.fullmatch(r'cidr="(.+)"', shard.filter).group(1)) for shard in shards]
+
+
+@pytest.mark.parametrize("max_shards", [2, 3, 4, 5, 7, 8, 9, 16, 31, 32])
+def test_cidr_shards_are_exactly_max_shards_and_cover_ipv4(max_shards):
+    blocks = networks(cidr_shards(max_shards))
+
+    assert len(blocks) == max_shards
+    assert sum(block.num_addresses for block in blocks) == 2 ** 32
+    assert list(ipaddress.collapse_addresses(blocks)) == [ipaddress.ip_network("0.0.0.0/0")]
+
+
+def test_cidr_shards_are_at_least_two():
+    assert len(cidr_shards(1)) == 2
+
+
+def test_plan_cidr_respects_max_shards():
+    dimension, shards = plan_shards("cidr", None, 0, 5)
+    assert dimension == "cidr"
+    assert len(shards) == 5
+
+
+def test_facet_shards_add_a_remainder():
+    shards = facet_shards("country", [("US", 50), ("CN", 30), ("DE", 10)], 100, 3)
+    assert [shard.filter for shard in shards] == ['country="US"', 'country="CN"',
+                                                  'country!="US" && country!="CN"']
+    assert [shard.estimate for shard in shards] == [50, 30, 20]
+
+
+def test_time_shards_cover_the_span():
+    shards = time_shards(4, today=datetime.date(2024, 12, 31))
+    assert len(shards) == 4
+    assert shards[0].filter.startswith("before=")
+    assert shards[-1].filter.startswith("after=")
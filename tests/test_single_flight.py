@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.cache import SEARCH, ResponseCache
+from mcp_server_zoomeye.server import ZoomeyeService
+
+CALLERS = 20
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache", [None, ResponseCache])
+async def test_concurrent_identical_calls_share_one_request(cache):
+    async with MockZoomeyeAPI(fixtures=True, latency=0.05) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=cache() if cache else None)
+        results = await asyncio.gather(*(service.query_vulnerability_by_id("CVE-2024-0001")
+                                         for _ in range(CALLERS)))
+
+        assert api.requests == 1
+        assert service.coalesced_requests == CALLERS - 1
+        assert all(result == results[0] for result in results)
+
+        await service.query_vulnerability_by_id("CVE-2024-0002")
+        assert api.requests == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cache", [None, ResponseCache])
+async def test_failure_reaches_every_waiter_and_is_not_cached(cache):
+    service = ZoomeyeService(key="test", cache=cache() if cache else None)
+    calls = 0
+
+    async def failing_fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise ValueError(f"upstream failure {calls}")
+
+    results = await asyncio.gather(*(service._cached(SEARCH, "key", failing_fetch) for _ in range(CALLERS)),
+                                   return_exceptions=True)
+
+    assert calls == 1
+    assert all(isinstance(result, ValueError) and str(result) == "upstream failure 1" for result in results)
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return {"total": 1}
+
+    assert await service._cached(SEARCH, "key", fetch) == {"total": 1}
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    service = ZoomeyeService(key="test", cache=None)
+    started = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        await asyncio.sleep(0.05)
+        return {"total": 1}
+
+    first = asyncio.ensure_future(service._cached(SEARCH, "key", fetch))
+    await started.wait()
+    second = asyncio.ensure_future(service._cached(SEARCH, "key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == {"total": 1}
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_caller_arriving_while_the_shared_call_is_cancelled_starts_a_new_call():
+    service = ZoomeyeService(key="test", cache=None)
+    started = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        started.set()
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            # Closing the connection of a cancelled request takes a moment.
+            await asyncio.sleep(0.05)
+            raise
+        return {"total": calls}
+
+    first = asyncio.ensure_future(service._cached(SEARCH, "key", fetch))
+    await started.wait()
+    first.cancel()
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(service._cached(SEARCH, "key", fetch))
+
+    assert await second == {"total": 2}
+    assert first.cancelled()
+    assert service.coalesced_requests == 0
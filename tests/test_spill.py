@@ -0,0 +1,65 @@
+import json
+import os
+import stat
+
+import pytest
+
+from mcp_server_zoomeye.spill import ResultStore
+
+
+def store_rows(store: ResultStore, rows: list) -> dict:
+    writer = store.create(query={"query": 'app="nginx"'})
+    for row in rows:
+        writer.write(row)
+    return writer.finish({"total": len(rows)})
+
+
+def test_rows_round_trip_in_slices(tmp_path):
+    store = ResultStore(directory=str(tmp_path / "results"))
+    rows = [{"ip": f"10.0.{i // 256}.{i % 256}", "port": 80} for i in range(2500)]
+    summary = store_rows(store, rows)
+
+    assert summary["count"] == 2500
+    assert store.read_rows(summary["result_id"], 1995, 10) == rows[1995:2005]
+    assert ResultStore(directory=str(tmp_path / "results")).read_rows(summary["result_id"], 0, 3) == rows[:3]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_default_directory_is_private(tmp_path, monkeypatch):
+    monkeypatch.delenv("ZOOMEYE_RESULTS_DIR", raising=False)
+    monkeypatch.delenv("ZOOMEYE_STATE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    store = ResultStore()
+
+    assert store.directory == str(tmp_path / "mcp-server-zoomeye" / "results")
+    assert stat.S_IMODE(os.stat(store.directory).st_mode) == 0o700
+
+
+def test_planted_metadata_cannot_name_other_files(tmp_path):
+    directory = tmp_path / "results"
+    directory.mkdir()
+    victim = tmp_path / "victim.txt"
+    victim.write_text("secret")
+    result_id = "0123456789abcdef"
+    (directory / f"{result_id}.ndjson").write_text('{"ip": "1.1.1.1"}\n')
+    meta = {"result_id": result_id, "format": "ndjson", "path": str(victim), "count": 1, "created": 0,
+            "checkpoints": [0]}
+    (directory / f"{result_id}.meta.json").write_text(json.dumps(meta))
+    (directory / "escape.meta.json").write_text(json.dumps({**meta, "result_id": "../x"}))
+
+    store = ResultStore(directory=str(directory))
+    assert [meta["result_id"] for meta in store.list()] == [result_id]
+    assert store.read_rows(result_id) == [{"ip": "1.1.1.1"}]
+
+    store.delete(result_id)
+    assert victim.read_text() == "secret"
+    assert not (directory / f"{result_id}.ndjson").exists()
+
+
+def test_metadata_without_data_file_is_ignored(tmp_path):
+    directory = tmp_path / "results"
+    directory.mkdir()
+    meta = {"result_id": "0123456789abcdef", "format": "ndjson", "count": 1, "created": 0, "checkpoints": [0]}
+    (directory / "0123456789abcdef.meta.json").write_text(json.dumps(meta))
+
+    assert ResultStore(directory=str(directory)).list() == []
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+from mcp import types
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.cache import ResponseCache
+from mcp_server_zoomeye.server import ZoomeyeService, create_server
+from mcp_server_zoomeye.vulindex import VulnerabilityIndex
+
+
+async def call(server, name, arguments):
+    handler = server.request_handlers[types.CallToolRequest]
+    result = await handler(types.CallToolRequest(method="tools/call", params={"name": name, "arguments": arguments}))
+    assert not result.root.isError, result.root.content[0].text
+    return json.loads(result.root.content[0].text)
+
+
+@pytest.mark.asyncio
+async def test_a_session_with_one_search_touches_no_disk(tmp_path, state_dir):
+    async with MockZoomeyeAPI(fixtures=True, total=100) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url,
+                                 cache=ResponseCache(path=str(tmp_path / "cache" / "cache.sqlite")),
+                                 vuln_index=VulnerabilityIndex(path=str(tmp_path / "index" / "index.sqlite")))
+        server = create_server(service)
+        await server.request_handlers[types.ListToolsRequest](types.ListToolsRequest(method="tools/list"))
+        await server.request_handlers[types.ListResourcesRequest](
+            types.ListResourcesRequest(method="resources/list"))
+        await call(server, "zoomeye_search", {"query": 'app="nginx"', "pagesize": 5})
+        await service.aclose()
+
+    assert not state_dir.exists()
+    assert not (tmp_path / "index").exists()
+    # The response cache opens its disk tier for the search, and only then.
+    assert (tmp_path / "cache" / "cache.sqlite").exists()
+
+
+@pytest.mark.asyncio
+async def test_stores_are_created_when_first_needed(state_dir):
+    async with MockZoomeyeAPI(fixtures=True, total=30) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        server = create_server(service)
+        await call(server, "zoomeye_watch", {"query": 'app="nginx"', "pagesize": 10})
+        assert (state_dir / "watch.sqlite3").exists()
+        assert not (state_dir / "results").exists()
+
+        summary = await call(server, "zoomeye_search", {"query": 'app="nginx"', "pagesize": 20, "spill": True})
+        await service.aclose()
+
+    assert (state_dir / "results" / f"{summary['result_id']}.ndjson").exists()
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+from mcp import types
+from mcp.server.lowlevel.server import request_ctx
+from mcp.shared.context import RequestContext
+
+from benchmarks.mock_api import MockZoomeyeAPI
+from mcp_server_zoomeye.server import ZoomeyeService, create_server
+
+
+class RecordingSession:
+    """Stands in for the client session and keeps the notifications sent to it."""
+
+    def __init__(self):
+        self.notifications = []
+
+    async def send_notification(self, notification):
+        self.notifications.append(notification.root)
+
+
+async def until(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def call(server, name, arguments):
+    handler = server.request_handlers[types.CallToolRequest]
+    return handler(types.CallToolRequest(method="tools/call", params={"name": name, "arguments": arguments}))
+
+
+@pytest.mark.asyncio
+async def test_a_call_over_its_deadline_fails_with_a_timeout_error():
+    async with MockZoomeyeAPI(fixtures=True, latency=2.0) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        server = create_server(service, tool_deadlines={"zoomeye_search": 0.3})
+        start = time.perf_counter()
+        result = await call(server, "zoomeye_search", {"query": 'app="nginx"'})
+
+        assert time.perf_counter() - start < 1.0
+        assert result.root.isError
+        assert "zoomeye_search did not finish within its deadline of 0.3s" in result.root.content[0].text
+        assert 'zoomeye_tool_calls_total{tool="zoomeye_search",outcome="timeout"} 1' in service.metrics.prometheus()
+        # The shared upstream call is cancelled once its last waiter gave up.
+        await until(lambda: 'zoomeye_upstream_requests_total{endpoint="search",status="cancelled"} 1'
+                    in service.metrics.prometheus())
+        assert api.requests == 1
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_call_cancels_its_upstream_requests():
+    ids = ["CVE-2024-0001", "CVE-2024-0002", "CVE-2024-0003"]
+    async with MockZoomeyeAPI(fixtures=True, latency=2.0) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        server = create_server(service)
+        task = asyncio.ensure_future(call(server, "zoomeye_vuldb_batch", {"ids": ids}))
+        await until(lambda: api.requests == len(ids))
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await until(lambda: f'zoomeye_upstream_requests_total{{endpoint="vuldb_by_id",status="cancelled"}} {len(ids)}'
+                    in service.metrics.prometheus())
+        text = service.metrics.prometheus()
+        assert 'zoomeye_tool_calls_total{tool="zoomeye_vuldb_batch",outcome="cancelled"} 1' in text
+        assert 'zoomeye_tool_in_flight{tool="zoomeye_vuldb_batch"} 0' in text
+        assert "zoomeye_upstream_in_flight 0" in text
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_progress_is_reported_for_every_page():
+    session = RecordingSession()
+    async with MockZoomeyeAPI(fixtures=True, total=450) as api:
+        service = ZoomeyeService(key="test", base_url=api.base_url, cache=None)
+        server = create_server(service)
+        context = RequestContext(request_id=1, meta=types.RequestParams.Meta(progressToken="token"),
+                                 session=session, lifespan_context=None)
+        token = request_ctx.set(context)
+        try:
+            result = await call(server, "zoomeye_search_all",
+                                {"query": 'app="nginx"', "max_results": 450, "pagesize": 100})
+        finally:
+            request_ctx.reset(token)
+
+    assert not result.root.isError, result.root.content[0].text
+    progress = [notification.params for notification in session.notifications]
+    assert [params.progress for params in progress] == [1, 2, 3, 4, 5]
+    assert all(params.progressToken == "token" for params in progress)
+    assert progress[-1].total == 5
+    assert progress[-1].rows == 450
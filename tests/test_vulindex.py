@@ -0,0 +1,40 @@
+import json
+
+from mcp_server_zoomeye.vulindex import VulnerabilityIndex
+
+
+def response(records, total):
+    return {"code": 60000, "message": "success", "data": {"total": total, "list": records}}
+
+
+RECORDS = [
+    {"vul_id": "CVE-2024-0001", "title": "Apache Tomcat remote code execution"},
+    {"vul_id": "CVE-2024-0002", "title": "nginx request smuggling"},
+]
+
+
+def test_fetched_keyword_reports_the_upstream_total():
+    index = VulnerabilityIndex(path=":memory:")
+    index.add_response(response(RECORDS[:1], 57), keyword="tomcat", page_size=10)
+
+    local = index.search("tomcat", 10)
+    assert local["source"] == "local_index"
+    assert local["data"]["total"] == 57
+    assert local["local_matches"] == 1
+    assert index.search("tomcat", 20) is None
+
+
+def test_dump_answers_only_keywords_it_covers(tmp_path):
+    dump = tmp_path / "dump.json"
+    dump.write_text(json.dumps(RECORDS))
+    index = VulnerabilityIndex(path=":memory:")
+    index.load_dump(str(dump))
+
+    local = index.search("nginx", 10)
+    assert [record["vul_id"] for record in local["data"]["list"]] == ["CVE-2024-0002"]
+    assert local["data"]["total"] is None
+    assert index.search("openssl", 10) is None
+
+
+def test_unknown_keyword_without_dump_falls_back():
+    assert VulnerabilityIndex(path=":memory:").search("tomcat", 10) is None
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import stat
+import time
+
+from mcp_server_zoomeye.watch import WatchStore
+
+QUERY = 'app="nginx"'
+
+
+def rows(*ips):
+    return [{"ip": ip, "port": 80, "update_time": "2024-01-01"} for ip in ips]
+
+
+def test_first_run_is_full():
+    store = WatchStore(path=":memory:")
+    assert store.plan(store.watch_id(QUERY, None, None)) is None
+
+
+def test_incomplete_full_run_allows_incremental_runs():
+    store = WatchStore(path=":memory:")
+    watch_id = store.watch_id(QUERY, None, None)
+    store.apply(watch_id, QUERY, None, None, rows("1.1.1.1"), full=True, complete=False, started=time.time())
+
+    assert store.plan(watch_id) is not None
+    assert store.plan(watch_id, full=False) is not None
+    watch = store.get(watch_id)
+    assert watch["last_full"] is not None
+    assert watch["last_complete"] is None
+
+
+def test_only_complete_full_runs_report_removals():
+    store = WatchStore(path=":memory:")
+    watch_id = store.watch_id(QUERY, None, None)
+    store.apply(watch_id, QUERY, None, None, rows("1.1.1.1", "2.2.2.2"), full=True, complete=True,
+                started=time.time())
+
+    incomplete = store.apply(watch_id, QUERY, None, None, rows("1.1.1.1"), full=True, complete=False,
+                             started=time.time())
+    assert incomplete["removed"] == []
+
+    complete = store.apply(watch_id, QUERY, None, None, rows("1.1.1.1"), full=True, complete=True,
+                           started=time.time())
+    assert [row["ip"] for row in complete["removed"]] == ["2.2.2.2"]
+    assert store.get(watch_id)["last_complete"] is not None
+
+
+def test_full_run_due_after_interval():
+    store = WatchStore(path=":memory:", full_interval=60)
+    watch_id = store.watch_id(QUERY, None, None)
+    store.apply(watch_id, QUERY, None, None, rows("1.1.1.1"), full=True, complete=False,
+                started=time.time() - 120)
+
+    assert store.plan(watch_id) is None
+    assert store.plan(watch_id, full=False) is not None
+
+
+def test_databases_without_last_complete_are_migrated(tmp_path):
+    path = str(tmp_path / "watch.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE watches (id TEXT PRIMARY KEY, query TEXT NOT NULL, sub_type TEXT, fields TEXT,"
+               " created REAL NOT NULL, last_run REAL, last_full REAL, runs INTEGER NOT NULL DEFAULT 0)")
+    db.execute("INSERT INTO watches VALUES ('w', 'q', NULL, NULL, 0, ?, NULL, 1)", (time.time(),))
+    db.commit()
+    db.close()
+
+    store = WatchStore(path=path)
+    assert store.get("w")["last_complete"] is None
+    assert store.plan("w") is not None
+
+
+def test_default_database_is_in_the_private_state_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("ZOOMEYE_WATCH_PATH", raising=False)
+    monkeypatch.setenv("ZOOMEYE_STATE_DIR", str(tmp_path / "state"))
+    store = WatchStore()
+
+    assert store.path == str(tmp_path / "state" / "watch.sqlite3")
+    if os.name != "nt":
+        assert stat.S_IMODE(os.stat(tmp_path / "state").st_mode) == 0o700